@@ -0,0 +1,53 @@
+# apps/analytics/reports.py
+"""
+Cached analytics reports.
+
+Reports aggregate a form's submissions, so they are computed once per
+``ANALYTICS_REPORT_CACHE_TIMEOUT`` seconds for all readers through
+``TieredCache`` instead of on every request, and refreshed ahead of expiry
+while they are being read. They can lag new submissions by that long.
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Count
+from django.utils import timezone
+from apps.core.caching import cached
+from apps.submissions.models import Submission
+
+
+@cached('analytics.submissions_over_time', settings.ANALYTICS_REPORT_CACHE_TIMEOUT,
+        local_ttl=settings.ANALYTICS_REPORT_LOCAL_CACHE_TTL)
+def submissions_over_time(form_id, days):
+    """Submissions per day over the last ``days`` days"""
+    start_date = timezone.now() - timedelta(days=days)
+    submissions = Submission.objects.filter(
+        form_id=form_id,
+        created_at__gte=start_date
+    ).extra(
+        select={'day': 'date(created_at)'}
+    ).values('day').annotate(count=Count('id')).order_by('day')
+    return list(submissions)
+
+
+@cached('analytics.field_responses', settings.ANALYTICS_REPORT_CACHE_TIMEOUT,
+        local_ttl=settings.ANALYTICS_REPORT_LOCAL_CACHE_TTL)
+def field_responses(form_id, field_id):
+    """Number of responses to a field and how often each value was given"""
+    field_values = []
+    for data in Submission.objects.filter(form_id=form_id).values_list('data', flat=True).iterator():
+        if field_id in data:
+            field_values.append(data[field_id])
+
+    # Count occurrences
+    response_counts = {}
+    for value in field_values:
+        if value in response_counts:
+            response_counts[value] += 1
+        else:
+            response_counts[value] = 1
+
+    return {
+        'field_id': field_id,
+        'total_responses': len(field_values),
+        'response_counts': response_counts
+    }
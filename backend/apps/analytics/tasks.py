@@ -0,0 +1,9 @@
+# apps/analytics/tasks.py
+from celery import shared_task
+from .tracking import flush_counters
+
+@shared_task
+def flush_form_counters():
+    """Flush buffered public form views and submissions into FormAnalytics"""
+    flushed = flush_counters()
+    return f"Flushed {flushed} form counters"
@@ -0,0 +1,87 @@
+# apps/analytics/tracking.py
+"""
+Buffered analytics counters.
+
+Public form views and submissions are accumulated in Redis hashes and
+flushed to ``FormAnalytics`` in batches by the ``flush_form_counters`` task,
+so the public read and submit paths do not write analytics rows. Without
+Redis, counts are applied directly.
+"""
+import logging
+from django.db import transaction
+from django.db.models import F
+from apps.core.redis import get_redis_connection, lease
+from apps.forms.models import Form
+from .models import FormAnalytics
+
+logger = logging.getLogger(__name__)
+
+PENDING_KEY = 'fusionforms:analytics:pending:{}'
+COUNTERS = ('views', 'submissions')
+FLUSH_LEASE = 300  # Seconds a flush holds its counter
+
+
+def increment_counter(form_id, counter, count=1):
+    """Atomically add ``count`` to a FormAnalytics counter"""
+    updated = FormAnalytics.objects.filter(form_id=form_id).update(**{counter: F(counter) + count})
+    if not updated:
+        # Counts buffered for a form that has since been deleted are dropped
+        if not Form.objects.filter(pk=form_id).exists():
+            return
+        FormAnalytics.objects.get_or_create(form_id=form_id)
+        FormAnalytics.objects.filter(form_id=form_id).update(**{counter: F(counter) + count})
+
+
+def _record(form_id, counter):
+    redis_conn = get_redis_connection()
+    if redis_conn is not None:
+        try:
+            redis_conn.hincrby(PENDING_KEY.format(counter), str(form_id), 1)
+            return
+        except Exception as e:
+            logger.warning(f"Buffering {counter} for form {form_id} failed, writing through: {e}")
+    increment_counter(form_id, counter)
+
+
+def record_form_view(form_id):
+    """Count a view of a form, buffering it in Redis when available"""
+    _record(form_id, 'views')
+
+
+def record_form_submission(form_id):
+    """Count a submission of a form, buffering it in Redis when available"""
+    _record(form_id, 'submissions')
+
+
+def flush_counter(counter):
+    """Apply one buffered counter to FormAnalytics, returning the number of forms updated"""
+    redis_conn = get_redis_connection()
+    if redis_conn is None:
+        return 0
+
+    # One flush at a time: a second one renaming the live hash would
+    # overwrite the flushing hash the first is still applying
+    pending_key = PENDING_KEY.format(counter)
+    with lease(redis_conn, f'{pending_key}:lease', FLUSH_LEASE) as lock:
+        if lock is None:
+            return 0
+
+        # Swap the live hash out so concurrent hits keep accumulating; a leftover
+        # flushing hash from a crashed run is drained first.
+        flushing_key = f'{pending_key}:flushing'
+        if not redis_conn.exists(flushing_key):
+            if not redis_conn.exists(pending_key):
+                return 0
+            redis_conn.rename(pending_key, flushing_key)
+
+        counts = redis_conn.hgetall(flushing_key)
+        with transaction.atomic():
+            for form_id, count in counts.items():
+                increment_counter(form_id.decode(), counter, int(count))
+        redis_conn.delete(flushing_key)
+        return len(counts)
+
+
+def flush_counters():
+    """Apply every buffered counter, returning the number of form counters updated"""
+    return sum(flush_counter(counter) for counter in COUNTERS)
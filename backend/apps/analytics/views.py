@@ -2,13 +2,11 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Count, Avg, F
-from django.utils import timezone
-from datetime import timedelta
 from drf_spectacular.utils import extend_schema, extend_schema_view
 from apps.forms.models import Form
 from apps.submissions.models import Submission
 from .models import FormAnalytics, FieldAnalytics
+from .reports import field_responses, submissions_over_time
 from .serializers import FormAnalyticsSerializer, FieldAnalyticsSerializer
 
 @extend_schema_view(
@@ -21,27 +19,21 @@ class FormAnalyticsViewSet(viewsets.ReadOnlyModelViewSet):
     
     def get_queryset(self): #type: ignore[override]
         user = self.request.user
+        # Analytics of deleted forms stay hidden until they are purged
+        analytics = FormAnalytics.objects.filter(form__deleted_at__isnull=True)
         if user.role == 'admin':
-            return FormAnalytics.objects.all()
+            return analytics
         else:
             # Users can only see analytics for their own forms
-            return FormAnalytics.objects.filter(form__created_by=user)
+            return analytics.filter(form__created_by=user)
     
     @extend_schema(tags=['Analytics'])
     @action(detail=True, methods=['get'])
     def submissions_over_time(self, request, pk=None):
         analytics = self.get_object()
         days = int(request.query_params.get('days', 30))
-        
-        start_date = timezone.now() - timedelta(days=days)
-        submissions = Submission.objects.filter(
-            form=analytics.form,
-            created_at__gte=start_date
-        ).extra(
-            select={'day': 'date(created_at)'}
-        ).values('day').annotate(count=Count('id')).order_by('day')
-        
-        return Response(list(submissions))
+        # Shared by every reader of the form for ANALYTICS_REPORT_CACHE_TIMEOUT
+        return Response(submissions_over_time(analytics.form_id, days))
     
     @extend_schema(tags=['Analytics'])
     @action(detail=True, methods=['get'])
@@ -55,28 +47,7 @@ class FormAnalyticsViewSet(viewsets.ReadOnlyModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Get all submissions for this form
-        submissions = Submission.objects.filter(form=analytics.form)
-        
-        # Extract values for the specified field
-        field_values = []
-        for submission in submissions:
-            if field_id in submission.data:
-                field_values.append(submission.data[field_id])
-        
-        # Count occurrences
-        response_counts = {}
-        for value in field_values:
-            if value in response_counts:
-                response_counts[value] += 1
-            else:
-                response_counts[value] = 1
-        
-        return Response({
-            'field_id': field_id,
-            'total_responses': len(field_values),
-            'response_counts': response_counts
-        })
+        return Response(field_responses(analytics.form_id, field_id))
     
     @extend_schema(tags=['Analytics'])
     @action(detail=True, methods=['post'])
@@ -1,53 +1,310 @@
 # apps/core/caching.py
+"""
+Two-tier read-through caching.
+
+``TieredCache`` caches one namespace in a bounded per-process LRU
+(``LocalLRUCache``) in front of the shared Django cache (Redis). Keys are
+derived from every positional and keyword argument. A result of None is
+cached too, for ``negative_timeout`` seconds, so lookups of what does not
+exist stay off the database as well.
+
+Misses are computed once. Threads of a process wait for the one computing,
+and processes take a short lock in the shared cache; those that lose it
+serve the current value if there is one, and otherwise wait for the
+winner's. Entries are refreshed ahead of their expiry with a probability
+that rises as it nears, weighted by how long they took to compute (XFetch),
+so hot keys are recomputed by one caller before they expire instead of by
+all of them after.
+
+Every key has a generation in the shared cache, a token replaced on each
+``invalidate`` or ``set``. Entries carry the generation read before they were
+computed and count as misses once it is replaced, so a computation that read
+the database before an invalidation cannot write its stale result back after
+it. Entries expire ``timeout`` seconds after their computation started, never
+later than the generation that outdates them.
+
+Lookups are counted per namespace (``cache_stats``). Local entries are
+evicted in every process through ``apps.core.invalidation``.
+"""
+from django.conf import settings
 from django.core.cache import cache as django_cache
+from collections import Counter, OrderedDict
 from functools import wraps
 import hashlib
 import json
+import math
+import random
+import threading
+import time
+import uuid
+from apps.core import invalidation
+from apps.core.redis import get_redis_connection
 
+_MISSING = object()
 
-def cache_result(timeout=300, key_prefix=''):
-    """Decorator to cache function results"""
+_stats = {}  # Namespace -> Counter of lookups
+_stats_lock = threading.Lock()
+
+
+def _count(namespace, *events):
+    with _stats_lock:
+        counts = _stats.setdefault(namespace, Counter())
+        for event in events:
+            counts[event] += 1
+
+
+def cache_stats():
+    """This process's lookup counts and hit ratio per namespace
+
+    ``hits`` and ``local_hits`` include the ``negative_hits``; ``refreshes``
+    are early recomputes, ``stale`` values served while another process
+    recomputed, and ``waits`` lookups that waited for another computation.
+    """
+    with _stats_lock:
+        stats = {namespace: dict(counts) for namespace, counts in _stats.items()}
+    for counts in stats.values():
+        hits = counts.get('local_hits', 0) + counts.get('hits', 0)
+        lookups = hits + counts.get('misses', 0) + counts.get('refreshes', 0)
+        counts['hit_ratio'] = round(hits / lookups, 4) if lookups else None
+    return stats
+
+
+class LocalLRUCache:
+    """Bounded, thread-safe in-process LRU cache with a per-entry TTL"""
+
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class TieredCache:
+    """Read-through cache of one namespace: a per-process LRU in front of the shared cache
+
+    Entries are ``(value, expires_at, delta, generation)``: the value, when it
+    expires (Unix time), how long it took to compute (seconds) and the key's
+    generation it was computed under.
+    """
+
+    def __init__(self, namespace, timeout, local_size=1024, local_ttl=60, negative_timeout=None):
+        self.namespace = namespace
+        self.timeout = timeout
+        self.negative_timeout = negative_timeout  # None results are not cached without it
+        self._local = LocalLRUCache(local_size, local_ttl) if local_size else None
+        self._flights = {}  # Key -> Event set once this process's computation of it is done
+        self._flights_lock = threading.Lock()
+        self._evictions = 0  # Local evictions so far; fills that raced one stay out of the LRU
+        invalidation.register(f'cache:{namespace}', self._evict_local, self._clear_local)
+
+    def key(self, *args, **kwargs):
+        """Cache key of a call's arguments, positional and keyword"""
+        raw = json.dumps([args, kwargs], sort_keys=True, default=str, separators=(',', ':'))
+        return f"{self.namespace}:{hashlib.sha256(raw.encode()).hexdigest()[:32]}"
+
+    def get_or_compute(self, key, compute):
+        """Return the cached value of ``key``, computing and caching it with ``compute()`` when needed"""
+        invalidation.ensure_listener()
+        if self._local is not None:
+            entry = self._local.get(key)
+            if entry is not None:
+                _count(self.namespace, 'local_hits', *(('negative_hits',) if entry[0] is None else ()))
+                return entry[0]
+        entry, generation = self._fetch(key)
+        if entry is not None and not self._refresh_early(entry):
+            _count(self.namespace, 'hits', *(('negative_hits',) if entry[0] is None else ()))
+            self._set_local(key, entry)
+            return entry[0]
+        _count(self.namespace, 'refreshes' if entry is not None else 'misses')
+        return self._compute(key, compute, entry, generation)
+
+    def set(self, key, value):
+        """Store a value computed elsewhere, outdating fills in progress and every process's LRU entry"""
+        generation = self._next_generation(key)
+        invalidation.broadcast(f'cache:{self.namespace}', key)
+        self._store(key, value, 0.0, generation, self._evictions)
+
+    def invalidate(self, key):
+        """Drop a key from the shared cache and from every process's LRU
+
+        Computations of it still in progress are stored under the replaced
+        generation, which readers ignore.
+        """
+        self._next_generation(key)
+        django_cache.delete(key)
+        invalidation.broadcast(f'cache:{self.namespace}', key)
+
+    def _next_generation(self, key):
+        # Outlives every entry computed under the generation it replaces
+        generation = uuid.uuid4().hex
+        django_cache.set(f"{key}:gen", generation, max(self.timeout, self.negative_timeout or 0))
+        return generation
+
+    def _fetch(self, key):
+        # The shared entry, None unless computed under the current generation, and the generation
+        found = django_cache.get_many([key, f"{key}:gen"])
+        entry, generation = found.get(key), found.get(f"{key}:gen")
+        if entry is not None and (len(entry) < 4 or entry[3] != generation):
+            entry = None
+        return entry, generation
+
+    def _refresh_early(self, entry):
+        # XFetch: -log(u) is exponentially distributed, so the recompute is
+        # drawn ever more likely as the expiry nears, earlier for slow values
+        _, expires_at, delta, _ = entry
+        gap = -delta * settings.CACHE_EARLY_REFRESH_BETA * math.log(1.0 - random.random())
+        return time.time() + gap >= expires_at
+
+    def _compute(self, key, compute, stale, generation):
+        with self._flights_lock:
+            done = self._flights.get(key)
+            leader = done is None
+            if leader:
+                done = self._flights[key] = threading.Event()
+        if not leader:
+            if stale is not None:
+                _count(self.namespace, 'stale')
+                return stale[0]
+            _count(self.namespace, 'waits')
+            done.wait(settings.CACHE_LOCK_TIMEOUT)
+            entry = self._local.get(key) if self._local is not None else None
+            if entry is None:
+                entry, _ = self._fetch(key)
+            if entry is not None:
+                return entry[0]
+            return compute()  # The computation failed, timed out or was outdated
+        try:
+            return self._lead(key, compute, stale, generation)
+        finally:
+            with self._flights_lock:
+                del self._flights[key]
+            done.set()
+
+    def _lead(self, key, compute, stale, generation):
+        lock_key = f"{key}:lock"
+        # ``add`` answers None when the shared cache is unreachable; there is
+        # nobody to coordinate with then
+        if django_cache.add(lock_key, 1, settings.CACHE_LOCK_TIMEOUT) is False:
+            if stale is not None:
+                _count(self.namespace, 'stale')
+                return stale[0]
+            _count(self.namespace, 'waits')
+            deadline = time.monotonic() + settings.CACHE_LOCK_TIMEOUT
+            while time.monotonic() < deadline:
+                time.sleep(0.05)
+                entry, _ = self._fetch(key)
+                if entry is not None:
+                    self._set_local(key, entry)
+                    return entry[0]
+            # The process holding the lock died or is stuck; compute anyway
+        try:
+            evictions = self._evictions
+            started = time.monotonic()
+            value = compute()
+            self._store(key, value, time.monotonic() - started, generation, evictions)
+            return value
+        finally:
+            django_cache.delete(lock_key)
+
+    def _store(self, key, value, delta, generation, evictions):
+        # Counted from when the computation started, so an entry outdated by
+        # an invalidation expires before the generation that outdates it
+        timeout = (self.timeout if value is not None else self.negative_timeout or 0) - delta
+        if timeout <= 0:
+            return
+        entry = (value, time.time() + timeout, delta, generation)
+        django_cache.set(key, entry, timeout)
+        if evictions == self._evictions:
+            self._set_local(key, entry)
+
+    def _set_local(self, key, entry):
+        if self._local is not None:
+            # Never outlives the shared entry
+            self._local.set(key, entry, min(self._local.ttl, max(entry[1] - time.time(), 0)))
+
+    def _evict_local(self, key):
+        self._evictions += 1
+        if self._local is not None:
+            self._local.delete(key)
+
+    def _clear_local(self):
+        self._evictions += 1
+        if self._local is not None:
+            self._local.clear()
+
+
+def cached(namespace, timeout, **options):
+    """Decorator caching a function's results in a ``TieredCache`` keyed by all of its arguments
+
+    The decorated function gets ``invalidate(*args, **kwargs)`` and its ``cache``.
+    """
     def decorator(func):
+        tiered = TieredCache(namespace, timeout, **options)
+
         @wraps(func)
         def wrapper(*args, **kwargs):
-            # Generate cache key from function name and arguments
-            try:
-                kwargs_str = json.dumps(kwargs, sort_keys=True, default=str)
-            except TypeError:
-                kwargs_str = str(kwargs)
-            cache_key = f"{key_prefix}:{func.__name__}:{hashlib.md5(kwargs_str.encode()).hexdigest()}"
-            
-            # Try to get from cache
-            result = django_cache.get(cache_key)
-            if result is not None:
-                return result
-            
-            # Execute function and cache result
-            result = func(*args, **kwargs)
-            django_cache.set(cache_key, result, timeout)
-            return result
+            return tiered.get_or_compute(tiered.key(*args, **kwargs), lambda: func(*args, **kwargs))
+
+        wrapper.cache = tiered
+        wrapper.invalidate = lambda *args, **kwargs: tiered.invalidate(tiered.key(*args, **kwargs))
         return wrapper
     return decorator
 
 
+def cache_result(timeout=300, key_prefix=''):
+    """Decorator to cache function results (see ``cached``)"""
+    def decorator(func):
+        namespace = f"{key_prefix}:{func.__name__}" if key_prefix else f"{func.__module__}.{func.__qualname__}"
+        return cached(namespace, timeout)(func)
+    return decorator
+
+
 def invalidate_cache(pattern):
-    """Invalidate cache keys matching pattern"""
-    # Note: This is a simplified version. For production, consider using django-redis with pattern deletion
-    try:
-        from django_redis import get_redis_connection
-        redis_conn = get_redis_connection("default")
-        keys = redis_conn.keys(f"fusionforms:{pattern}*")
-        if keys:
-            redis_conn.delete(*keys)
-    except ImportError:
-        pass
+    """Invalidate shared cache keys matching pattern"""
+    redis_conn = get_redis_connection()
+    if redis_conn is None:
+        return
+    # SCAN instead of KEYS, which blocks Redis while it walks the keyspace
+    keys = list(redis_conn.scan_iter(match=f"fusionforms:{pattern}*", count=1000))
+    for start in range(0, len(keys), 1000):
+        redis_conn.delete(*keys[start:start + 1000])
 
 
 def get_or_set_cache(key, callback, timeout=300):
-    """Get value from cache or set it using callback"""
-    value = django_cache.get(key)
-    if value is None:
+    """Get value from cache or set it using callback; falsy values (None included) are cached too"""
+    value = django_cache.get(key, _MISSING)
+    if value is _MISSING:
         value = callback()
         django_cache.set(key, value, timeout)
     return value
-
@@ -0,0 +1,97 @@
+# apps/core/invalidation.py
+"""
+Cross-process invalidation of in-process caches over Redis pub/sub.
+
+In-process caches register an eviction handler per namespace. ``broadcast``
+runs the handlers locally and publishes the key so that every gunicorn and
+Celery process subscribed to the channel evicts it too. Each process starts
+its subscriber thread lazily (``ensure_listener``), which keeps it fork-safe.
+When the subscription drops, the registered ``clear`` handlers run on
+reconnect since messages may have been missed in between.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from .redis import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'fusionforms:invalidate'
+
+_evict_handlers = {}
+_clear_handlers = []
+_listener_pid = None
+_listener_lock = threading.Lock()
+
+
+def register(namespace, evict, clear=None):
+    """Register handlers evicting a key (and optionally clearing everything) for a namespace"""
+    _evict_handlers.setdefault(namespace, []).append(evict)
+    if clear is not None:
+        _clear_handlers.append(clear)
+
+
+def _dispatch(namespace, key):
+    for handler in _evict_handlers.get(namespace, ()):
+        try:
+            handler(key)
+        except Exception:
+            logger.exception(f"Invalidation handler failed for {namespace}:{key}")
+
+
+def _clear_all():
+    for handler in _clear_handlers:
+        try:
+            handler()
+        except Exception:
+            logger.exception("Cache clear handler failed")
+
+
+def broadcast(namespace, key):
+    """Evict ``key`` from ``namespace`` in this process and in every subscribed process"""
+    key = str(key)
+    _dispatch(namespace, key)
+    redis_conn = get_redis_connection()
+    if redis_conn is None:
+        return
+    try:
+        redis_conn.publish(CHANNEL, json.dumps([namespace, key]))
+    except Exception as e:
+        logger.warning(f"Publishing invalidation for {namespace}:{key} failed: {e}")
+
+
+def _listen():
+    reconnecting = False
+    while True:
+        try:
+            pubsub = get_redis_connection().pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(CHANNEL)
+            if reconnecting:
+                _clear_all()
+            while True:
+                message = pubsub.get_message(timeout=1.0)
+                if message is None:
+                    continue
+                namespace, key = json.loads(message['data'])
+                _dispatch(namespace, key)
+        except Exception as e:
+            logger.warning(f"Invalidation listener disconnected: {e}")
+            reconnecting = True
+            time.sleep(1)
+
+
+def ensure_listener():
+    """Start this process's subscriber thread if it is not running yet"""
+    global _listener_pid
+    pid = os.getpid()
+    if _listener_pid == pid:
+        return
+    with _listener_lock:
+        if _listener_pid == pid:
+            return
+        _listener_pid = pid
+        if get_redis_connection() is None:
+            return
+        threading.Thread(target=_listen, name='cache-invalidation', daemon=True).start()
@@ -10,6 +10,7 @@ from datetime import timedelta
 from drf_spectacular.utils import extend_schema
 from apps.forms.models import Form
 from apps.submissions.models import Submission
+from apps.core.caching import cache_stats
 import logging
 
 logger = logging.getLogger(__name__)
@@ -45,6 +46,8 @@ class MetricsView(APIView):
         except Exception as e:
             metrics['cache']['status'] = 'error'
             logger.error(f"Error getting cache metrics: {e}")
+        # Hits and misses of this worker's read-through caches
+        metrics['cache']['namespaces'] = cache_stats()
         
         # Application metrics
         try:
@@ -53,3 +53,8 @@ class CanViewAnalytics(RoleBasedPermission):
     """Permission to view analytics - all roles"""
     required_roles = ['admin', 'designer', 'analyst', 'viewer']
 
+
+class CanViewMetrics(RoleBasedPermission):
+    """Permission to view service-wide metrics - admins"""
+    required_roles = ['super_admin', 'admin']
+
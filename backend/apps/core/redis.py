@@ -0,0 +1,43 @@
+# apps/core/redis.py
+"""
+Access to the Redis server behind the default cache.
+
+Counters, buffers, metrics and invalidation messages go to Redis directly.
+When the cache falls back to local memory there is no Redis, and callers
+get None and use their in-process fallback.
+"""
+import logging
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+def get_redis_connection():
+    """Raw Redis client of the default cache, or None without Redis"""
+    try:
+        from django_redis import get_redis_connection as django_redis_connection
+        return django_redis_connection('default')
+    except (ImportError, NotImplementedError):
+        return None
+
+
+@contextmanager
+def lease(redis_conn, name, timeout):
+    """Hold the Redis lock ``name`` for the block without waiting for it
+
+    Yields the lock, or None when another process holds it. Work that may
+    outlast ``timeout`` seconds renews it with ``lock.reacquire()``.
+    """
+    from redis.exceptions import LockError
+
+    lock = redis_conn.lock(name, timeout=timeout, blocking=False)
+    if not lock.acquire():
+        yield None
+        return
+    try:
+        yield lock
+    finally:
+        try:
+            lock.release()
+        except LockError:
+            logger.warning(f"Lease {name} expired before it was released")
@@ -0,0 +1,93 @@
+import threading
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from .caching import TieredCache, cache_stats
+
+
+@override_settings(CACHE_EARLY_REFRESH_BETA=0)
+class TieredCacheTest(SimpleTestCase):
+    """Values are computed once per key and never outlive an invalidation"""
+
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def make_cache(self, name, **options):
+        return TieredCache(f'tests.{name}', timeout=60, **options)
+
+    def compute(self, value='value'):
+        def compute():
+            self.calls += 1
+            return value
+        return compute
+
+    def test_read_through(self):
+        tiered = self.make_cache('read_through')
+        key = tiered.key(1, flag=True)
+        self.assertNotEqual(key, tiered.key(1, flag=False))
+        self.assertEqual(tiered.get_or_compute(key, self.compute()), 'value')
+        self.assertEqual(tiered.get_or_compute(key, self.compute()), 'value')
+        self.assertEqual(self.calls, 1)
+
+        # Another process has an empty LRU and reads the shared entry
+        tiered._local.clear()
+        self.assertEqual(tiered.get_or_compute(key, self.compute()), 'value')
+        self.assertEqual(self.calls, 1)
+        stats = cache_stats()['tests.read_through']
+        self.assertEqual((stats['misses'], stats['local_hits'], stats['hits']), (1, 1, 1))
+
+    def test_invalidate_and_set(self):
+        tiered = self.make_cache('invalidate')
+        tiered.get_or_compute('k', self.compute('old'))
+        tiered.invalidate('k')
+        self.assertEqual(tiered.get_or_compute('k', self.compute('new')), 'new')
+        tiered.set('k', 'stored')
+        self.assertEqual(tiered.get_or_compute('k', self.compute('unused')), 'stored')
+        self.assertEqual(self.calls, 2)
+
+    def test_computation_racing_an_invalidation_is_not_kept(self):
+        tiered = self.make_cache('race')
+
+        def compute():
+            self.calls += 1
+            if self.calls == 1:
+                tiered.invalidate('k')  # Arrives while the value is being read
+            return f'value {self.calls}'
+
+        self.assertEqual(tiered.get_or_compute('k', compute), 'value 1')
+        self.assertEqual(tiered.get_or_compute('k', compute), 'value 2')
+        self.assertEqual(tiered.get_or_compute('k', compute), 'value 2')
+
+    def test_none_is_cached_only_with_a_negative_timeout(self):
+        tiered = self.make_cache('none')
+        tiered.get_or_compute('k', self.compute(None))
+        tiered.get_or_compute('k', self.compute(None))
+        self.assertEqual(self.calls, 2)
+
+        negative = self.make_cache('negative', negative_timeout=30)
+        negative.get_or_compute('k', self.compute(None))
+        self.assertIsNone(negative.get_or_compute('k', self.compute('unused')))
+        self.assertEqual(self.calls, 3)
+
+    def test_concurrent_misses_compute_once(self):
+        tiered = self.make_cache('concurrent')
+        started, release = threading.Event(), threading.Event()
+
+        def compute():
+            self.calls += 1
+            started.set()
+            release.wait(5)
+            return 'value'
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(tiered.get_or_compute('k', compute)))
+                   for _ in range(5)]
+        threads[0].start()
+        started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(results, ['value'] * 5)
+        self.assertEqual(self.calls, 1)
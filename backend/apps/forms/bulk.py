@@ -0,0 +1,158 @@
+# apps/forms/bulk.py
+"""
+Set-based bulk operations on forms.
+
+Each operation works on the forms of one owner, issues a fixed number of
+queries regardless of how many ids it is given and
+returns one result entry per requested id, in request order. Querysets are
+updated without going through ``Form.save``, so the caches that the save and
+delete signals normally invalidate are invalidated here explicitly.
+"""
+from django.db import transaction
+from django.db.models import Case, IntegerField, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from apps.analytics.models import FormAnalytics
+from .deletion import soft_delete_forms
+from .models import Form, FormVersion, SchemaBlob
+from .public_cache import invalidate_public_form, store_public_form
+from .schema_delta import schema_hash
+from .schema_lint import blocking_issues, lint_form_schema
+from .search import build_search_vector
+from .snapshots import invalidate_form_snapshot
+
+OPERATIONS = ('publish', 'archive', 'duplicate', 'delete')
+
+
+def _results(ids, outcomes):
+    return [{'id': str(form_id), **outcomes.get(str(form_id), {'status': 'not_found'})} for form_id in ids]
+
+
+def _invalidate(form_ids):
+    for form_id in form_ids:
+        invalidate_public_form(form_id)
+        invalidate_form_snapshot(form_id)
+
+
+def bulk_publish(user, ids):
+    """Publish forms, creating versions only for schemas that changed"""
+    forms = list(Form.objects.filter(created_by=user, pk__in=ids).only('id', 'schema', 'status'))
+    outcomes = {}
+
+    with transaction.atomic():
+        # Latest version of every form in one query (DISTINCT ON)
+        latest = {
+            version.form_id: version
+            for version in FormVersion.objects.filter(form__in=forms)
+            .select_related('blob')
+            .order_by('form_id', '-version')
+            .distinct('form_id')
+        }
+
+        digests = {form.pk: schema_hash(form.schema) for form in forms}
+        existing_blobs = set(
+            SchemaBlob.objects.filter(pk__in=set(digests.values())).values_list('pk', flat=True)
+        )
+
+        lint_results = {}  # Linted once per distinct schema
+        new_blobs = {}
+        new_versions = []
+        version_numbers = {}
+        to_publish = []
+        for form in forms:
+            previous = latest.get(form.pk)
+            digest = digests[form.pk]
+            if previous is not None and previous.blob_id == digest:
+                if form.status == 'published':
+                    outcomes[str(form.pk)] = {'status': 'unchanged', 'version': previous.version}
+                    continue
+                version_numbers[form.pk] = previous.version
+            else:
+                if digest not in lint_results:
+                    lint_results[digest] = lint_form_schema(form.schema)
+                validation_cost_ms, lint_report = lint_results[digest]
+                issues = blocking_issues(lint_report)
+                if issues:
+                    outcomes[str(form.pk)] = {'status': 'rejected', 'issues': issues}
+                    continue
+                if digest not in existing_blobs and digest not in new_blobs:
+                    new_blobs[digest] = SchemaBlob.build(form.schema, previous.blob if previous else None, digest)
+                version_numbers[form.pk] = previous.version + 1 if previous else 1
+                new_versions.append(FormVersion(
+                    form=form, version=version_numbers[form.pk], blob_id=digest,
+                    validation_cost_ms=validation_cost_ms, lint_report=lint_report, created_by=user,
+                ))
+            to_publish.append(form.pk)
+            outcomes[str(form.pk)] = {'status': 'published', 'version': version_numbers[form.pk]}
+
+        SchemaBlob.objects.bulk_create(new_blobs.values(), ignore_conflicts=True)
+        FormVersion.objects.bulk_create(new_versions)
+
+        if not to_publish:
+            return _results(ids, outcomes)
+        now = timezone.now()
+        Form.objects.filter(pk__in=to_publish).update(
+            status='published',
+            version=Case(
+                *[When(pk=form_id, then=Value(number)) for form_id, number in version_numbers.items()],
+                output_field=IntegerField(),
+            ),
+            published_at=Coalesce('published_at', Value(now)),
+            updated_at=now,
+        )
+
+    _invalidate(to_publish)
+    for form in Form.objects.filter(pk__in=to_publish).select_related('theme'):
+        store_public_form(form)
+    return _results(ids, outcomes)
+
+
+def bulk_archive(user, ids):
+    """Archive forms that are not archived yet"""
+    with transaction.atomic():
+        forms = Form.objects.filter(created_by=user, pk__in=ids)
+        found = {str(pk): status for pk, status in forms.values_list('pk', 'status')}
+        to_archive = [pk for pk, status in found.items() if status != 'archived']
+        Form.objects.filter(pk__in=to_archive).update(status='archived', updated_at=timezone.now())
+
+    _invalidate(to_archive)
+    outcomes = {pk: {'status': 'archived' if pk in to_archive else 'unchanged'} for pk in found}
+    return _results(ids, outcomes)
+
+
+def bulk_duplicate(user, ids):
+    """Copy forms as drafts owned by ``user``"""
+    with transaction.atomic():
+        originals = Form.objects.filter(created_by=user, pk__in=ids).only('id', 'title', 'description', 'schema')
+        copies = {}
+        for original in originals:
+            title = f"{original.title} (Copy)"
+            copies[str(original.pk)] = Form(
+                title=title,
+                description=original.description,
+                schema=original.schema,
+                created_by=user,
+                search_vector=build_search_vector(title, original.description, original.schema),
+            )
+        Form.objects.bulk_create(copies.values())
+        FormAnalytics.objects.bulk_create([FormAnalytics(form=copy) for copy in copies.values()])
+
+    outcomes = {pk: {'status': 'duplicated', 'new_id': str(copy.pk)} for pk, copy in copies.items()}
+    return _results(ids, outcomes)
+
+
+def bulk_delete(user, ids):
+    """Soft-delete forms owned by ``user``; their rows are purged in the background"""
+    deletions = soft_delete_forms(user, ids)
+    outcomes = {str(d.form_id): {'status': 'deleted', 'deletion_id': d.pk} for d in deletions}
+    return _results(ids, outcomes)
+
+
+def run_bulk_operation(operation, user, ids):
+    handler = {
+        'publish': bulk_publish,
+        'archive': bulk_archive,
+        'duplicate': bulk_duplicate,
+        'delete': bulk_delete,
+    }[operation]
+    return handler(user, ids)
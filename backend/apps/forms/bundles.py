@@ -0,0 +1,435 @@
+# apps/forms/bundles.py
+"""
+Portable form bundles.
+
+A bundle is gzip-compressed NDJSON: a ``bundle`` header line followed by one
+record per line, grouped by type in dependency order (themes, schemas, forms,
+versions, webhooks, submissions). Export streams rows from server-side
+cursors and compresses as it goes; import parses line by line and writes in
+batches, so memory stays bounded by the batch size and the id map of the
+imported forms, whatever the size of the bundle.
+
+Uploaded bundles are imported by a Celery job: the request stores the upload
+(``stash_bundle``) and the job imports and deletes it (``import_stashed_bundle``).
+Records are checked against ``RECORD_SCHEMAS`` as they are read, so a
+malformed bundle is rejected with a ``BundleError`` naming the line.
+
+Imported rows get fresh primary keys and belong to the importing user; form
+references are remapped from the ids recorded in the bundle. Schemas are
+stored under the hash of their content, recomputed on import, never under the
+hash the bundle claims, and versions are remapped to it.
+"""
+import datetime
+import io
+import json
+import uuid
+import zlib
+from collections import Counter
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from apps.analytics.models import FormAnalytics
+from apps.submissions.models import Submission
+from apps.webhooks.models import Webhook
+from .models import Form, FormTheme, FormVersion, SchemaBlob
+from .schema_delta import canonical_json, schema_hash
+from .search import build_search_vector
+from .theme_assets import write_theme_asset
+
+BUNDLE_FORMAT = 1
+CONTENT_TYPE = 'application/gzip'
+UPLOAD_DIR = 'bundles'  # Uploads waiting for their import job, in the default storage
+INFLATE_CHUNK = 1 << 20  # Most bytes decompressed at once on import
+
+FORM_FIELDS = ('id', 'title', 'description', 'schema', 'version', 'status', 'created_at', 'published_at', 'theme_id')
+THEME_FIELDS = ('name', 'primary_color', 'secondary_color', 'font_family')
+WEBHOOK_FIELDS = ('form_id', 'name', 'url', 'secret', 'events', 'is_active')
+SUBMISSION_FIELDS = ('form_id', 'data', 'ip_address', 'user_agent', 'is_spam', 'created_at')
+
+# Required keys of each record type and their JSON types; None allows null,
+# 'datetime' is an ISO 8601 string and 'any' is any JSON value
+RECORD_SCHEMAS = {
+    'theme': {'id': int, 'name': str, 'primary_color': str, 'secondary_color': str, 'font_family': str},
+    'schema': {'hash': str, 'schema': dict},
+    'form': {
+        'id': str, 'title': str, 'description': str, 'schema': dict, 'version': int, 'status': str,
+        'created_at': 'datetime', 'published_at': ('datetime', None), 'theme_id': (int, None),
+    },
+    'version': {'form_id': str, 'version': int, 'hash': str, 'created_at': 'datetime'},
+    'webhook': {'form_id': str, 'name': str, 'url': str, 'secret': str, 'events': list, 'is_active': bool},
+    'submission': {
+        'form_id': str, 'data': 'any', 'ip_address': (str, None), 'user_agent': str, 'is_spam': bool,
+        'created_at': 'datetime',
+    },
+}
+
+
+class BundleError(ValueError):
+    """Raised for malformed or incompatible bundles"""
+
+
+class BundleEncoder(DjangoJSONEncoder):
+    """Keeps full microsecond precision, which DjangoJSONEncoder truncates"""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def _is_type(value, expected):
+    if expected == 'any':
+        return True
+    if expected is None:
+        return value is None
+    if expected == 'datetime':
+        try:
+            return isinstance(value, str) and parse_datetime(value) is not None
+        except ValueError:
+            return False
+    if isinstance(value, bool):
+        return expected is bool
+    return isinstance(value, expected)
+
+
+def check_record(kind, record):
+    """Raise ``BundleError`` unless ``record`` has the keys and value types of its type"""
+    for key, expected in RECORD_SCHEMAS[kind].items():
+        if key not in record:
+            raise BundleError(f'{kind} record is missing {key!r}')
+        options = expected if isinstance(expected, tuple) else (expected,)
+        if not any(_is_type(record[key], option) for option in options):
+            raise BundleError(f'{kind} record has an invalid {key!r}')
+
+
+def _copy_value(value):
+    """Encode a value for COPY's text format"""
+    if value is None:
+        return '\\N'
+    return value.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+def _line(record):
+    return (json.dumps(record, cls=BundleEncoder, separators=(',', ':')) + '\n').encode()
+
+
+def iter_bundle(user, form_ids, include_submissions=False, include_secrets=False):
+    """Yield the NDJSON lines of a bundle holding ``user``'s forms among ``form_ids``"""
+    chunk_size = settings.FORM_BUNDLE_BATCH_SIZE
+    form_ids = list(Form.objects.filter(created_by=user, pk__in=form_ids).values_list('pk', flat=True))
+
+    yield _line({
+        'type': 'bundle',
+        'format': BUNDLE_FORMAT,
+        'exported_at': timezone.now(),
+        'forms': len(form_ids),
+        'submissions': include_submissions,
+    })
+
+    for theme in FormTheme.objects.filter(created_by=user).order_by('pk').values('id', *THEME_FIELDS):
+        yield _line({'type': 'theme', **theme})
+
+    # Each distinct schema is written once, fully resolved, before the
+    # versions that reference it
+    seen = set()
+    versions = FormVersion.objects.filter(form_id__in=form_ids).select_related('blob').order_by('form_id', 'version')
+    for version in versions.iterator(chunk_size=chunk_size):
+        if version.blob_id not in seen:
+            seen.add(version.blob_id)
+            yield _line({'type': 'schema', 'hash': version.blob_id, 'schema': version.schema})
+
+    forms = Form.objects.filter(pk__in=form_ids).order_by('pk').values(*FORM_FIELDS)
+    for form in forms.iterator(chunk_size=chunk_size):
+        yield _line({'type': 'form', **form})
+
+    versions = FormVersion.objects.filter(form_id__in=form_ids).order_by('form_id', 'version')
+    for form_id, number, blob_id, created_at in versions.values_list(
+        'form_id', 'version', 'blob_id', 'created_at'
+    ).iterator(chunk_size=chunk_size):
+        yield _line({'type': 'version', 'form_id': form_id, 'version': number, 'hash': blob_id, 'created_at': created_at})
+
+    for webhook in Webhook.objects.filter(form_id__in=form_ids).order_by('pk').values(*WEBHOOK_FIELDS):
+        if not include_secrets:
+            webhook['secret'] = ''
+        yield _line({'type': 'webhook', **webhook})
+
+    if include_submissions:
+        submissions = Submission.objects.filter(form_id__in=form_ids).order_by('form_id', 'created_at')
+        for submission in submissions.values(*SUBMISSION_FIELDS).iterator(chunk_size=chunk_size):
+            yield _line({'type': 'submission', **submission})
+
+
+def gzip_stream(chunks, level=6):
+    """Compress an iterable of byte strings into gzip output, incrementally"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def iter_lines(fileobj):
+    """Decompressed lines of a gzip bundle, read incrementally from ``fileobj``
+
+    At most ``INFLATE_CHUNK`` bytes are inflated at a time, and lines longer
+    than ``FORM_BUNDLE_MAX_LINE_BYTES`` or bundles larger than
+    ``FORM_BUNDLE_MAX_BYTES`` once decompressed raise ``BundleError``, so a
+    small, highly compressed upload cannot exhaust memory.
+    """
+    max_line = settings.FORM_BUNDLE_MAX_LINE_BYTES
+    remaining = settings.FORM_BUNDLE_MAX_BYTES
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    pending = b''
+    data = b''
+    while True:
+        if not data:
+            data = fileobj.read(INFLATE_CHUNK)
+            if not data:
+                break
+        output = decompressor.decompress(data, INFLATE_CHUNK)
+        data = decompressor.unconsumed_tail
+        remaining -= len(output)
+        if remaining < 0:
+            raise BundleError('Bundle is too large once decompressed')
+        *lines, pending = (pending + output).split(b'\n')
+        for line in lines:
+            if len(line) > max_line:
+                raise BundleError('Bundle record is too long')
+            yield line
+        if len(pending) > max_line:
+            raise BundleError('Bundle record is too long')
+    pending += decompressor.flush()
+    if len(pending) > max_line:
+        raise BundleError('Bundle record is too long')
+    if pending:
+        yield pending
+
+
+class BundleImporter:
+    """Write the records of a bundle for ``user`` in batches"""
+
+    # Buffers are flushed parents first so every reference is already remapped
+    ORDER = ('theme', 'schema', 'form', 'version', 'webhook', 'submission')
+
+    def __init__(self, user, batch_size=None):
+        self.user = user
+        self.batch_size = batch_size or settings.FORM_BUNDLE_BATCH_SIZE
+        self.form_ids = {}  # Bundle form id -> new form id
+        self.theme_ids = {}  # Bundle theme id -> new or existing theme id
+        self.schema_hashes = {}  # Bundle schema hash -> hash of the schema's content
+        self.buffers = {kind: [] for kind in self.ORDER}
+        self.lines = {kind: [] for kind in self.ORDER}  # Line numbers of the buffered records
+        self.seen_forms = set()
+        self.seen_versions = set()  # (bundle form id, version)
+        self.counts = Counter()
+        self.submission_counts = Counter()
+
+    def run(self, lines):
+        with transaction.atomic():
+            if not self._read(lines):
+                raise BundleError('Bundle is empty')
+            self.flush()
+            self._update_analytics()
+        return {kind: self.counts[kind] for kind in self.ORDER}
+
+    def _read(self, lines):
+        current = None
+        for number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                kind = record.pop('type')
+            except (ValueError, KeyError, AttributeError):
+                raise BundleError(f'Line {number} is not a bundle record')
+
+            if current is None:
+                if kind != 'bundle' or record.get('format') != BUNDLE_FORMAT:
+                    raise BundleError('Not a form bundle or unsupported bundle format')
+                current = kind
+                continue
+            if kind not in self.buffers:
+                raise BundleError(f'Unknown record type {kind!r} on line {number}')
+            try:
+                self._check(kind, record)
+            except BundleError as e:
+                raise BundleError(f'Line {number}: {e}')
+
+            # Records are grouped by type, so a type change means every parent
+            # of the upcoming records has been read
+            if kind != current:
+                self.flush()
+                current = kind
+            self.buffers[kind].append(record)
+            self.lines[kind].append(number)
+            if len(self.buffers[kind]) >= self.batch_size:
+                self.flush()
+        return current is not None
+
+    def _check(self, kind, record):
+        check_record(kind, record)
+        # Duplicates would only fail once written, as a constraint violation
+        if kind == 'form':
+            if record['id'] in self.seen_forms:
+                raise BundleError(f"duplicate form {record['id']}")
+            self.seen_forms.add(record['id'])
+        elif kind == 'version':
+            version = (record['form_id'], record['version'])
+            if version in self.seen_versions:
+                raise BundleError(f"duplicate version {record['version']} of form {record['form_id']}")
+            self.seen_versions.add(version)
+
+    def flush(self):
+        for kind in self.ORDER:
+            records = self.buffers[kind]
+            if records:
+                lines = self.lines[kind]
+                try:
+                    getattr(self, f'_write_{kind}s')(records)
+                except BundleError:
+                    raise
+                # COPY runs on the driver's cursor, which raises the driver's errors
+                except (DatabaseError, connection.Database.Error, ValueError) as e:
+                    raise BundleError(f'{kind} records on lines {lines[0]}-{lines[-1]} could not be imported: {e}')
+                self.counts[kind] += len(records)
+                self.buffers[kind] = []
+                self.lines[kind] = []
+
+    def _form_id(self, old_id):
+        try:
+            return self.form_ids[old_id]
+        except KeyError:
+            raise BundleError(f'Record references unknown form {old_id}')
+
+    def _write_themes(self, records):
+        # Themes the user already has (by name) are reused rather than copied
+        existing = dict(FormTheme.objects.filter(created_by=self.user).values_list('name', 'pk'))
+        themes = {}
+        for record in records:
+            if record['name'] in existing:
+                self.theme_ids[record['id']] = existing[record['name']]
+                continue
+            theme = FormTheme(created_by=self.user, **{field: record[field] for field in THEME_FIELDS})
+            theme.css_asset = write_theme_asset(theme)  # bulk_create skips FormTheme.save
+            themes[record['id']] = theme
+        FormTheme.objects.bulk_create(themes.values())
+        self.theme_ids.update({old_id: theme.pk for old_id, theme in themes.items()})
+
+    def _schema_hash(self, old_hash):
+        try:
+            return self.schema_hashes[old_hash]
+        except KeyError:
+            raise BundleError(f'Record references unknown schema {old_hash}')
+
+    def _write_schemas(self, records):
+        # Stored as keyframes; later publishes delta-encode against them. The
+        # hash is the blobs' primary key and shared across users, so it is
+        # recomputed rather than trusted.
+        blobs = {}
+        for record in records:
+            digest = schema_hash(record['schema'])
+            self.schema_hashes[record['hash']] = digest
+            blobs[digest] = SchemaBlob(
+                hash=digest, content=record['schema'], size=len(canonical_json(record['schema']).encode()),
+            )
+        SchemaBlob.objects.bulk_create(blobs.values(), ignore_conflicts=True)
+
+    def _write_forms(self, records):
+        forms = []
+        for record in records:
+            form = Form(
+                id=uuid.uuid4(),
+                created_by=self.user,
+                search_vector=build_search_vector(record['title'], record['description'], record['schema']),
+                theme_id=self.theme_ids.get(record.get('theme_id')),
+                **{field: record[field] for field in FORM_FIELDS if field not in ('id', 'theme_id')},
+            )
+            self.form_ids[record['id']] = form.pk
+            forms.append(form)
+        Form.objects.bulk_create(forms)
+        FormAnalytics.objects.bulk_create([FormAnalytics(form=form) for form in forms])
+        _restore_created_at(Form.all_objects, forms, records)
+
+    def _write_versions(self, records):
+        versions = FormVersion.objects.bulk_create([
+            FormVersion(
+                form_id=self._form_id(record['form_id']),
+                version=record['version'],
+                blob_id=self._schema_hash(record['hash']),
+                created_by=self.user,
+            )
+            for record in records
+        ])
+        _restore_created_at(FormVersion.objects, versions, records)
+
+    def _write_webhooks(self, records):
+        Webhook.objects.bulk_create([
+            Webhook(
+                created_by=self.user,
+                **{field: record[field] for field in WEBHOOK_FIELDS if field != 'form_id'},
+                form_id=self._form_id(record['form_id']),
+            )
+            for record in records
+        ])
+
+    def _write_submissions(self, records):
+        # COPY keeps the original created_at (bulk_create would overwrite the
+        # auto_now_add field) and is several times faster for large tables
+        rows = []
+        for record in records:
+            form_id = self._form_id(record['form_id'])
+            self.submission_counts[form_id] += 1
+            rows.append('\t'.join((
+                str(uuid.uuid4()),
+                str(form_id),
+                _copy_value(json.dumps(record['data'], separators=(',', ':'))),
+                _copy_value(record['ip_address']),
+                _copy_value(record['user_agent']),
+                't' if record['is_spam'] else 'f',
+                _copy_value(record['created_at']),
+            )))
+        rows.append('')
+        columns = ', '.join(('id',) + SUBMISSION_FIELDS)
+        with connection.cursor() as cursor:
+            cursor.cursor.copy_expert(
+                f'COPY {Submission._meta.db_table} ({columns}) FROM STDIN', io.StringIO('\n'.join(rows))
+            )
+
+    def _update_analytics(self):
+        for form_id, count in self.submission_counts.items():
+            FormAnalytics.objects.filter(form_id=form_id).update(submissions=F('submissions') + count)
+
+
+def _restore_created_at(manager, objs, records):
+    # bulk_create stamps auto_now_add fields with the current time; put the
+    # bundle's timestamps back with one UPDATE per batch
+    for obj, record in zip(objs, records):
+        obj.created_at = parse_datetime(record['created_at']) if record.get('created_at') else obj.created_at
+    manager.bulk_update(objs, ['created_at'])
+
+
+def import_bundle(user, fileobj, batch_size=None):
+    """Import a gzip bundle from a binary file object, returning counts per record type"""
+    try:
+        return BundleImporter(user, batch_size).run(iter_lines(fileobj))
+    except zlib.error:
+        raise BundleError('Bundle is not valid gzip data')
+
+
+def stash_bundle(upload):
+    """Store an uploaded bundle where the import job can read it, returning its path"""
+    return default_storage.save(f'{UPLOAD_DIR}/{uuid.uuid4().hex}.ndjson.gz', upload)
+
+
+def import_stashed_bundle(user, path):
+    """Import a bundle stored by ``stash_bundle`` and delete it"""
+    try:
+        with default_storage.open(path, 'rb') as fileobj:
+            return import_bundle(user, fileobj)
+    finally:
+        default_storage.delete(path)
@@ -0,0 +1,133 @@
+# apps/forms/conditions.py
+"""
+Server-side evaluation of conditional field visibility.
+
+Fields carry the builder's show/hide rule as ``conditionalVisibility``
+(``enabled``, ``field``, ``operator``, ``value``). The rules of a schema are
+compiled once into one closure per conditional field. Like the form renderer,
+every rule is checked against the data as submitted, hidden fields' values
+included, so a field depending on a hidden one is decided by that value;
+the keys of inactive fields are dropped only once every rule is checked.
+
+Operators mirror ``FormPreview.vue`` exactly, including JavaScript
+truthiness for ``is_empty``, strict equality and the coercions of
+``includes``: the server must hide precisely the fields the respondent did
+not see.
+"""
+import math
+from collections import namedtuple
+
+
+def _is_empty(value):
+    # Falsy in JavaScript; empty lists and objects are truthy there
+    return value is None or value is False or value == '' or (type(value) in (int, float) and not value)
+
+
+def _strict_equal(a, b):
+    # ``===``: booleans never equal numbers, NaN equals nothing
+    if isinstance(a, bool) or isinstance(b, bool):
+        return type(a) is type(b) and a == b
+    if isinstance(a, float) and math.isnan(a):
+        return False
+    return a == b
+
+
+def _js_string(value):
+    """``String(value)`` for JSON values"""
+    if value is None:
+        return 'null'
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, float):
+        if math.isnan(value):
+            return 'NaN'
+        if math.isinf(value):
+            return 'Infinity' if value > 0 else '-Infinity'
+        return str(int(value)) if value.is_integer() and abs(value) < 1e21 else repr(value)
+    if isinstance(value, list):
+        return ','.join('' if item is None else _js_string(item) for item in value)
+    if isinstance(value, dict):
+        return '[object Object]'
+    return str(value)
+
+
+def _contains(actual, expected):
+    # ``actualValue && actualValue.includes(expectedValue)``: strings coerce
+    # the needle to a string, arrays compare with SameValueZero
+    if _is_empty(actual):
+        return False
+    if isinstance(actual, str):
+        return _js_string(expected) in actual
+    if isinstance(actual, list):
+        if isinstance(expected, float) and math.isnan(expected):
+            return any(isinstance(item, float) and math.isnan(item) for item in actual)
+        return any(_strict_equal(item, expected) for item in actual)
+    return False
+
+
+def _predicate(operator, controller, expected):
+    """Closure telling whether a field is shown, given the submitted data"""
+    if operator == 'equals':
+        return lambda data: _strict_equal(data.get(controller), expected)
+    if operator == 'not_equals':
+        return lambda data: not _strict_equal(data.get(controller), expected)
+    if operator == 'contains':
+        return lambda data: _contains(data.get(controller), expected)
+    if operator == 'not_contains':
+        return lambda data: not _contains(data.get(controller), expected)
+    if operator == 'is_empty':
+        return lambda data: _is_empty(data.get(controller))
+    if operator == 'is_not_empty':
+        return lambda data: not _is_empty(data.get(controller))
+    return None  # Unknown operators never hide a field
+
+
+def _rule(field):
+    if not isinstance(field, dict) or field.get('id') in (None, ''):
+        return None
+    rule = field.get('conditionalVisibility')
+    if not isinstance(rule, dict) or not rule.get('enabled'):
+        return None
+    predicate = _predicate(rule.get('operator'), str(rule.get('field') or ''), rule.get('value'))
+    if predicate is None:
+        return None
+    return str(field['id']), predicate
+
+
+class ConditionalLogic(namedtuple('ConditionalLogic', ['steps', 'fields'])):
+    """Compiled visibility rules of one schema"""
+    __slots__ = ()
+
+    def apply(self, data):
+        """Return ``data`` without the keys of inactive fields, and the inactive field ids"""
+        if not isinstance(data, dict):
+            return data, frozenset()
+        # Every rule sees the submitted values, hidden ones included
+        inactive = frozenset(field_id for field_id, predicate in self.steps if not predicate(data))
+        if not inactive:
+            return data, inactive
+        return {key: value for key, value in data.items() if key not in inactive}, inactive
+
+
+def compile_conditions(form_schema):
+    """Compile a form schema's visibility rules, or None when no field has one"""
+    fields = form_schema.get('fields') if isinstance(form_schema, dict) else None
+    rules = [rule for rule in map(_rule, fields if isinstance(fields, list) else ()) if rule]
+    if not rules:
+        return None
+    return ConditionalLogic(steps=tuple(rules), fields=frozenset(field_id for field_id, _ in rules))
+
+
+def relax_required(schema, fields):
+    """Copy of a JSON Schema whose top-level ``required`` omits ``fields``
+
+    Conditional fields may only be required while they are shown, which the
+    snapshot checks itself after evaluating the rules.
+    """
+    required = schema.get('required') if isinstance(schema, dict) else None
+    if not isinstance(required, list):
+        return schema, frozenset()
+    conditional = frozenset(name for name in required if isinstance(name, str) and name in fields)
+    if not conditional:
+        return schema, conditional
+    return dict(schema, required=[name for name in required if name not in conditional]), conditional
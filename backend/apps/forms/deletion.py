@@ -0,0 +1,119 @@
+# apps/forms/deletion.py
+"""
+Soft deletion and background purging of forms.
+
+Deleting a form only stamps ``deleted_at``: the default ``Form`` manager and
+every form-scoped queryset hide it from then on, and its cached public
+payload, webhook routing table and snapshot are invalidated. A ``FormDeletion`` job then purges the
+dependent tables children-first, in primary-key ordered batches that each
+commit on their own, so a form with millions of submissions never holds long
+locks or one huge transaction. Jobs record per-table progress and are
+resumable: a rerun simply continues with whatever rows are left.
+"""
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from apps.analytics.models import FormAnalytics, FieldAnalytics
+from apps.submissions.models import Submission, SavedForm
+from apps.webhooks.models import Webhook, WebhookDelivery, WebhookLog, WebhookLogAggregate
+from apps.webhooks.routing import invalidate_routes
+from .models import Form, FormDeletion, FormVersion
+from .public_cache import invalidate_public_form
+from .snapshots import invalidate_form_snapshot
+
+logger = logging.getLogger(__name__)
+
+# (progress key, model, lookup to the form id), children first, so every
+# batch deletes rows nothing references anymore
+PURGE_STEPS = (
+    ('webhook_logs', WebhookLog, 'webhook__form_id'),
+    ('webhook_deliveries', WebhookDelivery, 'webhook__form_id'),
+    ('webhook_aggregates', WebhookLogAggregate, 'webhook__form_id'),
+    ('webhooks', Webhook, 'form_id'),
+    ('submissions', Submission, 'form_id'),
+    ('saved_forms', SavedForm, 'form_id'),
+    ('field_analytics', FieldAnalytics, 'form_analytics__form_id'),
+    ('form_analytics', FormAnalytics, 'form_id'),
+    ('versions', FormVersion, 'form_id'),
+)
+
+
+def soft_delete_forms(user, form_ids):
+    """Hide forms owned by ``user`` and queue their purge, returning the deletion jobs"""
+    now = timezone.now()
+    with transaction.atomic():
+        forms = list(
+            Form.objects.select_for_update().filter(created_by=user, pk__in=form_ids).values_list('pk', 'title')
+        )
+        Form.all_objects.filter(pk__in=[pk for pk, _ in forms]).update(deleted_at=now, updated_at=now)
+        deletions = FormDeletion.objects.bulk_create([
+            FormDeletion(form_id=pk, form_title=title, requested_by=user) for pk, title in forms
+        ])
+        transaction.on_commit(lambda: enqueue_purges(deletions))
+
+    for pk, _ in forms:
+        invalidate_public_form(pk)
+        invalidate_routes(pk)
+        invalidate_form_snapshot(pk)
+    return deletions
+
+
+def enqueue_purges(deletions):
+    from .tasks import purge_deleted_form
+    for deletion in deletions:
+        purge_deleted_form.delay(deletion.pk)
+
+
+def _save_progress(deletion, **fields):
+    fields['updated_at'] = timezone.now()
+    FormDeletion.objects.filter(pk=deletion.pk).update(progress=deletion.progress, **fields)
+
+
+def purge_form(deletion_id):
+    """Delete everything belonging to a soft-deleted form, one batch per transaction"""
+    # Claim the job so a duplicate or resumed task does not run alongside it
+    claimed = FormDeletion.objects.filter(pk=deletion_id, status__in=('pending', 'failed')).update(
+        status='running', error='', started_at=timezone.now(), updated_at=timezone.now()
+    )
+    if not claimed:
+        return None
+    deletion = FormDeletion.objects.get(pk=deletion_id)
+    batch_size = settings.FORM_PURGE_BATCH_SIZE
+
+    try:
+        for name, model, lookup in PURGE_STEPS:
+            rows = model.objects.filter(**{lookup: deletion.form_id})
+            step = deletion.progress.setdefault(name, {'total': rows.count(), 'deleted': 0})
+            _save_progress(deletion)
+            while True:
+                batch = list(rows.order_by('pk').values_list('pk', flat=True)[:batch_size])
+                if not batch:
+                    break
+                # The collector fast-deletes models without delete receivers or
+                # cascades: a single DELETE ... WHERE pk IN (...) per batch
+                with transaction.atomic():
+                    deleted, _ = model.objects.filter(pk__in=batch).delete()
+                step['deleted'] += deleted
+                _save_progress(deletion)
+
+        Form.all_objects.filter(pk=deletion.form_id).delete()
+    except Exception as e:
+        logger.exception(f"Purging form {deletion.form_id} failed")
+        _save_progress(deletion, status='failed', error=str(e))
+        raise
+
+    _save_progress(deletion, status='completed', finished_at=timezone.now())
+    return deletion.progress
+
+
+def resume_stalled_deletions():
+    """Re-queue jobs that never started, failed, or whose worker went away"""
+    stale_before = timezone.now() - timedelta(seconds=settings.FORM_PURGE_STALE_AFTER)
+    FormDeletion.objects.filter(status='running', updated_at__lt=stale_before).update(status='pending')
+    deletions = list(
+        FormDeletion.objects.filter(status__in=('pending', 'failed'), updated_at__lt=stale_before).only('pk')
+    )
+    enqueue_purges(deletions)
+    return len(deletions)
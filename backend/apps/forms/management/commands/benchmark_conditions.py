@@ -0,0 +1,78 @@
+import random
+import time
+from django.core.management.base import BaseCommand
+from jsonschema.exceptions import best_match
+from apps.forms.snapshots import FormSnapshot, compile_submission_rules, compile_validator
+
+OPERATORS = ('equals', 'not_equals', 'contains', 'not_contains', 'is_empty', 'is_not_empty')
+
+
+def synthetic_schema(fields, conditional_ratio, rng):
+    """A form of text fields where a share of them depend on an earlier field"""
+    schema = {'fields': [], 'jsonSchema': {'type': 'object', 'properties': {}, 'required': []}}
+    for index in range(fields):
+        field_id = f'field_{index}'
+        field = {'id': field_id, 'type': 'text', 'label': f'Field {index}'}
+        if index and rng.random() < conditional_ratio:
+            field['conditionalVisibility'] = {
+                'enabled': True,
+                'field': f'field_{rng.randrange(index)}',
+                'operator': rng.choice(OPERATORS),
+                'value': rng.choice(('yes', 'no', 'e')),
+            }
+        schema['fields'].append(field)
+        schema['jsonSchema']['properties'][field_id] = {'type': 'string', 'maxLength': 200}
+        if index % 3 == 0:
+            schema['jsonSchema']['required'].append(field_id)
+    return schema
+
+
+class Command(BaseCommand):
+    help = 'Measure conditional visibility evaluations per second on a synthetic form'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fields', type=int, default=500, help='Number of fields in the form')
+        parser.add_argument('--conditional', type=float, default=0.5, help='Share of fields with a visibility rule')
+        parser.add_argument('--payloads', type=int, default=200, help='Number of distinct payloads')
+        parser.add_argument('--seconds', type=float, default=2.0, help='Duration of each measurement')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        schema = synthetic_schema(options['fields'], options['conditional'], rng)
+
+        started = time.perf_counter()
+        validator, conditions, conditional_required = compile_submission_rules(schema)
+        compile_ms = (time.perf_counter() - started) * 1000
+        snapshot = FormSnapshot(
+            id='benchmark', status='published', schema_hash='', validator=validator,
+            conditions=conditions, conditional_required=conditional_required, webhook_events=frozenset(),
+        )
+        payloads = [
+            {f'field_{index}': rng.choice(('yes', 'no', 'maybe', '')) for index in range(options['fields'])}
+            for _ in range(options['payloads'])
+        ]
+        # What every submission cost before: the full payload against the full schema
+        unconditional = compile_validator(schema['jsonSchema'])
+        hidden = sum(len(conditions.apply(payload)[1]) for payload in payloads) / len(payloads)
+
+        self.stdout.write(
+            f"{options['fields']} fields, {len(conditions.steps)} rules, compiled with the validator in {compile_ms:.1f} ms, "
+            f"{hidden:.0f} fields hidden on average"
+        )
+        for label, run in (
+            ('rules only', conditions.apply),
+            ('rules + validation', snapshot.clean_data),
+            ('validating every field', lambda payload: best_match(unconditional.iter_errors(payload))),
+        ):
+            self.stdout.write(f'{label:<28}{self._rate(run, payloads, options["seconds"]):>12,.0f} evaluations/s')
+
+    def _rate(self, run, payloads, seconds):
+        count = 0
+        started = time.perf_counter()
+        deadline = started + seconds
+        while time.perf_counter() < deadline:
+            for payload in payloads:
+                run(payload)
+            count += len(payloads)
+        return count / (time.perf_counter() - started)
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+from apps.forms.bundles import gzip_stream, iter_bundle
+from apps.forms.models import Form
+
+User = get_user_model()
+
+class Command(BaseCommand):
+    help = 'Export forms with their versions, themes and webhooks as a gzip NDJSON bundle'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', type=str, help='Path of the bundle to write (.ndjson.gz)')
+        parser.add_argument('--user', type=str, required=True, help='Username or email of the form owner')
+        parser.add_argument('--form', dest='forms', action='append', default=[], help='Form id to export (repeatable, default: all)')
+        parser.add_argument('--include-submissions', action='store_true', help='Include form submissions')
+        parser.add_argument('--include-secrets', action='store_true', help='Include webhook signing secrets')
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(Q(username=options['user']) | Q(email=options['user'])).first()
+        if user is None:
+            raise CommandError(f"User not found: {options['user']}")
+
+        form_ids = options['forms'] or list(Form.objects.filter(created_by=user).values_list('pk', flat=True))
+        lines = iter_bundle(
+            user,
+            form_ids,
+            include_submissions=options['include_submissions'],
+            include_secrets=options['include_secrets'],
+        )
+        size = 0
+        with open(options['output'], 'wb') as output:
+            for chunk in gzip_stream(lines):
+                output.write(chunk)
+                size += len(chunk)
+
+        self.stdout.write(self.style.SUCCESS(f"Exported {len(form_ids)} forms to {options['output']} ({size} bytes)"))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+from apps.forms.bundles import BundleError, import_bundle
+
+User = get_user_model()
+
+class Command(BaseCommand):
+    help = 'Import a form bundle written by export_forms'
+
+    def add_arguments(self, parser):
+        parser.add_argument('bundle', type=str, help='Path of the bundle to read (.ndjson.gz)')
+        parser.add_argument('--user', type=str, required=True, help='Username or email of the new owner')
+        parser.add_argument('--batch-size', type=int, default=None, help='Rows per insert batch')
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(Q(username=options['user']) | Q(email=options['user'])).first()
+        if user is None:
+            raise CommandError(f"User not found: {options['user']}")
+
+        try:
+            with open(options['bundle'], 'rb') as bundle:
+                counts = import_bundle(user, bundle, batch_size=options['batch_size'])
+        except BundleError as e:
+            raise CommandError(str(e))
+
+        summary = ', '.join(f'{count} {kind}s' for kind, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f'Imported {summary}'))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Exists, OuterRef
+from apps.forms.models import FormVersion, SchemaBlob
+
+class Command(BaseCommand):
+    help = 'Delete schema blobs no longer referenced by any form version or delta'
+
+    def handle(self, *args, **options):
+        total = 0
+        # Removing a leaf delta can orphan its base, so sweep until stable
+        while True:
+            orphans = SchemaBlob.objects.filter(
+                ~Exists(FormVersion.objects.filter(blob=OuterRef('pk'))),
+                ~Exists(SchemaBlob.objects.filter(base=OuterRef('pk'))),
+            )
+            deleted, _ = orphans.delete()
+            if not deleted:
+                break
+            total += deleted
+
+        self.stdout.write(self.style.SUCCESS(f'Deleted {total} unreferenced schema blobs'))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+from apps.forms.models import FormVersion
+
+class Command(BaseCommand):
+    help = 'List the published forms whose current schema is the most expensive to validate'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=20, help='Number of forms to list')
+
+    def handle(self, *args, **options):
+        versions = (
+            FormVersion.objects.filter(
+                form__status='published',
+                form__deleted_at__isnull=True,
+                version=F('form__version'),
+                validation_cost_ms__isnull=False,
+            )
+            .select_related('form')
+            .order_by('-validation_cost_ms')[:options['limit']]
+        )
+
+        for version in versions:
+            issues = len(version.lint_report.get('issues', ()))
+            self.stdout.write(
+                f'{version.validation_cost_ms:>10.3f} ms  {version.form_id}  v{version.version}  '
+                f'{issues} issues  {version.form.title}'
+            )
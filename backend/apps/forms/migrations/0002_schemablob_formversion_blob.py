@@ -0,0 +1,59 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+from apps.forms.schema_delta import apply_delta, canonical_json, schema_hash
+
+
+def move_schemas_to_blobs(apps, schema_editor):
+    """Store every existing version schema once, as a full (keyframe) blob"""
+    FormVersion = apps.get_model('forms', 'FormVersion')
+    SchemaBlob = apps.get_model('forms', 'SchemaBlob')
+
+    for version in FormVersion.objects.only('id', 'schema').iterator(chunk_size=500):
+        digest = schema_hash(version.schema)
+        SchemaBlob.objects.get_or_create(
+            pk=digest,
+            defaults={'content': version.schema, 'size': len(canonical_json(version.schema).encode())},
+        )
+        FormVersion.objects.filter(pk=version.pk).update(blob_id=digest)
+
+
+def restore_schemas_from_blobs(apps, schema_editor):
+    FormVersion = apps.get_model('forms', 'FormVersion')
+    SchemaBlob = apps.get_model('forms', 'SchemaBlob')
+
+    def resolve(blob):
+        if blob.delta is None:
+            return blob.content
+        return apply_delta(resolve(SchemaBlob.objects.get(pk=blob.base_id)), blob.delta)
+
+    for version in FormVersion.objects.select_related('blob').iterator(chunk_size=500):
+        FormVersion.objects.filter(pk=version.pk).update(schema=resolve(version.blob))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forms', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SchemaBlob',
+            fields=[
+                ('hash', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('content', models.JSONField(blank=True, null=True)),
+                ('delta', models.JSONField(blank=True, null=True)),
+                ('depth', models.PositiveSmallIntegerField(default=0)),
+                ('size', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('base', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='deltas', to='forms.schemablob')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='formversion',
+            name='blob',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='versions', to='forms.schemablob'),
+        ),
+        migrations.RunPython(move_schemas_to_blobs, restore_schemas_from_blobs),
+    ]
@@ -0,0 +1,21 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forms', '0002_schemablob_formversion_blob'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='formversion',
+            name='schema',
+        ),
+        migrations.AlterField(
+            model_name='formversion',
+            name='blob',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='versions', to='forms.schemablob'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.5 on 2026-10-19 13:33
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+from apps.forms.search import build_search_vector
+
+
+def populate_search_vectors(apps, schema_editor):
+    Form = apps.get_model('forms', 'Form')
+    for form in Form.objects.only('id', 'title', 'description', 'schema').iterator(chunk_size=500):
+        Form.objects.filter(pk=form.pk).update(
+            search_vector=build_search_vector(form.title, form.description, form.schema)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forms', '0003_remove_formversion_schema'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='form',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(populate_search_vectors, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='form',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='forms_form_search_gin'),
+        ),
+    ]
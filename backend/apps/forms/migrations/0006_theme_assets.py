@@ -0,0 +1,33 @@
+# Generated by Django 4.2.5 on 2026-10-19 13:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from apps.forms.theme_assets import write_theme_asset
+
+
+def compile_existing_themes(apps, schema_editor):
+    FormTheme = apps.get_model('forms', 'FormTheme')
+    for theme in FormTheme.objects.iterator(chunk_size=500):
+        FormTheme.objects.filter(pk=theme.pk).update(css_asset=write_theme_asset(theme))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forms', '0005_form_soft_delete'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='form',
+            name='theme',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='forms', to='forms.formtheme'),
+        ),
+        migrations.AddField(
+            model_name='formtheme',
+            name='css_asset',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.RunPython(compile_existing_themes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.5 on 2026-10-19 13:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forms', '0006_theme_assets'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='formversion',
+            name='lint_report',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='formversion',
+            name='validation_cost_ms',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='formversion',
+            index=models.Index(fields=['-validation_cost_ms'], name='forms_version_cost_idx'),
+        ),
+    ]
@@ -1,11 +1,27 @@
+import json
 import uuid
+from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.core.validators import RegexValidator
 from django.utils import timezone
+from apps.core.caching import LocalLRUCache
+from .schema_delta import apply_delta, canonical_json, make_delta, schema_hash
+from .search import build_search_vector
+from .theme_assets import theme_asset_url, write_theme_asset
 
 User = get_user_model()
 
+# Resolved schemas are immutable per hash, so entries never need invalidation
+_resolved_schemas = LocalLRUCache(maxsize=settings.FORM_SCHEMA_CACHE_SIZE, ttl=86400)
+
+class FormManager(models.Manager):
+	"""Default manager that hides forms pending deletion"""
+	def get_queryset(self):
+		return super().get_queryset().filter(deleted_at__isnull=True)
+
 class Form(models.Model):
 	STATUS_CHOICES = [
 		('draft', 'Draft'),
@@ -23,6 +39,12 @@ class Form(models.Model):
 	created_at = models.DateTimeField(auto_now_add=True)
 	updated_at = models.DateTimeField(auto_now=True)
 	published_at = models.DateTimeField(null=True, blank=True)
+	theme = models.ForeignKey('FormTheme', null=True, blank=True, on_delete=models.SET_NULL, related_name='forms')
+	search_vector = SearchVectorField(null=True, editable=False)  # Maintained on save, see search.py
+	deleted_at = models.DateTimeField(null=True, blank=True, editable=False)  # Soft-deleted, purge pending
+
+	objects = FormManager()
+	all_objects = models.Manager()  # Includes soft-deleted forms, for the purge job
 
 	class Meta:
 		ordering = ['-updated_at']
@@ -31,6 +53,7 @@ class Form(models.Model):
 			models.Index(fields=['created_by', 'status']),
 			models.Index(fields=['-updated_at']),
 			models.Index(fields=['published_at']),
+			GinIndex(fields=['search_vector'], name='forms_form_search_gin'),
 		]
 	def __str__(self) -> str:
 		return self.title
@@ -38,28 +61,146 @@ class Form(models.Model):
 	def save(self, *args, **kwargs):
 		if self.status == 'published' and self.published_at is None:
 			self.published_at = timezone.now()
+
+		update_fields = kwargs.get('update_fields')
+		if update_fields is None or {'title', 'description', 'schema'} & set(update_fields):
+			self.search_vector = build_search_vector(self.title, self.description, self.schema)
+			if update_fields is not None:
+				kwargs['update_fields'] = {*update_fields, 'search_vector'}
 		super().save(*args, **kwargs)
+		# The vector was written as an expression; reload it lazily if ever accessed
+		self.__dict__.pop('search_vector', None)
+
+class SchemaBlob(models.Model):
+	"""Content-addressed form schema shared by every version with the same content"""
+	hash = models.CharField(max_length=64, primary_key=True)
+	content = models.JSONField(null=True, blank=True)  # Full schema (keyframes only)
+	base = models.ForeignKey('self', null=True, blank=True, on_delete=models.PROTECT, related_name='deltas')
+	delta = models.JSONField(null=True, blank=True)  # Encoded against base, see schema_delta
+	depth = models.PositiveSmallIntegerField(default=0)  # Length of the delta chain
+	size = models.PositiveIntegerField(default=0)  # Canonical JSON size in bytes
+	created_at = models.DateTimeField(auto_now_add=True)
+
+	def __str__(self) -> str:
+		return self.hash
+
+	@classmethod
+	def build(cls, schema, base=None, digest=None):
+		"""Unsaved blob for ``schema``, delta-encoded against ``base`` when worthwhile"""
+		digest = digest or schema_hash(schema)
+		size = len(canonical_json(schema).encode())
+		if (
+			base is not None
+			and settings.FORM_SCHEMA_DELTA_ENCODING
+			and base.depth < settings.FORM_SCHEMA_DELTA_MAX_DEPTH
+		):
+			delta = make_delta(base.get_schema(), schema)
+			if len(canonical_json(delta).encode()) < size * settings.FORM_SCHEMA_DELTA_MAX_RATIO:
+				return cls(hash=digest, base=base, delta=delta, depth=base.depth + 1, size=size)
+		return cls(hash=digest, content=schema, size=size)
+
+	@classmethod
+	def store(cls, schema, base=None):
+		"""Return the blob holding ``schema``, creating it if needed"""
+		digest = schema_hash(schema)
+		blob = cls.objects.filter(pk=digest).first()
+		if blob is not None:
+			return blob
+		blob = cls.build(schema, base, digest)
+		blob, _ = cls.objects.get_or_create(
+			pk=digest,
+			defaults={field: getattr(blob, field) for field in ('content', 'base', 'delta', 'depth', 'size')},
+		)
+		return blob
+
+	def get_schema(self):
+		"""Resolve the full schema, walking the delta chain on a cache miss"""
+		cached = _resolved_schemas.get(self.pk)
+		if cached is not None:
+			return json.loads(cached)
+		if self.delta is None:
+			schema = self.content
+		else:
+			schema = apply_delta(self.base.get_schema(), self.delta)
+		_resolved_schemas.set(self.pk, canonical_json(schema))
+		return schema
+
+class FormDeletion(models.Model):
+	"""Background purge of a soft-deleted form and its dependent rows"""
+	STATUS_CHOICES = [
+		('pending', 'Pending'),
+		('running', 'Running'),
+		('completed', 'Completed'),
+		('failed', 'Failed'),
+	]
+
+	form_id = models.UUIDField(db_index=True)  # Not a foreign key: the form row is purged last
+	form_title = models.CharField(max_length=255)
+	requested_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='form_deletions')
+	status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+	progress = models.JSONField(default=dict)  # {table: {'total': n, 'deleted': n}}
+	error = models.TextField(blank=True)
+	created_at = models.DateTimeField(auto_now_add=True)
+	updated_at = models.DateTimeField(auto_now=True)
+	started_at = models.DateTimeField(null=True, blank=True)
+	finished_at = models.DateTimeField(null=True, blank=True)
+
+	class Meta:
+		ordering = ['-created_at']
+		indexes = [
+			models.Index(fields=['requested_by', '-created_at']),
+			models.Index(fields=['status', 'updated_at']),
+		]
+	def __str__(self) -> str:
+		return f"Deletion of {self.form_title} ({self.status})"
 
 class FormVersion(models.Model):
 	form = models.ForeignKey(Form, on_delete=models.CASCADE, related_name='versions')
 	version = models.PositiveIntegerField()
-	schema = models.JSONField(default=dict)
+	blob = models.ForeignKey(SchemaBlob, on_delete=models.PROTECT, related_name='versions')
+	validation_cost_ms = models.FloatField(null=True, blank=True)  # Worst sample validation time at publish
+	lint_report = models.JSONField(default=dict, blank=True)  # Issues and stats, see schema_lint
 	created_at = models.DateTimeField(auto_now_add=True)
 	created_by = models.ForeignKey(User, on_delete=models.CASCADE)
 
 	class Meta:
 		unique_together = ('form', 'version')
 		ordering = ['-version']
+		indexes = [
+			models.Index(fields=['-validation_cost_ms'], name='forms_version_cost_idx'),
+		]
 	def __str__(self) -> str:
 		return f"{self.form.title} - v{self.version}"
+
+	@property
+	def schema(self):
+		return self.blob.get_schema()
+
+	@property
+	def schema_hash(self):
+		return self.blob_id
 	
 class FormTheme(models.Model):
     name = models.CharField(max_length=100)
     primary_color = models.CharField(max_length=7, validators=[RegexValidator(r'^#[0-9A-Fa-f]{6}$')])
     secondary_color = models.CharField(max_length=7, validators=[RegexValidator(r'^#[0-9A-Fa-f]{6}$')])
     font_family = models.CharField(max_length=100, default='Arial, sans-serif')
+    css_asset = models.CharField(max_length=64, blank=True, editable=False)  # Compiled stylesheet, see theme_assets
     created_by = models.ForeignKey(User, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.name
+    
+    def save(self, *args, **kwargs):
+        previous = self.css_asset
+        self.css_asset = write_theme_asset(self)
+        self.css_changed = self.css_asset != previous  # Read by the post_save signal
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'css_asset'}
+        super().save(*args, **kwargs)
+    
+    @property
+    def css_url(self):
+        return theme_asset_url(self.css_asset) if self.css_asset else None
@@ -0,0 +1,66 @@
+# apps/forms/public_cache.py
+"""
+Pre-rendered public form payloads.
+
+The public representation of a published form is rendered to JSON bytes once
+(on publish / restore) and served verbatim from a ``TieredCache`` (per-process
+LRU in front of Redis), so steady-state public fetches never touch Postgres.
+Ids of forms that do not exist or are not published are cached as misses for
+``PUBLIC_FORM_NEGATIVE_CACHE_TIMEOUT`` seconds, and a payload that dropped
+out is rendered once however many requests ask for it.
+"""
+import hashlib
+from collections import namedtuple
+from django.conf import settings
+from django.utils.http import quote_etag
+from rest_framework.renderers import JSONRenderer
+from apps.core.caching import TieredCache
+from .models import Form
+from .serializers import PublicFormSerializer
+
+NAMESPACE = 'forms.public'
+
+PublicFormPayload = namedtuple('PublicFormPayload', ['etag', 'body'])
+
+_payloads = TieredCache(
+    NAMESPACE,
+    timeout=settings.PUBLIC_FORM_CACHE_TIMEOUT,
+    local_size=settings.PUBLIC_FORM_LOCAL_CACHE_SIZE,
+    local_ttl=settings.PUBLIC_FORM_LOCAL_CACHE_TTL,
+    negative_timeout=settings.PUBLIC_FORM_NEGATIVE_CACHE_TIMEOUT,
+)
+
+
+def public_form_etag(form_id, version, updated_at, theme_asset=''):
+    """Strong ETag for the public representation of a form"""
+    raw = f"{form_id}:{version}:{updated_at.isoformat()}:{theme_asset}"
+    return quote_etag(hashlib.sha256(raw.encode()).hexdigest()[:32])
+
+
+def render_public_form(form):
+    """Render the slim public representation of a form to JSON bytes"""
+    body = JSONRenderer().render(PublicFormSerializer(form).data)
+    theme_asset = form.theme.css_asset if form.theme_id else ''
+    return PublicFormPayload(public_form_etag(form.pk, form.version, form.updated_at, theme_asset), body)
+
+
+def store_public_form(form):
+    """Pre-render a published form and push it into both cache tiers"""
+    payload = render_public_form(form)
+    _payloads.set(_payloads.key(form.pk), payload)
+    return payload
+
+
+def _render_published(form_id):
+    form = Form.objects.filter(pk=form_id, status='published').select_related('theme').first()
+    return render_public_form(form) if form is not None else None
+
+
+def load_public_form(form_id):
+    """Return the payload of a published form, None if there is none; both are cached"""
+    return _payloads.get_or_compute(_payloads.key(form_id), lambda: _render_published(form_id))
+
+
+def invalidate_public_form(form_id):
+    """Drop a form's payload (or cached miss) from Redis and from every process's LRU"""
+    _payloads.invalidate(_payloads.key(form_id))
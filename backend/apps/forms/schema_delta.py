@@ -0,0 +1,105 @@
+# apps/forms/schema_delta.py
+"""
+Content hashing and structural delta encoding of form schemas.
+
+A delta describes a target JSON document relative to a base document:
+
+- ``{'$v': value}`` replaces the value outright;
+- ``{'$o': {key: delta}, '$r': [keys]}`` patches an object, recursing into
+  changed keys and dropping removed ones;
+- ``{'$a': [op, ...]}`` rebuilds an array, where each op is either the index
+  of an identical base item, a ``[start, stop]`` run of identical base items,
+  ``{'$p': index, '$d': delta}`` patching the base item with the same ``id``
+  or ``{'$v': item}`` for a new item.
+
+Unchanged keys and array items are never repeated, so republishing a form
+with a large option list only stores what actually changed.
+"""
+import hashlib
+import json
+
+
+def canonical_json(value):
+    """Deterministic compact JSON encoding used for hashing and size accounting"""
+    return json.dumps(value, sort_keys=True, separators=(',', ':'), default=str)
+
+
+def schema_hash(schema):
+    """Stable content hash of a JSON schema"""
+    return hashlib.sha256(canonical_json(schema).encode()).hexdigest()
+
+
+def make_delta(base, target):
+    """Encode ``target`` relative to ``base``"""
+    if isinstance(base, dict) and isinstance(target, dict):
+        changes = {}
+        for key, value in target.items():
+            if key not in base:
+                changes[key] = {'$v': value}
+            elif base[key] != value:
+                changes[key] = make_delta(base[key], value)
+        return {'$o': changes, '$r': [key for key in base if key not in target]}
+
+    if isinstance(base, list) and isinstance(target, list):
+        by_value = {}
+        by_id = {}
+        for index, item in enumerate(base):
+            by_value.setdefault(canonical_json(item), index)
+            if isinstance(item, dict) and 'id' in item:
+                by_id.setdefault(canonical_json(item['id']), index)
+
+        ops = []
+        for item in target:
+            index = by_value.get(canonical_json(item))
+            if index is not None:
+                ops.append(index)
+                continue
+            index = by_id.get(canonical_json(item['id'])) if isinstance(item, dict) and 'id' in item else None
+            if index is not None:
+                ops.append({'$p': index, '$d': make_delta(base[index], item)})
+            else:
+                ops.append({'$v': item})
+        return {'$a': _collapse_runs(ops)}
+
+    return {'$v': target}
+
+
+def _collapse_runs(ops):
+    """Replace runs of consecutive base indexes with ``[start, stop]`` slices"""
+    collapsed = []
+    for op in ops:
+        if isinstance(op, int) and collapsed:
+            last = collapsed[-1]
+            if isinstance(last, int) and last + 1 == op:
+                collapsed[-1] = [last, op + 1]
+                continue
+            if isinstance(last, list) and last[1] == op:
+                last[1] = op + 1
+                continue
+        collapsed.append(op)
+    return collapsed
+
+
+def apply_delta(base, delta):
+    """Rebuild the target document from ``base`` and a delta produced by ``make_delta``"""
+    if '$v' in delta:
+        return delta['$v']
+
+    if '$o' in delta:
+        removed = set(delta['$r'])
+        result = {key: value for key, value in base.items() if key not in removed}
+        for key, change in delta['$o'].items():
+            result[key] = apply_delta(base.get(key), change)
+        return result
+
+    result = []
+    for op in delta['$a']:
+        if isinstance(op, int):
+            result.append(base[op])
+        elif isinstance(op, list):
+            result.extend(base[op[0]:op[1]])
+        elif '$p' in op:
+            result.append(apply_delta(base[op['$p']], op['$d']))
+        else:
+            result.append(op['$v'])
+    return result
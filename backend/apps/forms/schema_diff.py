@@ -0,0 +1,90 @@
+# apps/forms/schema_diff.py
+"""
+Field-level structural diff between two form schemas.
+
+Fields are matched by ``id`` (falling back to their position when a field has
+no id) and reported as added, removed or changed, with the properties that
+changed. Top-level schema keys other than ``fields`` (title, settings, ...)
+are reported separately.
+"""
+
+
+def _field_key(field, index):
+    if isinstance(field, dict) and field.get('id') not in (None, ''):
+        return str(field['id'])
+    return f'#{index}'
+
+
+def _index_fields(schema):
+    fields = schema.get('fields') if isinstance(schema, dict) else None
+    if not isinstance(fields, list):
+        return {}
+    return {_field_key(field, index): (index, field) for index, field in enumerate(fields)}
+
+
+def _summary(key, field):
+    summary = {'id': key}
+    if isinstance(field, dict):
+        summary['type'] = field.get('type')
+        summary['label'] = field.get('label')
+    return summary
+
+
+def _property_changes(base, target):
+    if not isinstance(base, dict) or not isinstance(target, dict):
+        return {'value': {'from': base, 'to': target}}
+    changes = {}
+    for key in sorted(base.keys() | target.keys()):
+        if base.get(key) != target.get(key):
+            changes[key] = {'from': base.get(key), 'to': target.get(key)}
+    return changes
+
+
+def diff_schemas(base, target):
+    """Return the added, removed and changed fields between two schemas"""
+    base_fields = _index_fields(base)
+    target_fields = _index_fields(target)
+
+    added = [
+        {**_summary(key, field), 'position': index, 'field': field}
+        for key, (index, field) in target_fields.items()
+        if key not in base_fields
+    ]
+    removed = [
+        {**_summary(key, field), 'position': index}
+        for key, (index, field) in base_fields.items()
+        if key not in target_fields
+    ]
+
+    # A field only counts as moved when its order relative to the fields
+    # present in both versions changes, not when others are added or removed
+    shared = [key for key in base_fields if key in target_fields]
+    base_rank = {key: rank for rank, key in enumerate(shared)}
+    target_rank = {key: rank for rank, key in enumerate(sorted(shared, key=lambda k: target_fields[k][0]))}
+
+    changed = []
+    for key in sorted(shared, key=lambda k: target_fields[k][0]):
+        base_index, base_field = base_fields[key]
+        index, field = target_fields[key]
+        moved = base_rank[key] != target_rank[key]
+        if base_field == field and not moved:
+            continue
+        entry = {**_summary(key, field), 'changes': _property_changes(base_field, field)}
+        if moved:
+            entry['position'] = {'from': base_index, 'to': index}
+        changed.append(entry)
+
+    base = base if isinstance(base, dict) else {}
+    target = target if isinstance(target, dict) else {}
+    settings_changes = {
+        key: {'from': base.get(key), 'to': target.get(key)}
+        for key in sorted((base.keys() | target.keys()) - {'fields'})
+        if base.get(key) != target.get(key)
+    }
+
+    return {
+        'added': added,
+        'removed': removed,
+        'changed': changed,
+        'schema': settings_changes,
+    }
@@ -0,0 +1,366 @@
+# apps/forms/schema_lint.py
+"""
+Publish-time complexity budget for submission JSON Schemas.
+
+Every submission is validated against the published schema, so a schema that
+is expensive to evaluate costs CPU on each request. Before a version is
+published the schema is checked statically (nesting depth, enum sizes, total
+number of rules, backtracking-prone ``pattern`` regexes) and then timed
+against sample payloads generated from it. The report, including the
+measured cost, is stored on the ``FormVersion``.
+"""
+import time
+from django.conf import settings
+from jsonschema.exceptions import SchemaError
+
+try:
+    import re._parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+ERROR = 'error'
+
+# Keywords holding one subschema, a list of subschemas or a map of them
+SUBSCHEMA_KEYS = (
+    'additionalProperties', 'items', 'additionalItems', 'contains', 'propertyNames', 'not',
+    'if', 'then', 'else', 'unevaluatedItems', 'unevaluatedProperties',
+)
+SUBSCHEMA_LIST_KEYS = ('allOf', 'anyOf', 'oneOf', 'prefixItems', 'items')
+SUBSCHEMA_MAP_KEYS = ('properties', 'patternProperties', '$defs', 'definitions', 'dependentSchemas')
+# Keywords that do not constrain the instance
+ANNOTATION_KEYS = {
+    '$schema', '$id', '$comment', '$anchor', 'title', 'description', 'default', 'examples',
+    'deprecated', 'readOnly', 'writeOnly',
+}
+
+SAMPLE_ROUNDS = 5
+ADVERSARIAL_LENGTH = 20  # Long enough to expose super-linear patterns, short enough to finish
+
+
+def _issue(severity, code, path, message):
+    return {'severity': severity, 'code': code, 'path': path or '/', 'message': message}
+
+
+def iter_subschemas(schema):
+    """Yield ``(path, node, depth)`` for every subschema, iteratively"""
+    stack = [('', schema, 1)]
+    while stack:
+        path, node, depth = stack.pop()
+        yield path, node, depth
+        if not isinstance(node, dict):
+            continue
+        for key in SUBSCHEMA_KEYS:
+            if isinstance(node.get(key), dict):
+                stack.append((f'{path}/{key}', node[key], depth + 1))
+        for key in SUBSCHEMA_LIST_KEYS:
+            if isinstance(node.get(key), list):
+                stack.extend((f'{path}/{key}/{index}', child, depth + 1) for index, child in enumerate(node[key]))
+        for key in SUBSCHEMA_MAP_KEYS:
+            if isinstance(node.get(key), dict):
+                stack.extend((f'{path}/{key}/{name}', child, depth + 1) for name, child in node[key].items())
+
+
+# Regex analysis ------------------------------------------------------------
+
+ANY = None  # "Any character" first set
+CATEGORY_CHARS = {
+    sre_parse.CATEGORY_DIGIT: frozenset(range(48, 58)),
+    sre_parse.CATEGORY_SPACE: frozenset((9, 10, 11, 12, 13, 32)),
+    sre_parse.CATEGORY_WORD: frozenset([*range(48, 58), *range(65, 91), *range(97, 123), 95]),
+}
+REPEATS = (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT)
+
+
+def _union(first, other):
+    return ANY if first is ANY or other is ANY else first | other
+
+
+def _overlaps(first, other):
+    if first is ANY or other is ANY:
+        return True
+    return bool(first & other)
+
+
+def _char_set(op, av):
+    if op == sre_parse.LITERAL:
+        return frozenset((av,))
+    if op == sre_parse.IN:
+        chars = frozenset()
+        for item_op, item_av in av:
+            if item_op == sre_parse.NEGATE:
+                return ANY
+            if item_op == sre_parse.LITERAL:
+                chars |= {item_av}
+            elif item_op == sre_parse.RANGE and item_av[1] - item_av[0] <= 1024:
+                chars |= frozenset(range(item_av[0], item_av[1] + 1))
+            elif item_op == sre_parse.CATEGORY and item_av in CATEGORY_CHARS:
+                chars |= CATEGORY_CHARS[item_av]
+            else:
+                return ANY
+        return chars
+    return ANY
+
+
+def _first(items):
+    """Characters a sequence can start with, and whether it can match empty"""
+    first = frozenset()
+    for op, av in items:
+        if op == sre_parse.AT:
+            continue
+        if op == sre_parse.SUBPATTERN:
+            chars, nullable = _first(av[-1])
+        elif op in REPEATS or op == getattr(sre_parse, 'POSSESSIVE_REPEAT', object()):
+            chars, nullable = _first(av[2])
+            nullable = nullable or av[0] == 0
+        elif op == sre_parse.BRANCH:
+            chars, nullable = frozenset(), False
+            for branch in av[1]:
+                branch_chars, branch_nullable = _first(branch)
+                chars = _union(chars, branch_chars)
+                nullable = nullable or branch_nullable
+        elif op in (sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+            continue
+        else:
+            chars, nullable = _char_set(op, av), False
+        first = _union(first, chars)
+        if not nullable:
+            return first, False
+    return first, True
+
+
+def _ambiguous_branch(items, loop_first):
+    """Whether a branch inside a loop offers two ways to match the same input"""
+    for op, av in items:
+        if op == sre_parse.SUBPATTERN:
+            if _ambiguous_branch(av[-1], loop_first):
+                return True
+        elif op == sre_parse.BRANCH:
+            firsts = [_first(branch) for branch in av[1]]
+            for index, (chars, nullable) in enumerate(firsts):
+                others = [other for other_index, (other, _) in enumerate(firsts) if other_index != index]
+                if nullable and any(_overlaps(other, loop_first) for other in others):
+                    return True
+                if any(_overlaps(chars, other) for other, _ in firsts[index + 1:]):
+                    return True
+    return False
+
+
+def _delimited(loop_body, chars):
+    """Whether every iteration of a loop must match a character outside ``chars``.
+
+    Such a delimiter fixes where one iteration ends and the next begins, so a
+    quantifier nested inside the loop cannot split the input in several ways.
+    """
+    for op, av in loop_body:
+        if op == sre_parse.SUBPATTERN:
+            if _delimited(av[-1], chars):
+                return True
+        elif op in (sre_parse.LITERAL, sre_parse.IN):
+            item_chars = _char_set(op, av)
+            if item_chars is not ANY and not _overlaps(item_chars, chars):
+                return True
+        elif op in REPEATS and av[0] > 0 and _delimited(av[2], chars):
+            return True
+    return False
+
+
+def _backtracking_risk(items, loop_body=None):
+    """Describe the first super-linear construct in a parsed pattern, or None"""
+    for op, av in items:
+        if op in REPEATS:
+            low, high, body = av
+            if loop_body is not None and high > low and not _delimited(loop_body, _first(body)[0]):
+                return 'nested quantifier'
+            if high > 1:
+                loop_first, _ = _first(body)
+                if _ambiguous_branch(body, loop_first):
+                    return 'overlapping alternation inside a quantifier'
+                risk = _backtracking_risk(body, body)
+            else:
+                risk = _backtracking_risk(body, loop_body)
+        elif op == sre_parse.SUBPATTERN:
+            risk = _backtracking_risk(av[-1], loop_body)
+        elif op == sre_parse.BRANCH:
+            risk = next((r for r in (_backtracking_risk(b, loop_body) for b in av[1]) if r), None)
+        elif op in (sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+            risk = _backtracking_risk(av[1], loop_body)
+        else:
+            risk = None  # Possessive repeats and atomic groups never backtrack
+        if risk:
+            return risk
+    return None
+
+
+def lint_pattern(pattern):
+    """Return a problem description for a regex, or None when it looks safe"""
+    if len(pattern) > settings.FORM_SCHEMA_MAX_PATTERN_LENGTH:
+        return f'longer than {settings.FORM_SCHEMA_MAX_PATTERN_LENGTH} characters'
+    try:
+        parsed = sre_parse.parse(pattern)
+    except Exception as e:
+        return f'invalid regular expression ({e})'
+    risk = _backtracking_risk(list(parsed))
+    return f'{risk} may cause catastrophic backtracking' if risk else None
+
+
+# Sample payloads -----------------------------------------------------------
+
+def _adversarial_string(pattern):
+    """A long run of a character the pattern loops over, followed by a mismatch"""
+    try:
+        chars, _ = _first(list(sre_parse.parse(pattern)))
+    except Exception:
+        chars = ANY
+    char = chr(min(chars)) if chars else 'a'
+    return char * ADVERSARIAL_LENGTH + '\x00'
+
+
+def _sample(node, full, adversarial, depth=0):
+    if not isinstance(node, dict) or depth > settings.FORM_SCHEMA_MAX_DEPTH:
+        return None
+    if 'const' in node:
+        return node['const']
+    if isinstance(node.get('enum'), list) and node['enum']:
+        return node['enum'][-1]  # Enum membership is a linear scan
+    for key in ('allOf', 'anyOf', 'oneOf'):
+        if isinstance(node.get(key), list) and node[key]:
+            return _sample(node[key][-1], full, adversarial, depth + 1)
+
+    kind = node.get('type')
+    if isinstance(kind, list):
+        kind = next((k for k in kind if k != 'null'), 'null')
+    if kind is None:
+        kind = 'object' if 'properties' in node else 'array' if 'items' in node else 'string'
+
+    if kind == 'object':
+        properties = node.get('properties') if isinstance(node.get('properties'), dict) else {}
+        names = list(properties) if full else [name for name in node.get('required', ()) if isinstance(name, str)]
+        return {name: _sample(properties.get(name, {}), full, adversarial, depth + 1) for name in names}
+    if kind == 'array':
+        items = node.get('items') if isinstance(node.get('items'), dict) else {}
+        count = max(node.get('minItems', 0), 1 if not adversarial else min(node.get('maxItems', 20), 20))
+        count = min(count, 1000)
+        return [_sample(items, full, adversarial, depth + 1) for _ in range(count)]
+    if kind == 'string':
+        if adversarial and isinstance(node.get('pattern'), str):
+            return _adversarial_string(node['pattern'])
+        if node.get('format') == 'email':
+            return 'user@example.com'
+        length = node.get('minLength', 1) if not adversarial else node.get('maxLength', 256)
+        return 'x' * min(length, 4096)
+    if kind in ('integer', 'number'):
+        return node.get('minimum', node.get('exclusiveMinimum', 0))
+    if kind == 'boolean':
+        return True
+    return None
+
+
+def sample_payloads(schema, adversarial=True):
+    """Minimal, complete and (optionally) adversarial payloads for a schema"""
+    samples = [_sample(schema, False, False), _sample(schema, True, False)]
+    if adversarial:
+        samples.append(_sample(schema, True, True))
+    return samples
+
+
+def measure_validation_cost(validator, samples):
+    """Worst per-sample validation time in milliseconds (best of several rounds)
+
+    Every sample is timed once; repeat rounds only run while the probe is
+    within ``FORM_SCHEMA_PROBE_BUDGET_MS`` and the sample within its own
+    budget, so a slow schema does not hold up the publish that lints it.
+    """
+    budget = settings.FORM_SCHEMA_MAX_VALIDATION_MS / 1000
+    deadline = time.perf_counter() + settings.FORM_SCHEMA_PROBE_BUDGET_MS / 1000
+    worst = 0.0
+    for sample in samples:
+        best = None
+        for _ in range(SAMPLE_ROUNDS):
+            started = time.perf_counter()
+            for _error in validator.iter_errors(sample):
+                pass
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+            if best > budget or started + elapsed > deadline:
+                break
+        worst = max(worst, best)
+    return round(worst * 1000, 3)
+
+
+# Report --------------------------------------------------------------------
+
+def lint_schema(schema):
+    """Check a submission JSON Schema against the complexity budget.
+
+    Returns ``(cost_ms, report)`` where ``report`` holds the issues found and
+    the schema's statistics; ``cost_ms`` is None when it could not be measured.
+    """
+    from .snapshots import compile_validator
+
+    issues = []
+    stats = {'depth': 0, 'rules': 0, 'max_enum': 0, 'patterns': 0}
+    unsafe_pattern = False
+
+    for path, node, depth in iter_subschemas(schema):
+        if not isinstance(node, dict):
+            continue
+        stats['depth'] = max(stats['depth'], depth)
+        stats['rules'] += sum(1 for key in node if key not in ANNOTATION_KEYS)
+
+        if isinstance(node.get('enum'), list):
+            stats['max_enum'] = max(stats['max_enum'], len(node['enum']))
+            if len(node['enum']) > settings.FORM_SCHEMA_MAX_ENUM:
+                issues.append(_issue(ERROR, 'enum_size', path, (
+                    f"enum has {len(node['enum'])} values (limit {settings.FORM_SCHEMA_MAX_ENUM})"
+                )))
+
+        patterns = [(f'{path}/pattern', node['pattern'])] if isinstance(node.get('pattern'), str) else []
+        if isinstance(node.get('patternProperties'), dict):
+            patterns += [(f'{path}/patternProperties', key) for key in node['patternProperties']]
+        for pattern_path, pattern in patterns:
+            stats['patterns'] += 1
+            problem = lint_pattern(pattern)
+            if problem:
+                unsafe_pattern = True
+                issues.append(_issue(ERROR, 'unsafe_pattern', pattern_path, f'{pattern!r}: {problem}'))
+
+    if stats['depth'] > settings.FORM_SCHEMA_MAX_DEPTH:
+        issues.append(_issue(ERROR, 'depth', '', (
+            f"schema nests {stats['depth']} levels deep (limit {settings.FORM_SCHEMA_MAX_DEPTH})"
+        )))
+    if stats['rules'] > settings.FORM_SCHEMA_MAX_RULES:
+        issues.append(_issue(ERROR, 'rules', '', (
+            f"schema has {stats['rules']} rules (limit {settings.FORM_SCHEMA_MAX_RULES})"
+        )))
+
+    cost_ms = None
+    try:
+        validator = compile_validator(schema)
+    except SchemaError as e:
+        issues.append(_issue(ERROR, 'invalid_schema', '/' + '/'.join(map(str, e.path)), e.message))
+    else:
+        # Probing a pattern already known to backtrack could hang the request
+        cost_ms = measure_validation_cost(validator, sample_payloads(schema, adversarial=not unsafe_pattern))
+        if cost_ms > settings.FORM_SCHEMA_MAX_VALIDATION_MS:
+            issues.append(_issue(ERROR, 'validation_cost', '', (
+                f'validating a sample payload took {cost_ms}ms (budget {settings.FORM_SCHEMA_MAX_VALIDATION_MS}ms)'
+            )))
+
+    return cost_ms, {'issues': issues, 'stats': stats}
+
+
+def lint_form_schema(form_schema):
+    """Lint the submission schema embedded in a form schema, if it has one"""
+    from .snapshots import submission_schema
+
+    schema = submission_schema(form_schema or {})
+    if not schema:
+        return None, {'issues': [], 'stats': {}}
+    return lint_schema(schema)
+
+
+def blocking_issues(report):
+    """Issues that prevent publishing under the configured enforcement mode"""
+    if settings.FORM_SCHEMA_LINT_MODE != 'reject':
+        return []
+    return [issue for issue in report['issues'] if issue['severity'] == ERROR]
@@ -0,0 +1,51 @@
+# apps/forms/search.py
+"""
+Full-text search over forms.
+
+Each form keeps a weighted ``tsvector`` (title A, description B, field
+labels and help texts C) that is rebuilt on save and indexed with GIN.
+Queries match every term as a prefix so the forms list can be searched
+type-ahead.
+"""
+import re
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchVector
+from django.db.models import TextField, Value
+
+MAX_QUERY_TERMS = 8
+
+
+def schema_search_text(schema):
+    """Collect the field labels and help texts of a form schema"""
+    parts = []
+    fields = schema.get('fields') if isinstance(schema, dict) else None
+    for field in fields if isinstance(fields, list) else ():
+        if not isinstance(field, dict):
+            continue
+        options = field.get('options') if isinstance(field.get('options'), dict) else {}
+        for text in (field.get('label'), field.get('helpText'), options.get('helpText')):
+            if isinstance(text, str) and text:
+                parts.append(text)
+    return ' '.join(parts)
+
+
+def _vector(text, weight):
+    return SearchVector(Value(text or '', output_field=TextField()), weight=weight, config=settings.FORM_SEARCH_CONFIG)
+
+
+def build_search_vector(title, description, schema):
+    """Weighted search vector expression for a form"""
+    return (
+        _vector(title, 'A')
+        + _vector(description, 'B')
+        + _vector(schema_search_text(schema), 'C')
+    )
+
+
+def build_search_query(text):
+    """Prefix-matching query for every term of ``text``, or None when it has no terms"""
+    terms = re.findall(r'\w+', text.lower())[:MAX_QUERY_TERMS]
+    if not terms:
+        return None
+    raw = ' & '.join(f"'{term}':*" for term in terms)
+    return SearchQuery(raw, search_type='raw', config=settings.FORM_SEARCH_CONFIG)
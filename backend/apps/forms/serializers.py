@@ -1,33 +1,112 @@
 # apps/forms/serializers.py
 from rest_framework import serializers
-from .models import Form, FormVersion, FormTheme
+from django.conf import settings
+from .models import Form, FormDeletion, FormVersion, FormTheme
 
 class FormSerializer(serializers.ModelSerializer):
     created_by_name = serializers.CharField(source='created_by.get_full_name', read_only=True)
     
     class Meta:
         model = Form
-        fields = '__all__'
+        exclude = ('search_vector', 'deleted_at')
         read_only_fields = ('id', 'created_by', 'created_at', 'updated_at', 'published_at')
     
+    def validate_theme(self, theme):
+        if theme is not None and theme.created_by_id != self.context['request'].user.pk:
+            raise serializers.ValidationError('Theme not found')
+        return theme
+    
     def create(self, validated_data):
         validated_data['created_by'] = self.context['request'].user
         return super().create(validated_data)
 
+class FormListSerializer(serializers.ModelSerializer):
+    """Forms list entry without the schema, with per-form submission stats"""
+    created_by_name = serializers.CharField(source='created_by.get_full_name', read_only=True)
+    submission_count = serializers.IntegerField(read_only=True)
+    last_submission_at = serializers.DateTimeField(read_only=True)
+    
+    class Meta:
+        model = Form
+        fields = (
+            'id', 'title', 'description', 'status', 'version', 'created_by', 'created_by_name',
+            'created_at', 'updated_at', 'published_at', 'submission_count', 'last_submission_at',
+        )
+        read_only_fields = fields
+
+class PublicFormSerializer(serializers.ModelSerializer):
+    """Slim representation served to embeds; excludes owner and bookkeeping fields"""
+    theme_css = serializers.CharField(source='theme.css_url', read_only=True, allow_null=True)
+    
+    class Meta:
+        model = Form
+        fields = ('id', 'title', 'description', 'schema', 'version', 'published_at', 'theme_css')
+        read_only_fields = fields
+
 class FormVersionSerializer(serializers.ModelSerializer):
     created_by_name = serializers.CharField(source='created_by.get_full_name', read_only=True)
+    schema = serializers.JSONField(read_only=True)
+    schema_hash = serializers.CharField(read_only=True)
     
     class Meta:
         model = FormVersion
-        fields = '__all__'
-        read_only_fields = ('id', 'created_at', 'created_by')
+        fields = (
+            'id', 'form', 'version', 'schema', 'schema_hash', 'validation_cost_ms', 'lint_report',
+            'created_at', 'created_by', 'created_by_name',
+        )
+        read_only_fields = ('id', 'created_at', 'created_by', 'validation_cost_ms', 'lint_report')
+
+class FormVersionListSerializer(serializers.ModelSerializer):
+    """Version history entry without the schema"""
+    created_by_name = serializers.CharField(source='created_by.get_full_name', read_only=True)
+    schema_hash = serializers.CharField(read_only=True)
+    
+    class Meta:
+        model = FormVersion
+        fields = (
+            'id', 'form', 'version', 'schema_hash', 'validation_cost_ms', 'created_at', 'created_by', 'created_by_name',
+        )
+        read_only_fields = fields
+
+class FormDeletionSerializer(serializers.ModelSerializer):
+    """Progress of the background purge of a deleted form"""
+    
+    class Meta:
+        model = FormDeletion
+        fields = (
+            'id', 'form_id', 'form_title', 'status', 'progress', 'error',
+            'created_at', 'started_at', 'finished_at',
+        )
+        read_only_fields = fields
 
 class FormThemeSerializer(serializers.ModelSerializer):
+    css_url = serializers.CharField(read_only=True)
+    
     class Meta:
         model = FormTheme
-        fields = '__all__'
+        exclude = ('css_asset',)
         read_only_fields = ('id', 'created_by', 'created_at')
     
     def create(self, validated_data):
         validated_data['created_by'] = self.context['request'].user
-        return super().create(validated_data)
\ No newline at end of file
+        return super().create(validated_data)
+
+class BulkFormOperationSerializer(serializers.Serializer):
+    operation = serializers.ChoiceField(choices=['publish', 'archive', 'duplicate', 'delete'])
+    ids = serializers.ListField(
+        child=serializers.UUIDField(format='hex_verbose'),
+        allow_empty=False,
+        max_length=settings.FORM_BULK_MAX_IDS,
+    )
+
+class FormBundleExportSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.UUIDField(format='hex_verbose'),
+        allow_empty=False,
+        max_length=settings.FORM_BULK_MAX_IDS,
+    )
+    include_submissions = serializers.BooleanField(default=False)
+    include_secrets = serializers.BooleanField(default=False)
+
+class FormBundleImportSerializer(serializers.Serializer):
+    bundle = serializers.FileField()
@@ -1,6 +1,9 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete
 from django.dispatch import receiver
-from .models import Form
+from .models import Form, FormTheme
+from .public_cache import invalidate_public_form
+from .snapshots import invalidate_form_snapshot
 from apps.analytics.models import FormAnalytics
 
 
@@ -10,3 +13,35 @@ def create_form_analytics(sender, instance: Form, created: bool, **kwargs):
         FormAnalytics.objects.get_or_create(form=instance)
 
 
+@receiver(post_save, sender=Form)
+@receiver(post_delete, sender=Form)
+def invalidate_form_caches(sender, instance: Form, **kwargs):
+    # Saves (including archiving) and deletes drop the pre-rendered payload;
+    # publish and restore_version re-render it once committed. Invalidate
+    # once committed too, or a fetch in between reloads the old row into
+    # the cache until it expires.
+    form_id = instance.pk
+
+    def invalidate():
+        invalidate_public_form(form_id)
+        invalidate_form_snapshot(form_id)
+
+    transaction.on_commit(invalidate)
+
+
+def _invalidate_themed_forms(theme):
+    # Public payloads embed the theme's stylesheet URL; they are re-rendered
+    # on the next fetch once the change is committed
+    form_ids = list(theme.forms.values_list('pk', flat=True))
+    transaction.on_commit(lambda: [invalidate_public_form(form_id) for form_id in form_ids])
+
+
+@receiver(post_save, sender=FormTheme)
+def refresh_theme_forms(sender, instance: FormTheme, created: bool, **kwargs):
+    if not created and getattr(instance, 'css_changed', True):
+        _invalidate_themed_forms(instance)
+
+
+@receiver(pre_delete, sender=FormTheme)
+def detach_theme_forms(sender, instance: FormTheme, **kwargs):
+    _invalidate_themed_forms(instance)
@@ -0,0 +1,158 @@
+# apps/forms/snapshots.py
+"""
+Per-worker snapshots of forms for the submission hot path.
+
+A snapshot holds what a submission needs to know about its form: status,
+schema hash, compiled JSON Schema validator and conditional visibility rules
+and the events active webhooks subscribe to (from the webhook routing
+table). Snapshots live in a bounded in-process LRU with a TTL and are
+evicted across processes through ``apps.core.invalidation`` whenever the
+form or one of its webhooks changes.
+"""
+from collections import namedtuple
+from django.conf import settings
+from jsonschema.exceptions import ValidationError, best_match
+from jsonschema.validators import validator_for
+from apps.core import invalidation
+from apps.core.caching import LocalLRUCache
+from .conditions import compile_conditions, relax_required
+from .models import Form
+from .schema_delta import schema_hash
+
+NAMESPACE = 'forms.snapshot'
+
+_snapshots = LocalLRUCache(
+    maxsize=settings.FORM_SNAPSHOT_CACHE_SIZE,
+    ttl=settings.FORM_SNAPSHOT_CACHE_TTL,
+)
+# Compiled validators are keyed by schema hash so duplicated forms share them
+_validators = LocalLRUCache(
+    maxsize=settings.FORM_SNAPSHOT_CACHE_SIZE,
+    ttl=settings.FORM_SNAPSHOT_CACHE_TTL,
+)
+# Validator and visibility rules compiled from a whole form schema, by its hash
+_submission_rules = LocalLRUCache(
+    maxsize=settings.FORM_SNAPSHOT_CACHE_SIZE,
+    ttl=settings.FORM_SNAPSHOT_CACHE_TTL,
+)
+_evictions = 0  # Local evictions so far; builds that raced one stay out of the LRU
+
+
+class FormSnapshot(namedtuple('FormSnapshot', [
+    'id', 'status', 'schema_hash', 'validator', 'conditions', 'conditional_required', 'webhook_events',
+])):
+    __slots__ = ()
+
+    @property
+    def is_published(self):
+        return self.status == 'published'
+
+    def subscribes(self, event_type):
+        """Whether any active webhook of the form listens to ``event_type``"""
+        return event_type in self.webhook_events
+
+    def validation_error(self, data):
+        """Return the most relevant jsonschema error for ``data``, or None when valid"""
+        if self.validator is None:
+            return None
+        return best_match(self.validator.iter_errors(data))
+
+    def clean_data(self, data):
+        """Drop the answers of hidden fields and validate the rest, returning ``(data, error)``"""
+        inactive = frozenset()
+        if self.conditions is not None:
+            data, inactive = self.conditions.apply(data)
+        error = self.validation_error(data)
+        if error is None and isinstance(data, dict):
+            # Conditional fields are only required while they are shown
+            for name in sorted(self.conditional_required - inactive):
+                if name not in data:
+                    return data, ValidationError(f'{name!r} is a required property', validator='required')
+        return data, error
+
+
+def submission_schema(form_schema):
+    """Extract the JSON Schema submissions are validated against, if any"""
+    return form_schema.get('jsonSchema') or form_schema.get('schema') or None
+
+
+def compile_validator(schema, digest=None):
+    """Return a reusable validator instance for ``schema``"""
+    digest = digest or schema_hash(schema)
+    validator = _validators.get(digest)
+    if validator is None:
+        cls = validator_for(schema)
+        cls.check_schema(schema)
+        validator = cls(schema)
+        _validators.set(digest, validator)
+    return validator
+
+
+def compile_submission_rules(form_schema, digest=None):
+    """Return ``(validator, conditions, conditional_required)`` for a form schema"""
+    digest = digest or schema_hash(form_schema)
+    rules = _submission_rules.get(digest)
+    if rules is None:
+        schema = submission_schema(form_schema)
+        conditions = compile_conditions(form_schema)
+        conditional_required = frozenset()
+        if schema and conditions is not None:
+            schema, conditional_required = relax_required(schema, conditions.fields)
+        validator = compile_validator(schema) if schema else None
+        rules = (validator, conditions, conditional_required)
+        _submission_rules.set(digest, rules)
+    return rules
+
+
+def build_form_snapshot(form_id):
+    """Load a snapshot from the database, or None when the form does not exist"""
+    from apps.webhooks.routing import get_routes
+
+    row = Form.objects.filter(pk=form_id).values('status', 'schema').first()
+    if row is None:
+        return None
+
+    digest = schema_hash(row['schema'])
+    validator, conditions, conditional_required = compile_submission_rules(row['schema'] or {}, digest)
+    return FormSnapshot(
+        id=str(form_id),
+        status=row['status'],
+        schema_hash=digest,
+        validator=validator,
+        conditions=conditions,
+        conditional_required=conditional_required,
+        webhook_events=frozenset(get_routes(form_id)),
+    )
+
+
+def get_form_snapshot(form_id):
+    """Return the cached snapshot of a form, loading it on a miss"""
+    invalidation.ensure_listener()
+    key = str(form_id)
+    snapshot = _snapshots.get(key)
+    if snapshot is None:
+        evictions = _evictions
+        snapshot = build_form_snapshot(form_id)
+        if snapshot is not None and evictions == _evictions:
+            _snapshots.set(key, snapshot)
+    return snapshot
+
+
+def invalidate_form_snapshot(form_id):
+    """Evict a form's snapshot in every process"""
+    invalidation.broadcast(NAMESPACE, form_id)
+
+
+def _evict_local(key):
+    global _evictions
+    _evictions += 1
+    _snapshots.delete(key)
+
+
+def _clear_local():
+    global _evictions
+    _evictions += 1
+    _snapshots.clear()
+
+
+invalidation.register(NAMESPACE, _evict_local, _clear_local)
@@ -0,0 +1,33 @@
+# apps/forms/tasks.py
+from celery import shared_task
+from django.contrib.auth import get_user_model
+from .bulk import run_bulk_operation
+from .bundles import BundleError, import_stashed_bundle
+from .deletion import purge_form, resume_stalled_deletions
+
+@shared_task
+def process_bulk_operation(operation, user_id, ids):
+    """Run a bulk form operation asynchronously"""
+    user = get_user_model().objects.get(pk=user_id)
+    results = run_bulk_operation(operation, user, ids)
+    return {'user_id': user_id, 'operation': operation, 'results': results}
+
+@shared_task
+def import_form_bundle(user_id, path):
+    """Import an uploaded form bundle; a rejected bundle is reported in the result"""
+    user = get_user_model().objects.get(pk=user_id)
+    try:
+        counts = import_stashed_bundle(user, path)
+    except BundleError as e:
+        return {'user_id': user_id, 'error': str(e)}
+    return {'user_id': user_id, 'counts': counts}
+
+@shared_task
+def purge_deleted_form(deletion_id):
+    """Purge a soft-deleted form and its dependent rows in batches"""
+    return purge_form(deletion_id)
+
+@shared_task
+def resume_form_deletions():
+    """Re-queue form purges that stalled or failed"""
+    return resume_stalled_deletions()
@@ -0,0 +1,234 @@
+import gzip
+import io
+import time
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+from apps.submissions.models import Submission
+from .bundles import BundleError, iter_lines
+from .conditions import compile_conditions
+from .models import Form, FormVersion, SchemaBlob
+from .schema_delta import apply_delta, make_delta
+from .schema_diff import diff_schemas
+from .schema_lint import lint_pattern, lint_schema, measure_validation_cost
+
+User = get_user_model()
+
+
+class FormListQueryCountTest(APITestCase):
+    """The forms list costs the same number of queries however many forms it shows"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='owner',
+            email='owner@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(self.user)
+
+    def create_forms(self, count):
+        for number in range(count):
+            schema = {'fields': [{'name': f'field{number}'}]}
+            form = Form.objects.create(
+                title=f'Form {number}',
+                created_by=self.user,
+                schema=schema,
+                status='published',
+                version=1,
+            )
+            FormVersion.objects.create(form=form, version=1, blob=SchemaBlob.store(schema), created_by=self.user)
+            Submission.objects.bulk_create([Submission(form=form, data={'n': n}) for n in range(3)])
+
+    def list_forms(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/forms/')
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_query_count_does_not_grow_with_forms(self):
+        self.create_forms(2)
+        response, baseline = self.list_forms()
+        self.assertEqual(response.data['count'], 2)
+
+        self.create_forms(8)
+        with self.assertNumQueries(baseline):
+            response = self.client.get('/api/v1/forms/')
+        self.assertEqual(response.data['count'], 10)
+        self.assertTrue(all(form['submission_count'] == 3 for form in response.data['results']))
+
+
+def rule(field_id, controller, operator, value=None):
+    return {
+        'id': field_id,
+        'conditionalVisibility': {'enabled': True, 'field': controller, 'operator': operator, 'value': value},
+    }
+
+
+class ConditionalLogicTest(SimpleTestCase):
+    """Fields are hidden exactly as FormPreview.vue hides them"""
+
+    def test_chained_rules_see_hidden_values(self):
+        conditions = compile_conditions({'fields': [
+            {'id': 'a'},
+            rule('b', 'a', 'equals', 'yes'),
+            rule('c', 'b', 'is_not_empty'),
+        ]})
+        data, inactive = conditions.apply({'a': 'no', 'b': 'x', 'c': 'answer'})
+        # The renderer still shows c: b is hidden but keeps its value
+        self.assertEqual(inactive, {'b'})
+        self.assertEqual(data, {'a': 'no', 'c': 'answer'})
+
+    def test_contains_coerces_like_includes(self):
+        conditions = compile_conditions({'fields': [
+            rule('text', 'answer', 'contains', 1),
+            rule('items', 'choices', 'contains', 1),
+            rule('empty', 'answer', 'not_contains', ''),
+        ]})
+        _, inactive = conditions.apply({'answer': 'room 12', 'choices': [True, '1']})
+        # '12'.includes(1) is true; [true, '1'].includes(1) is false
+        self.assertEqual(inactive, {'items', 'empty'})
+        _, inactive = conditions.apply({'answer': '', 'choices': [1.0]})
+        self.assertEqual(inactive, {'text'})
+
+    def test_equals_is_strict(self):
+        conditions = compile_conditions({'fields': [rule('b', 'a', 'equals', True)]})
+        self.assertEqual(conditions.apply({'a': 1})[1], {'b'})
+        self.assertEqual(conditions.apply({'a': True})[1], frozenset())
+
+
+class SchemaLintTest(SimpleTestCase):
+    """Backtracking-prone patterns are rejected before they are probed"""
+
+    def test_flags_super_linear_patterns(self):
+        self.assertIn('nested quantifier', lint_pattern('(a+)+$'))
+        self.assertIn('nested quantifier', lint_pattern(r'(\w+\s?)*$'))
+        self.assertIn('overlapping alternation', lint_pattern('(a|aa)+$'))
+        self.assertIn('invalid regular expression', lint_pattern('('))
+
+    def test_accepts_linear_patterns(self):
+        for pattern in ('^[a-z]+(-[a-z]+)*$', r'^\d{3}-\d{4}$', '^[^@]+@[^@]+$', '(ab|cd)*$'):
+            self.assertIsNone(lint_pattern(pattern), pattern)
+
+    def test_report(self):
+        schema = {'type': 'object', 'properties': {'code': {'type': 'string', 'pattern': '(a+)+$'}}}
+        cost_ms, report = lint_schema(schema)
+        self.assertIsNotNone(cost_ms)
+        self.assertEqual([issue['code'] for issue in report['issues']], ['unsafe_pattern'])
+        self.assertEqual(report['issues'][0]['path'], '/properties/code/pattern')
+        self.assertEqual(report['stats']['patterns'], 1)
+
+    @override_settings(FORM_SCHEMA_PROBE_BUDGET_MS=5, FORM_SCHEMA_MAX_VALIDATION_MS=50)
+    def test_probe_stops_repeating_past_its_budget(self):
+        calls = []
+
+        class SlowValidator:
+            def iter_errors(self, sample):
+                calls.append(sample)
+                time.sleep(0.01)
+                return iter(())
+
+        measure_validation_cost(SlowValidator(), [1, 2, 3])
+        # Each sample is still timed once
+        self.assertEqual(calls, [1, 2, 3])
+
+
+class SchemaDeltaTest(SimpleTestCase):
+    """Deltas rebuild exactly the schema they were made from"""
+
+    def test_round_trip(self):
+        base = {
+            'title': 'Survey',
+            'settings': {'theme': 'dark', 'locale': 'en'},
+            'fields': [
+                {'id': 'name', 'type': 'text'},
+                {'id': 'color', 'type': 'select', 'options': ['red', 'green', 'blue']},
+                {'id': 'age', 'type': 'number'},
+                {'id': 'notes', 'type': 'textarea'},
+            ],
+        }
+        targets = [
+            base,
+            {**base, 'title': 'Survey 2', 'settings': {'theme': 'dark'}},
+            {**base, 'fields': [
+                base['fields'][0],
+                {'id': 'color', 'type': 'select', 'options': ['red', 'blue', 'teal']},
+                {'id': 'email', 'type': 'email'},
+                *base['fields'][2:],
+            ]},
+            {**base, 'fields': list(reversed(base['fields']))},
+            {'fields': None},
+            [],
+        ]
+        for target in targets:
+            self.assertEqual(apply_delta(base, make_delta(base, target)), target)
+
+    def test_unchanged_items_are_referenced(self):
+        base = {'fields': [{'id': str(n), 'options': list(range(100))} for n in range(50)]}
+        target = {'fields': base['fields'] + [{'id': 'new'}]}
+        delta = make_delta(base, target)
+        self.assertEqual(delta['$o']['fields'], {'$a': [[0, 50], {'$v': {'id': 'new'}}]})
+
+
+class SchemaDiffTest(SimpleTestCase):
+    """Fields are diffed by id, and only count as moved when their relative order changes"""
+
+    def test_added_removed_and_changed(self):
+        base = {'title': 'A', 'fields': [
+            {'id': 'a', 'type': 'text', 'label': 'A'},
+            {'id': 'b', 'type': 'text', 'label': 'B'},
+            {'id': 'c', 'type': 'text', 'label': 'C'},
+        ]}
+        target = {'title': 'B', 'fields': [
+            {'id': 'new', 'type': 'email', 'label': 'New'},
+            {'id': 'a', 'type': 'text', 'label': 'A'},
+            {'id': 'c', 'type': 'text', 'label': 'C!'},
+        ]}
+        diff = diff_schemas(base, target)
+        self.assertEqual([(f['id'], f['position']) for f in diff['added']], [('new', 0)])
+        self.assertEqual([(f['id'], f['position']) for f in diff['removed']], [('b', 1)])
+        self.assertEqual(diff['changed'], [
+            {'id': 'c', 'type': 'text', 'label': 'C!', 'changes': {'label': {'from': 'C', 'to': 'C!'}}},
+        ])
+        self.assertEqual(diff['schema'], {'title': {'from': 'A', 'to': 'B'}})
+
+    def test_moves(self):
+        base = {'fields': [{'id': 'a'}, {'id': 'b'}, {'id': 'c'}]}
+        diff = diff_schemas(base, {'fields': [{'id': 'a'}, {'id': 'c'}, {'id': 'b'}]})
+        self.assertEqual([(f['id'], f['position']) for f in diff['changed']], [
+            ('c', {'from': 2, 'to': 1}), ('b', {'from': 1, 'to': 2}),
+        ])
+        diff = diff_schemas(base, {'fields': [{'id': 'new'}, {'id': 'a'}, {'id': 'c'}]})
+        self.assertEqual(diff['changed'], [])
+
+    def test_fields_without_ids_match_by_position(self):
+        diff = diff_schemas({'fields': [{'type': 'text'}]}, {'fields': [{'type': 'email'}]})
+        self.assertEqual(diff['changed'][0]['id'], '#0')
+        self.assertEqual(diff['changed'][0]['changes'], {'type': {'from': 'text', 'to': 'email'}})
+
+
+def gzipped(data):
+    return io.BytesIO(gzip.compress(data))
+
+
+class IterLinesTest(SimpleTestCase):
+    """Bundle lines are inflated incrementally and bounded"""
+
+    def test_lines(self):
+        lines = [b'{"type": "form", "n": %d}' % n for n in range(10000)]
+        self.assertEqual(list(iter_lines(gzipped(b'\n'.join(lines) + b'\n'))), lines)
+        self.assertEqual(list(iter_lines(gzipped(b'a\nb'))), [b'a', b'b'])
+        self.assertEqual(list(iter_lines(gzipped(b''))), [])
+
+    @override_settings(FORM_BUNDLE_MAX_LINE_BYTES=100)
+    def test_long_line(self):
+        with self.assertRaisesMessage(BundleError, 'too long'):
+            list(iter_lines(gzipped(b'short\n' + b'x' * 101 + b'\n')))
+        with self.assertRaisesMessage(BundleError, 'too long'):
+            list(iter_lines(gzipped(b'x' * 1000)))
+
+    @override_settings(FORM_BUNDLE_MAX_BYTES=1000)
+    def test_decompression_bomb(self):
+        with self.assertRaisesMessage(BundleError, 'too large'):
+            list(iter_lines(gzipped(b'\n' * 10 ** 6)))
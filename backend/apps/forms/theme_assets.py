@@ -0,0 +1,78 @@
+# apps/forms/theme_assets.py
+"""
+Compiled theme stylesheets.
+
+Each ``FormTheme`` is compiled into a small minified stylesheet when it is
+saved. The file name carries a hash of the CSS, so it never changes once
+written: embeds reference it from the public form payload and browsers and
+CDNs may cache it forever, fetching a new file only when the theme changes.
+Identical themes share one file.
+"""
+import hashlib
+import re
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+ASSET_DIR = 'themes'
+ASSET_NAME_PATTERN = r'theme-[0-9a-f]{16}\.css'
+
+# Embeds wrap the rendered form in this class
+ROOT = '.ff-form'
+
+
+def _font_family(value):
+    # Free text from the API: keep the characters a font stack needs, so the
+    # value cannot close the declaration or the rule
+    value = re.sub(r'[^\w\s,-]', '', value or '')
+    return re.sub(r'\s+', ' ', value).strip() or 'sans-serif'
+
+
+def _text_color(background):
+    """Black or white, whichever reads better on ``background`` (#rrggbb)"""
+    red, green, blue = (int(background[index:index + 2], 16) for index in (1, 3, 5))
+    luminance = 0.299 * red + 0.587 * green + 0.114 * blue
+    return '#000' if luminance > 150 else '#fff'
+
+
+def compile_theme_css(theme):
+    """Minified stylesheet for a theme"""
+    primary = theme.primary_color.lower()
+    secondary = theme.secondary_color.lower()
+    rules = (
+        (ROOT, (
+            f'--ff-primary:{primary}',
+            f'--ff-secondary:{secondary}',
+            f'--ff-on-primary:{_text_color(primary)}',
+            f'--ff-font:{_font_family(theme.font_family)}',
+            'font-family:var(--ff-font)',
+        )),
+        (f'{ROOT} button[type=submit],{ROOT} .ff-button', (
+            'background:var(--ff-primary)',
+            'border-color:var(--ff-primary)',
+            'color:var(--ff-on-primary)',
+        )),
+        (f'{ROOT} input:focus,{ROOT} select:focus,{ROOT} textarea:focus', (
+            'border-color:var(--ff-primary)',
+            'outline-color:var(--ff-primary)',
+        )),
+        (f'{ROOT} a,{ROOT} .ff-accent', (
+            'color:var(--ff-secondary)',
+        )),
+    )
+    return ''.join(f"{selector}{{{';'.join(declarations)}}}" for selector, declarations in rules)
+
+
+def write_theme_asset(theme):
+    """Compile a theme and store it under its content hash, returning the asset name"""
+    css = compile_theme_css(theme).encode()
+    name = f'theme-{hashlib.sha256(css).hexdigest()[:16]}.css'
+    path = f'{ASSET_DIR}/{name}'
+    if not default_storage.exists(path):
+        default_storage.save(path, ContentFile(css))
+    return name
+
+
+def theme_asset_url(name):
+    """Public URL of a compiled theme"""
+    return f"{settings.FORM_THEME_ASSET_URL.rstrip('/')}/{name}"
@@ -1,13 +1,16 @@
 # apps/forms/urls.py
-from django.urls import path, include
+from django.urls import path, re_path, include
 from rest_framework.routers import DefaultRouter
 from . import views
+from .theme_assets import ASSET_NAME_PATTERN
 
 router = DefaultRouter()
-router.register(r'', views.FormViewSet, basename='form')
+# Themes first: the form detail route (^<pk>/$) would otherwise match themes/
 router.register(r'themes', views.FormThemeViewSet, basename='formtheme')
+router.register(r'', views.FormViewSet, basename='form')
 
 urlpatterns = [
     path('', include(router.urls)),
     path('public/<uuid:pk>/', views.PublicFormView.as_view(), name='form-public-detail'),
+    re_path(rf'^themes/assets/(?P<name>{ASSET_NAME_PATTERN})$', views.theme_asset, name='form-theme-asset'),
 ]
\ No newline at end of file
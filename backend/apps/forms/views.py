@@ -1,12 +1,44 @@
 # apps/forms/views.py
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from celery.result import AsyncResult
+from django.conf import settings
+from django.db import transaction
+from django.contrib.postgres.search import SearchRank
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
 from drf_spectacular.utils import extend_schema, extend_schema_view
-from .models import Form, FormVersion, FormTheme
-from .serializers import FormSerializer, FormVersionSerializer, FormThemeSerializer
+from .models import Form, FormDeletion, FormVersion, FormTheme, SchemaBlob
+from .serializers import (
+    FormSerializer, FormListSerializer, FormVersionSerializer, FormVersionListSerializer, FormThemeSerializer,
+    FormDeletionSerializer, BulkFormOperationSerializer, FormBundleExportSerializer, FormBundleImportSerializer,
+)
+from .bulk import run_bulk_operation
+from .bundles import CONTENT_TYPE as BUNDLE_CONTENT_TYPE, gzip_stream, iter_bundle, stash_bundle
+from .deletion import soft_delete_forms
+from .tasks import import_form_bundle, process_bulk_operation
+from .schema_delta import schema_hash
+from .schema_diff import diff_schemas
+from .schema_lint import blocking_issues, lint_form_schema
+from .search import build_search_query
+from .public_cache import load_public_form, store_public_form
+from .theme_assets import ASSET_DIR
+from apps.analytics.tracking import record_form_view
+from apps.core.caching import get_or_set_cache
+from apps.submissions.models import Submission
+
+FORM_LIST_FIELDS = (
+    'id', 'title', 'description', 'status', 'version', 'created_at', 'updated_at', 'published_at',
+    'created_by__id', 'created_by__first_name', 'created_by__last_name',
+)
 
 @extend_schema_view(
     list=extend_schema(tags=['Forms']),
@@ -21,27 +53,180 @@ class FormViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
-        return Form.objects.filter(created_by=self.request.user)
+        queryset = Form.objects.filter(created_by=self.request.user).select_related('created_by')
+        if self.action == 'list':
+            # Ranked, prefix-matching full-text search (?q=)
+            search_query = build_search_query(self.request.query_params.get('q', ''))
+            if search_query is not None:
+                queryset = queryset.filter(search_vector=search_query).annotate(
+                    search_rank=SearchRank(F('search_vector'), search_query)
+                ).order_by('-search_rank', '-updated_at')
+
+            # Skip the schema and compute per-form stats in the same query
+            submissions = Submission.objects.filter(form=OuterRef('pk')).order_by()
+            queryset = queryset.only(*FORM_LIST_FIELDS).annotate(
+                submission_count=Coalesce(
+                    Subquery(submissions.values('form').annotate(count=Count('pk')).values('count')),
+                    0,
+                ),
+                last_submission_at=Subquery(
+                    submissions.order_by('-created_at').values('created_at')[:1]
+                ),
+            )
+        return queryset
+    
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return FormListSerializer
+        return FormSerializer
+    
+    def destroy(self, request, *args, **kwargs):
+        # The form disappears immediately; its rows are purged in the background
+        form = self.get_object()
+        deletion, = soft_delete_forms(request.user, [form.pk])
+        return Response(FormDeletionSerializer(deletion).data, status=status.HTTP_202_ACCEPTED)
+    
+    @extend_schema(tags=['Forms'], request=FormBundleExportSerializer)
+    @action(detail=False, methods=['post'])
+    def export(self, request):
+        serializer = FormBundleExportSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        lines = iter_bundle(
+            request.user,
+            serializer.validated_data['ids'],
+            include_submissions=serializer.validated_data['include_submissions'],
+            include_secrets=serializer.validated_data['include_secrets'],
+        )
+        # Rows are read, encoded and compressed while the response is sent
+        response = StreamingHttpResponse(gzip_stream(lines), content_type=BUNDLE_CONTENT_TYPE)
+        response['Content-Disposition'] = 'attachment; filename="forms.ndjson.gz"'
+        return response
+    
+    @extend_schema(tags=['Forms'], request=FormBundleImportSerializer)
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_forms(self, request):
+        serializer = FormBundleImportSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        # Imported by a Celery job; poll import/{task_id}/ for the counts
+        path = stash_bundle(serializer.validated_data['bundle'])
+        task = import_form_bundle.delay(request.user.pk, path)
+        return Response({'status': 'queued', 'task_id': task.id}, status=status.HTTP_202_ACCEPTED)
+    
+    @extend_schema(tags=['Forms'])
+    @action(detail=False, methods=['get'], url_path=r'import/(?P<task_id>[0-9a-f-]+)')
+    def import_status(self, request, task_id=None):
+        result = AsyncResult(task_id)
+        if not result.ready():
+            return Response({'status': result.state.lower(), 'task_id': task_id})
+        if result.failed():
+            return Response({'status': 'failed', 'task_id': task_id})
+        
+        payload = result.result
+        if payload.get('user_id') != request.user.pk:
+            raise Http404
+        if 'error' in payload:
+            return Response({'status': 'rejected', 'task_id': task_id, 'error': payload['error']})
+        return Response({'status': 'imported', 'task_id': task_id, 'counts': payload['counts']})
+    
+    @extend_schema(tags=['Forms'])
+    @action(detail=False, methods=['get'])
+    def deletions(self, request):
+        deletions = FormDeletion.objects.filter(requested_by=request.user)
+        page = self.paginate_queryset(deletions)
+        if page is not None:
+            return self.get_paginated_response(FormDeletionSerializer(page, many=True).data)
+        return Response(FormDeletionSerializer(deletions, many=True).data)
+    
+    @extend_schema(tags=['Forms'])
+    @action(detail=False, methods=['get'], url_path=r'deletions/(?P<deletion_id>[0-9]+)')
+    def deletion_status(self, request, deletion_id=None):
+        deletion = get_object_or_404(FormDeletion, pk=deletion_id, requested_by=request.user)
+        return Response(FormDeletionSerializer(deletion).data)
     
     @extend_schema(tags=['Forms'])
     @action(detail=True, methods=['post'])
     def publish(self, request, pk=None):
         form = self.get_object()
-        form.status = 'published'
-        form.save()
         
-        # Create a new version
-        latest_version = form.versions.first()
-        new_version_number = 1 if not latest_version else latest_version.version + 1
+        with transaction.atomic():
+            latest_version = form.versions.select_related('blob').first()
+            unchanged = latest_version is not None and latest_version.blob_id == schema_hash(form.schema)
+            if unchanged and form.status == 'published':
+                # Republishing an unchanged schema is a no-op
+                return Response({'status': 'form already published', 'version': latest_version.version})
+            
+            if unchanged:
+                version_number = latest_version.version
+            else:
+                # Enforce the complexity budget before the schema goes live
+                validation_cost_ms, lint_report = lint_form_schema(form.schema)
+                issues = blocking_issues(lint_report)
+                if issues:
+                    return Response(
+                        {'error': 'schema exceeds the complexity budget', 'issues': issues},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                
+                # Create a new version, delta-encoded against the previous one
+                blob = SchemaBlob.store(form.schema, base=latest_version.blob if latest_version else None)
+                version_number = 1 if not latest_version else latest_version.version + 1
+                FormVersion.objects.create(
+                    form=form,
+                    version=version_number,
+                    blob=blob,
+                    validation_cost_ms=validation_cost_ms,
+                    lint_report=lint_report,
+                    created_by=request.user
+                )
+            
+            form.status = 'published'
+            form.version = version_number
+            form.save()
+        store_public_form(form)
         
-        FormVersion.objects.create(
-            form=form,
-            version=new_version_number,
-            schema=form.schema,
-            created_by=request.user
-        )
+        response = {'status': 'form published', 'version': version_number}
+        if not unchanged:
+            response['validation_cost_ms'] = validation_cost_ms
+            response['issues'] = lint_report['issues']
+        return Response(response)
+    
+    @extend_schema(tags=['Forms'], request=BulkFormOperationSerializer)
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        serializer = BulkFormOperationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        operation = serializer.validated_data['operation']
+        ids = [str(form_id) for form_id in serializer.validated_data['ids']]
+        
+        # Large batches run as a Celery job; poll bulk/{task_id}/ for the results
+        if len(ids) > settings.FORM_BULK_ASYNC_THRESHOLD:
+            task = process_bulk_operation.delay(operation, request.user.pk, ids)
+            return Response(
+                {'status': 'queued', 'operation': operation, 'task_id': task.id},
+                status=status.HTTP_202_ACCEPTED
+            )
+        
+        results = run_bulk_operation(operation, request.user, ids)
+        return Response({'status': 'completed', 'operation': operation, 'results': results})
+    
+    @extend_schema(tags=['Forms'])
+    @action(detail=False, methods=['get'], url_path=r'bulk/(?P<task_id>[0-9a-f-]+)')
+    def bulk_status(self, request, task_id=None):
+        result = AsyncResult(task_id)
+        if not result.ready():
+            return Response({'status': result.state.lower(), 'task_id': task_id})
+        if result.failed():
+            return Response({'status': 'failed', 'task_id': task_id})
         
-        return Response({'status': 'form published'})
+        payload = result.result
+        if payload.get('user_id') != request.user.pk:
+            raise Http404
+        return Response({
+            'status': 'completed',
+            'task_id': task_id,
+            'operation': payload['operation'],
+            'results': payload['results'],
+        })
     
     @extend_schema(tags=['Forms'])
     @action(detail=True, methods=['post'])
@@ -60,10 +245,45 @@ class FormViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'])
     def versions(self, request, pk=None):
         form = self.get_object()
-        versions = form.versions.all()
-        serializer = FormVersionSerializer(versions, many=True)
+        versions = form.versions.select_related('created_by')
+        if request.query_params.get('include_schema', '').lower() == 'true':
+            serializer = FormVersionSerializer(versions.select_related('blob'), many=True)
+        else:
+            serializer = FormVersionListSerializer(versions, many=True)
         return Response(serializer.data)
     
+    @extend_schema(tags=['Forms'])
+    @action(detail=True, methods=['get'], url_path=r'versions/(?P<version>[0-9]+)')
+    def version_detail(self, request, pk=None, version=None):
+        form = self.get_object()
+        form_version = get_object_or_404(
+            FormVersion.objects.select_related('blob', 'created_by'), form=form, version=version
+        )
+        return Response(FormVersionSerializer(form_version).data)
+    
+    @extend_schema(tags=['Forms'])
+    @action(detail=True, methods=['get'], url_path='versions/diff')
+    def version_diff(self, request, pk=None):
+        form = self.get_object()
+        base_number = request.query_params.get('base')
+        target_number = request.query_params.get('target')
+        if not (base_number and target_number and base_number.isdigit() and target_number.isdigit()):
+            return Response(
+                {'error': 'base and target version numbers are required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        base = get_object_or_404(form.versions.select_related('blob'), version=base_number)
+        target = get_object_or_404(form.versions.select_related('blob'), version=target_number)
+        
+        # Versions are immutable and content-addressed, so diffs are cached by blob hashes
+        diff = get_or_set_cache(
+            f"forms:version_diff:{base.blob_id}:{target.blob_id}",
+            lambda: diff_schemas(base.schema, target.schema),
+            timeout=settings.FORM_VERSION_DIFF_CACHE_TIMEOUT,
+        )
+        return Response({'base': base.version, 'target': target.version, **diff})
+    
     @extend_schema(tags=['Forms'])
     @action(detail=True, methods=['post'])
     def restore_version(self, request, pk=None):
@@ -76,9 +296,11 @@ class FormViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        version = get_object_or_404(FormVersion, id=version_id, form=form)
+        version = get_object_or_404(FormVersion.objects.select_related('blob'), id=version_id, form=form)
         form.schema = version.schema
         form.save()
+        if form.status == 'published':
+            store_public_form(form)
         
         return Response({'status': 'form restored from version'})
 
@@ -98,19 +320,56 @@ class FormThemeViewSet(viewsets.ModelViewSet):
         return FormTheme.objects.filter(created_by=self.request.user)
 
 
+def etag_matches(if_none_match, etag):
+    """Weak comparison of an If-None-Match header against an ETag (RFC 9110 13.1.2)"""
+    if not if_none_match:
+        return False
+    candidates = parse_etags(if_none_match)
+    if '*' in candidates:
+        return True
+    bare = etag.removeprefix('W/')
+    return any(candidate.removeprefix('W/') == bare for candidate in candidates)
+
+
+def patch_public_cache_headers(response, etag):
+    """Let browsers revalidate while shared caches (CDN, reverse proxy) absorb traffic"""
+    response['ETag'] = etag
+    patch_cache_control(
+        response,
+        public=True,
+        max_age=settings.PUBLIC_FORM_MAX_AGE,
+        s_maxage=settings.PUBLIC_FORM_SHARED_MAX_AGE,
+        stale_while_revalidate=settings.PUBLIC_FORM_STALE_WHILE_REVALIDATE,
+    )
+    return response
+
+
 @extend_schema(tags=['Forms'])
 class PublicFormView(APIView):
     permission_classes = [permissions.AllowAny]
     throttle_scope = 'anon'  # Rate limit public form access
     
     def get(self, request, pk):
-        form = get_object_or_404(Form, pk=pk, status='published')
-        serializer = FormSerializer(form)
+        payload = load_public_form(pk)
+        if payload is None:
+            raise Http404
         
-        # Track view for analytics
-        from apps.analytics.models import FormAnalytics
-        analytics, _ = FormAnalytics.objects.get_or_create(form=form)
-        analytics.views += 1
-        analytics.save()
+        # Track view for analytics (revalidated hits count as views too)
+        record_form_view(pk)
         
-        return Response(serializer.data)
\ No newline at end of file
+        if etag_matches(request.META.get('HTTP_IF_NONE_MATCH'), payload.etag):
+            return patch_public_cache_headers(Response(status=status.HTTP_304_NOT_MODIFIED), payload.etag)
+        
+        # Served verbatim: the body was rendered when the form was published
+        response = HttpResponse(payload.body, content_type='application/json')
+        return patch_public_cache_headers(response, payload.etag)
+
+
+def theme_asset(request, name):
+    """Serve a compiled theme stylesheet; names are content hashes, so it never changes"""
+    path = f'{ASSET_DIR}/{name}'
+    if not default_storage.exists(path):
+        raise Http404
+    response = FileResponse(default_storage.open(path), content_type='text/css')
+    patch_cache_control(response, public=True, max_age=settings.FORM_THEME_ASSET_MAX_AGE, immutable=True)
+    return response
@@ -3,20 +3,27 @@ from rest_framework import viewsets, permissions, status, exceptions
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from django.shortcuts import get_object_or_404
+from django.http import Http404
+from django.db import transaction
 from django.db.models import Q, QuerySet
 from drf_spectacular.utils import extend_schema, extend_schema_view
 from .models import Submission, SavedForm
 from .serializers import SubmissionSerializer, SavedFormSerializer
-from apps.forms.models import Form
-from apps.analytics.models import FormAnalytics
-from apps.webhooks.tasks import process_webhook
-from jsonschema import validate as jsonschema_validate, ValidationError
+from apps.forms.snapshots import get_form_snapshot
+from apps.analytics.tracking import record_form_submission
+from apps.webhooks.outbox import publish_event
 import csv
 from django.http import HttpResponse
 import os
 import requests
 
+def validate_submission_data(snapshot, data):
+    """Validate submission data against the form's compiled rules, returning the data to store"""
+    data, error = snapshot.clean_data(data)
+    if error is not None:
+        raise exceptions.ValidationError({'data': f'Invalid data: {error.message}'})
+    return data
+
 @extend_schema_view(
     list=extend_schema(tags=['Submissions']),
     create=extend_schema(tags=['Submissions']),
@@ -32,23 +39,20 @@ class SubmissionViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self) -> QuerySet[Submission]:  # type: ignore[override]
         user = self.request.user
+        # Submissions of deleted forms stay hidden until they are purged
+        submissions = Submission.objects.filter(form__deleted_at__isnull=True)
         if user.role == 'admin':
-            return Submission.objects.all()
+            return submissions
         else:
             # Users can only see submissions for their own forms
-            return Submission.objects.filter(form__created_by=user)
+            return submissions.filter(form__created_by=user)
 
     def perform_create(self, serializer):
-        form_id = self.request.data.get('form')
-        form = get_object_or_404(Form, id=form_id)
+        form = serializer.validated_data['form']
+        snapshot = get_form_snapshot(form.pk)
         
-        # Validate against schema if provided
-        schema = form.schema.get('jsonSchema') or form.schema.get('schema') or None
-        if schema:
-            try:
-                jsonschema_validate(instance=self.request.data.get('data', {}), schema=schema)
-            except ValidationError as exc:
-                raise exceptions.ValidationError({'data': f'Invalid data: {exc.message}'})
+        # Validate the fields that are shown; hidden fields are not stored
+        data = validate_submission_data(snapshot, self.request.data.get('data', {}))
 
         # Optional reCAPTCHA verification
         recaptcha_secret = os.getenv('RECAPTCHA_SECRET')
@@ -66,17 +70,18 @@ class SubmissionViewSet(viewsets.ModelViewSet):
             except Exception:
                 raise exceptions.ValidationError({'recaptcha': 'Verification error'})
 
-        submission = serializer.save(
-            form=form,
-            ip_address=self.request.META.get('REMOTE_ADDR'),
-            user_agent=self.request.META.get('HTTP_USER_AGENT', ''),
-        )
+        # The webhook event commits with the submission and is relayed from the outbox
+        with transaction.atomic():
+            submission = serializer.save(
+                form=form,
+                data=data,
+                ip_address=self.request.META.get('REMOTE_ADDR'),
+                user_agent=self.request.META.get('HTTP_USER_AGENT', ''),
+            )
+            if snapshot.subscribes('submission.created'):
+                publish_event(form.id, 'submission.created', submission.pk)
         # Update analytics counters lazily
-        analytics, _ = FormAnalytics.objects.get_or_create(form=form)
-        analytics.submissions += 1
-        analytics.save()
-        # Fire webhooks asynchronously
-        process_webhook.delay(str(form.id), 'submission.created', serializer.data)
+        record_form_submission(form.pk)
         return submission
     
     @extend_schema(tags=['Submissions'])
@@ -111,15 +116,13 @@ class PublicSubmissionView(APIView):
     throttle_scope = 'submissions'
     
     def post(self, request, form_id):
-        form = get_object_or_404(Form, id=form_id, status='published')
+        # Served from the per-worker snapshot cache; only the INSERTs hit the database
+        snapshot = get_form_snapshot(form_id)
+        if snapshot is None or not snapshot.is_published:
+            raise Http404
         
-        # Validate against schema
-        schema = form.schema.get('jsonSchema') or form.schema.get('schema') or None
-        if schema:
-            try:
-                jsonschema_validate(instance=request.data.get('data', {}), schema=schema)
-            except ValidationError as exc:
-                raise exceptions.ValidationError({'data': f'Invalid data: {exc.message}'})
+        # Validate the fields that are shown; hidden fields are not stored
+        data = validate_submission_data(snapshot, request.data.get('data', {}))
         
         # Optional reCAPTCHA verification
         recaptcha_secret = os.getenv('RECAPTCHA_SECRET')
@@ -135,21 +138,20 @@ class PublicSubmissionView(APIView):
             except Exception:
                 raise exceptions.ValidationError({'recaptcha': 'Verification error'})
         
-        # Create submission
-        submission = Submission.objects.create(
-            form=form,
-            data=request.data.get('data', {}),
-            ip_address=request.META.get('REMOTE_ADDR'),
-            user_agent=request.META.get('HTTP_USER_AGENT', ''),
-        )
+        # Create the submission, and its webhook event in the same transaction;
+        # the outbox relay queues the deliveries, so the broker is never waited on
+        with transaction.atomic():
+            submission = Submission.objects.create(
+                form_id=form_id,
+                data=data,
+                ip_address=request.META.get('REMOTE_ADDR'),
+                user_agent=request.META.get('HTTP_USER_AGENT', ''),
+            )
+            if snapshot.subscribes('submission.created'):
+                publish_event(form_id, 'submission.created', submission.pk)
         
         # Update analytics
-        analytics, _ = FormAnalytics.objects.get_or_create(form=form)
-        analytics.submissions += 1
-        analytics.save()
-        
-        # Fire webhooks asynchronously
-        process_webhook.delay(str(form.id), 'submission.created', SubmissionSerializer(submission).data)
+        record_form_submission(form_id)
         
         return Response({
             'status': 'success',
@@ -172,7 +174,7 @@ class SavedFormViewSet(viewsets.ModelViewSet):
     def get_queryset(self):  # type: ignore[override]
         # Use session key to identify the user
         session_key = self.request.session.session_key or self.request.session.create()
-        return SavedForm.objects.filter(session_key=session_key)
+        return SavedForm.objects.filter(session_key=session_key, form__deleted_at__isnull=True)
     
     def perform_create(self, serializer):
         session_key = self.request.session.session_key or self.request.session.create()
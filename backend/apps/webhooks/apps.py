@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class WebhooksConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'apps.webhooks'
+
+    def ready(self):
+        # Import signals
+        from . import signals  # noqa: F401
@@ -0,0 +1,124 @@
+# apps/webhooks/breaker.py
+"""
+Circuit breakers for webhook receiver hosts.
+
+State is kept per ``host:port`` in the shared cache (Redis in production), so
+every worker sees the same breaker. ``WEBHOOK_BREAKER_THRESHOLD`` consecutive
+failed attempts (network errors, timeouts, 429 and 5xx responses) open it.
+While open, deliveries to the host are parked rather than attempted. After
+``WEBHOOK_BREAKER_COOLDOWN`` seconds it is half-open: one worker at a time
+wins the probe slot and sends a single delivery. A success closes the
+breaker; a failure reopens it for another cooldown.
+
+The cache's atomic ``add`` and ``incr`` keep the counters and the probe slot
+consistent across workers. If the cache is unreachable, breakers read as
+closed and deliveries go ahead.
+"""
+import time
+from urllib.parse import urlsplit
+from django.conf import settings
+from django.core.cache import cache
+
+KEY = 'webhooks:breaker:{}:{}'
+
+
+def breaker_host(url):
+    """Breaker key of a webhook URL"""
+    parts = urlsplit(url)
+    port = parts.port or (443 if parts.scheme == 'https' else 80)
+    return f'{(parts.hostname or "").lower()}:{port}'
+
+
+def is_failure(response_code):
+    return response_code is None or response_code == 429 or response_code >= 500
+
+
+def _keys(host):
+    return KEY.format(host, 'failures'), KEY.format(host, 'opened'), KEY.format(host, 'probe')
+
+
+def _timeout():
+    # Idle breakers expire on their own
+    return settings.WEBHOOK_BREAKER_COOLDOWN * 100
+
+
+def get_states(hosts):
+    """``{host: {'state', 'failures', 'retry_at'}}`` for display"""
+    keys = {host: _keys(host) for host in hosts}
+    values = cache.get_many([key for host_keys in keys.values() for key in host_keys[:2]])
+    now = time.time()
+    states = {}
+    for host, (failures_key, opened_key, _) in keys.items():
+        opened = values.get(opened_key)
+        retry_at = opened + settings.WEBHOOK_BREAKER_COOLDOWN if opened is not None else None
+        if opened is None:
+            state = 'closed'
+        elif now < retry_at:
+            state = 'open'
+        else:
+            state = 'half_open'
+        states[host] = {'state': state, 'failures': values.get(failures_key, 0), 'retry_at': retry_at}
+    return states
+
+
+def acquire(host):
+    """Decide whether deliveries to ``host`` may go out now
+
+    Returns ``(allowed, probe, retry_at)``: ``probe`` when only one delivery
+    may be sent to test the host, ``retry_at`` (Unix time) when the others
+    should be parked until then.
+    """
+    _, opened_key, probe_key = _keys(host)
+    opened = cache.get(opened_key)
+    if opened is None:
+        return True, False, None
+    reopen_at = opened + settings.WEBHOOK_BREAKER_COOLDOWN
+    now = time.time()
+    if now < reopen_at:
+        return False, False, reopen_at
+    if cache.add(probe_key, now, settings.WEBHOOK_BREAKER_PROBE_TIMEOUT):
+        return True, True, now + settings.WEBHOOK_BREAKER_PROBE_TIMEOUT
+    return False, False, now + settings.WEBHOOK_BREAKER_PROBE_TIMEOUT
+
+
+def record(host, succeeded, failures_after):
+    """Record the attempts to a host in the order they finished
+
+    ``succeeded`` tells whether any of them succeeded and ``failures_after``
+    counts the failures after the last success (or all of them). Returns
+    whether the breaker is open afterwards.
+    """
+    failures_key, opened_key, probe_key = _keys(host)
+    if succeeded:
+        cache.delete_many([failures_key, opened_key, probe_key])
+    if not failures_after:
+        return False
+
+    if not cache.add(failures_key, failures_after, _timeout()):
+        try:
+            failures = cache.incr(failures_key, failures_after)
+        except ValueError:  # Expired in between
+            cache.add(failures_key, failures_after, _timeout())
+            failures = failures_after
+    else:
+        failures = failures_after
+
+    opened = cache.get(opened_key)
+    if opened is not None or failures >= settings.WEBHOOK_BREAKER_THRESHOLD:
+        # A failed probe (or more failures) restarts the cooldown
+        cache.set(opened_key, time.time(), _timeout())
+        cache.delete(probe_key)
+        return True
+    return False
+
+
+def record_outcomes(outcomes):
+    """Feed ``(url, response_code)`` pairs, in completion order, to the breakers"""
+    per_host = {}
+    for url, response_code in outcomes:
+        succeeded, failures = per_host.get(breaker_host(url), (False, 0))
+        if is_failure(response_code):
+            per_host[breaker_host(url)] = (succeeded, failures + 1)
+        else:
+            per_host[breaker_host(url)] = (True, 0)
+    return {host: record(host, succeeded, failures) for host, (succeeded, failures) in per_host.items()}
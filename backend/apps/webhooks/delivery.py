@@ -0,0 +1,649 @@
+# apps/webhooks/delivery.py
+"""
+Webhook fan-out and durable delivery.
+
+An event is published with ids only, through the outbox (``outbox.py``),
+whose relay looks up the active webhooks of the form that subscribe to the
+event in the form's cached routing table (``routing.py``) and inserts one
+``WebhookDelivery`` per webhook. The delivery table is the queue. Workers
+lease due rows through a partial index on ``next_attempt_at`` with
+``SELECT ... FOR UPDATE SKIP LOCKED``, so any number of them can poll it in
+batches without handing out a row twice. A failed attempt is rescheduled
+with exponential backoff and jitter, and a delivery that runs out of
+attempts is dead until it is replayed. A worker that dies mid-delivery
+leaves its rows in flight with an expired lease, and they become due again.
+
+With ``WEBHOOK_DELIVERY_ENGINE = 'celery'``, each new delivery is also
+handed to a ``deliver_webhook`` task for its first attempt, and the
+``dispatch_webhook_deliveries`` beat task picks up retries. It leases them
+for their tasks, which start the attempt only if the lease they were handed
+is still current (``start_claimed``); a task that waited in the broker past
+its lease leaves the row to the dispatcher's next lease. With ``'async'``,
+the asyncio worker (``python manage.py run_webhook_worker``) polls the table
+itself. Either way each delivery loads the event's object itself and has its
+own timeout, so a slow or unreachable endpoint only ever holds up its own
+deliveries, and a circuit breaker per receiver host (``breaker.py``) parks
+deliveries to a host that keeps failing instead of waiting out its timeouts.
+The payload of an event is encoded once for all of its subscribers
+(``payloads.py``).
+
+A webhook with batching enabled gets its events as ``buffered`` rows
+instead. Once a buffer holds ``batch_max_size`` events, or its oldest event
+is ``batch_max_linger`` seconds old, ``flush_batches`` swaps the rows for a
+single delivery of all their events, which is sent as one signed JSON array
+and retried and logged as a whole. Enqueueing flushes full buffers; a timer
+task armed by the first event of a buffer (Celery) or the worker's poll loop
+(async) flushes lingering ones, with the dispatcher as a backstop.
+
+Test requests are deliveries too (``enqueue_test``), sent by the same engine
+under the same per-host limits, but they are attempted once and never parked
+behind a breaker. Their outcome is kept in the cache for
+``WEBHOOK_TEST_RESULT_TTL`` seconds, where ``test_result`` reads it.
+"""
+import logging
+import random
+import time
+from collections import defaultdict, namedtuple
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Max, Min
+from django.utils import timezone
+import requests
+from . import breaker, logbook, metrics
+from .engine import Timing
+from .models import Webhook, WebhookDelivery
+from .payloads import EncodedPayload
+
+logger = logging.getLogger(__name__)
+
+# Statuses the due-time index covers
+ACTIVE_STATUSES = ('pending', 'in_flight')
+
+# Shared-cache key of an event's encoded body (Celery delivery engine)
+PAYLOAD_KEY = 'webhooks:payload:{}:{}'
+
+# Event type of test requests, whose object id is the webhook's id
+TEST_EVENT = 'test'
+TEST_RESULT_KEY = 'webhooks:test:{}'  # Delivery id -> outcome of a test request
+
+# A delivery resolved to the request it sends
+OutgoingDelivery = namedtuple('OutgoingDelivery', ['webhook', 'event_type', 'url', 'body', 'headers'])
+
+# Keep-alive connections for deliveries made outside the async worker
+_session = requests.Session()
+
+
+def _submission_events(object_ids):
+    from apps.submissions.models import Submission
+    from apps.submissions.serializers import SubmissionSerializer
+
+    return {
+        str(submission.pk): (SubmissionSerializer(submission).data, submission.created_at)
+        for submission in Submission.objects.filter(pk__in=object_ids)
+    }
+
+
+def _test_events(object_ids):
+    now = timezone.now()
+    return {object_id: ({'message': 'This is a test delivery'}, now) for object_id in object_ids}
+
+
+# Event type -> loader mapping object ids to (data, occurred_at), missing objects left out
+EVENT_LOADERS = {
+    'submission.created': _submission_events,
+    TEST_EVENT: _test_events,
+}
+
+
+def _lease():
+    return timedelta(seconds=settings.WEBHOOK_DELIVERY_LEASE)
+
+
+def _celery():
+    return settings.WEBHOOK_DELIVERY_ENGINE != 'async'
+
+
+def _first_attempt_at(now):
+    # With Celery the first attempt is a task of its own; the dispatcher only
+    # steps in if that task never ran
+    return now + _lease() if _celery() else now
+
+
+def start_deliveries(deliveries):
+    """Queue the first attempt of new deliveries once committed (Celery delivery engine)
+
+    A delivery whose task cannot be queued is left to the dispatcher, which
+    picks it up when its lease expires.
+    """
+    if deliveries and _celery():
+        from celery import group
+        from .tasks import deliver_webhook
+        tasks = group(deliver_webhook.s(delivery.pk) for delivery in deliveries)
+        transaction.on_commit(tasks.apply_async, robust=True)
+
+
+def enqueue_deliveries(subscriptions, event_type, events):
+    """Record one delivery per subscribed webhook and event, or add the events to its buffer
+
+    ``subscriptions`` are the webhooks' ``routing.Subscription`` entries,
+    ``events`` ``(object_id, occurred_at)`` pairs; ``occurred_at`` may be None.
+    """
+    now = timezone.now()
+    batched = {subscription.webhook_id: subscription for subscription in subscriptions if subscription.batch_size}
+    deliveries = WebhookDelivery.objects.bulk_create([
+        WebhookDelivery(
+            webhook_id=subscription.webhook_id,
+            event_type=event_type,
+            object_id=str(object_id),
+            occurred_at=occurred_at,
+            status='buffered' if subscription.webhook_id in batched else 'pending',
+            next_attempt_at=None if subscription.webhook_id in batched else _first_attempt_at(now),
+        )
+        for object_id, occurred_at in events
+        for subscription in subscriptions
+    ], batch_size=1000)
+    start_deliveries([delivery for delivery in deliveries if delivery.status == 'pending'])
+    if batched:
+        _fill_buffers(batched, event_type, len(events))
+    return deliveries
+
+
+def _fill_buffers(batched, event_type, added):
+    """Flush the buffers that just filled up and arm the timer of those just started
+
+    ``added`` is the number of events just added to each buffer.
+    """
+    sizes = dict(
+        WebhookDelivery.objects.filter(status='buffered', event_type=event_type, webhook_id__in=batched)
+        .values('webhook_id').annotate(size=Count('pk')).order_by().values_list('webhook_id', 'size')
+    )
+    full = [webhook_id for webhook_id, size in sizes.items() if size >= batched[webhook_id].batch_size]
+    if full:
+        flush_batches(full)
+    if _celery():
+        from .tasks import flush_webhook_batches
+        for webhook_id, size in sizes.items():
+            # Racing first events can both miss this; the dispatcher then
+            # flushes the buffer on its next run
+            if size == added:
+                linger = batched[webhook_id].batch_linger
+                timer = flush_webhook_batches.signature((str(webhook_id),), countdown=linger)
+                transaction.on_commit(timer.apply_async, robust=True)
+
+
+def flush_batches(webhook_ids=None):
+    """Replace buffers that are full or lingered long enough by batch deliveries
+
+    Buffers are flushed in full batches, plus a last partial one once its
+    oldest event has lingered. Events buffered for a webhook that no longer
+    batches become ordinary deliveries. Returns the batches created.
+    """
+    now = timezone.now()
+    buffered = WebhookDelivery.objects.filter(status='buffered')
+    if webhook_ids is not None:
+        buffered = buffered.filter(webhook_id__in=webhook_ids)
+    unbatched = buffered.filter(webhook__batch_enabled=False)
+    if unbatched.update(status='pending', next_attempt_at=now, updated_at=now):
+        logger.info("Released events buffered for webhooks that stopped batching")
+
+    buffers = (
+        buffered.filter(webhook__batch_enabled=True)
+        .values('webhook_id', 'event_type', 'webhook__batch_max_size', 'webhook__batch_max_linger')
+        .annotate(size=Count('pk'), oldest=Min('created_at'))
+        .order_by()
+    )
+    batches = []
+    for buffer in buffers:
+        max_size = buffer['webhook__batch_max_size']
+        cutoff = now - timedelta(seconds=buffer['webhook__batch_max_linger'])
+        if buffer['size'] < max_size and buffer['oldest'] > cutoff:
+            continue
+        while True:
+            batch, full = _take_batch(buffer['webhook_id'], buffer['event_type'], max_size, cutoff)
+            if batch is not None:
+                batches.append(batch)
+            if not full:
+                break
+    start_deliveries(batches)
+    return batches
+
+
+def _take_batch(webhook_id, event_type, max_size, cutoff):
+    """Swap the oldest buffered events for one batch delivery
+
+    Returns the batch (None when what is left is a partial batch that may
+    still linger) and whether it was full.
+    """
+    with transaction.atomic():
+        events = list(
+            WebhookDelivery.objects.filter(status='buffered', webhook_id=webhook_id, event_type=event_type)
+            .order_by('created_at').select_for_update(skip_locked=True)
+            .values_list('pk', 'object_id', 'created_at', 'occurred_at')[:max_size]
+        )
+        if not events or (len(events) < max_size and events[0][2] > cutoff):
+            return None, False
+        batch = WebhookDelivery.objects.create(
+            webhook_id=webhook_id,
+            event_type=event_type,
+            object_ids=[object_id for _, object_id, _, _ in events],
+            occurred_at=min(occurred_at or created_at for _, _, created_at, occurred_at in events),
+            next_attempt_at=_first_attempt_at(timezone.now()),
+        )
+        WebhookDelivery.objects.filter(pk__in=[pk for pk, _, _, _ in events]).delete()
+    return batch, len(events) == max_size
+
+
+def enqueue_test(webhook):
+    """Queue a test request to a webhook, returning its delivery
+
+    It goes out like any other delivery, active or not, so testing never
+    ties up a web worker waiting on the receiver.
+    """
+    now = timezone.now()
+    delivery = WebhookDelivery.objects.create(
+        webhook=webhook,
+        event_type=TEST_EVENT,
+        object_id=str(webhook.pk),
+        occurred_at=now,
+        next_attempt_at=_first_attempt_at(now),
+    )
+    start_deliveries([delivery])
+    return delivery
+
+
+def test_result(delivery):
+    """Outcome of a test request: ``status`` is pending, success or error"""
+    if delivery.status in ('pending', 'in_flight'):
+        return {'id': delivery.pk, 'status': 'pending'}
+    result = cache.get(TEST_RESULT_KEY.format(delivery.pk))
+    if result is None:
+        # The cached response body expired; the delivery still tells how it went
+        result = _test_outcome(delivery, delivery.last_error)
+    return {'id': delivery.pk, **result}
+
+
+def _test_outcome(delivery, text):
+    if delivery.status == 'succeeded':
+        return {'status': 'success', 'response_code': delivery.last_response_code, 'response_body': text[:500]}
+    return {'status': 'error', 'response_code': delivery.last_response_code, 'message': text[:500]}
+
+
+def claim_deliveries(limit, ids=None, attempt=True):
+    """Lease up to ``limit`` deliveries to the caller, marking them in flight
+
+    Without ``ids``, due deliveries are taken in due-time order; with ``ids``,
+    those of them that are still pending, whenever they are due. Each lease
+    counts an attempt unless ``attempt`` is false, for leases handed on to
+    tasks that count it once they start (``start_claimed``).
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        if ids is None:
+            rows = WebhookDelivery.objects.filter(status__in=ACTIVE_STATUSES, next_attempt_at__lte=now)
+            rows = rows.order_by('next_attempt_at')
+        else:
+            rows = WebhookDelivery.objects.filter(pk__in=ids, status='pending')
+        claimed = list(rows.select_for_update(skip_locked=True).values_list('pk', flat=True)[:limit])
+        if not claimed:
+            return []
+        WebhookDelivery.objects.filter(pk__in=claimed).update(
+            status='in_flight', next_attempt_at=now + _lease(), updated_at=now,
+            **({'attempts': F('attempts') + 1} if attempt else {}),
+        )
+    return list(WebhookDelivery.objects.filter(pk__in=claimed).select_related('webhook__form'))
+
+
+def renew_leases(leases):
+    """Extend the leases of deliveries still being worked on
+
+    ``leases`` maps delivery ids to the lease expiry the caller holds. Rows
+    whose lease changed since (they were leased again) are left alone.
+    Returns the new expiry and the ids renewed.
+    """
+    now = timezone.now()
+    expires_at = now + _lease()
+    by_lease = defaultdict(list)
+    for pk, lease in leases.items():
+        by_lease[lease].append(pk)
+    renewed = []
+    with transaction.atomic():
+        for lease, ids in by_lease.items():
+            rows = WebhookDelivery.objects.filter(pk__in=ids, status='in_flight', next_attempt_at=lease)
+            kept = list(rows.select_for_update().values_list('pk', flat=True))
+            WebhookDelivery.objects.filter(pk__in=kept).update(next_attempt_at=expires_at, updated_at=now)
+            renewed += kept
+    return expires_at, renewed
+
+
+def start_claimed(delivery_id, lease):
+    """Start the attempt of a delivery leased by the dispatcher, if that lease is still current
+
+    ``lease`` is the lease expiry the dispatcher set (``next_attempt_at``); it
+    changes whenever the row is leased again. Returns the delivery, renewed
+    for the attempt, in a list, or an empty list when the lease expired or
+    another lease replaced it.
+    """
+    now = timezone.now()
+    started = WebhookDelivery.objects.filter(
+        pk=delivery_id, status='in_flight', next_attempt_at=lease, next_attempt_at__gt=now,
+    ).update(attempts=F('attempts') + 1, next_attempt_at=now + _lease(), updated_at=now)
+    if not started:
+        return []
+    return list(WebhookDelivery.objects.filter(pk=delivery_id).select_related('webhook__form'))
+
+
+def build_request(webhook, event_type, payload, delivery=None):
+    """Sign a payload for a webhook, returning an ``OutgoingDelivery``
+
+    ``payload`` is an ``EncodedPayload`` shared with the event's other
+    subscribers, or a payload (a list for a batch) to encode.
+    """
+    if not isinstance(payload, EncodedPayload):
+        payload = EncodedPayload.encode(payload)
+    body, content_encoding = payload.content_for(webhook)
+    headers = [('Content-Type', 'application/json'), ('X-Webhook-Event', event_type)]
+    if content_encoding is not None:
+        headers.append(('Content-Encoding', content_encoding))
+    if payload.batch_size is not None:
+        headers.append(('X-Webhook-Batch-Size', str(payload.batch_size)))
+    if delivery is not None:
+        # Deliveries are at least once; receivers deduplicate on the id
+        headers.append(('X-Webhook-Delivery', str(delivery.pk)))
+        headers.append(('X-Webhook-Timestamp', f'{delivery.created_at.timestamp():.6f}'))
+    if webhook.secret:
+        headers.append(('X-Webhook-Signature', payload.signature(webhook.secret)))
+    return OutgoingDelivery(webhook, event_type, webhook.url, body, headers)
+
+
+def _payload_key(delivery):
+    return delivery.event_type, tuple(delivery.object_ids) or delivery.object_id
+
+
+def encode_payloads(deliveries):
+    """Encode the payload of each distinct event (or batch) of ``deliveries`` once
+
+    Returns ``{payload key: EncodedPayload}``, with None for events whose
+    objects were deleted since. Event objects are loaded in bulk. With the
+    Celery engine, where each task sends a single delivery, bodies of single
+    events are also shared between tasks through the cache.
+    """
+    encoded = {}
+    shared = settings.WEBHOOK_PAYLOAD_CACHE_TTL and _celery()
+    if shared:
+        keys = {
+            PAYLOAD_KEY.format(delivery.event_type, delivery.object_id): _payload_key(delivery)
+            for delivery in deliveries if not delivery.object_ids and delivery.event_type != TEST_EVENT
+        }
+        for cache_key, body in cache.get_many(keys).items():
+            encoded[keys[cache_key]] = EncodedPayload(body)
+
+    missing = {}
+    for delivery in deliveries:
+        key = _payload_key(delivery)
+        if key not in encoded:
+            missing.setdefault(key, delivery)
+    object_ids = defaultdict(set)
+    for delivery in missing.values():
+        object_ids[delivery.event_type].update(delivery.object_ids or [delivery.object_id])
+    events = {
+        event_type: EVENT_LOADERS[event_type](ids) if event_type in EVENT_LOADERS else {}
+        for event_type, ids in object_ids.items()
+    }
+
+    new_bodies = {}
+    for key, delivery in missing.items():
+        webhook = delivery.webhook
+        loaded = events[delivery.event_type]
+        found = [loaded[object_id] for object_id in delivery.object_ids or [delivery.object_id] if object_id in loaded]
+        if not found:
+            encoded[key] = None
+            continue
+        payloads = [
+            {
+                'event': delivery.event_type,
+                'form_id': str(webhook.form_id),
+                'form_title': webhook.form.title,
+                'data': data,
+                'timestamp': occurred_at.isoformat(),
+            }
+            for data, occurred_at in found
+        ]
+        # A batch goes out as an array of the events whose objects still exist
+        encoded[key] = EncodedPayload.encode(payloads if delivery.object_ids else payloads[0])
+        if not delivery.object_ids and delivery.event_type != TEST_EVENT:
+            new_bodies[PAYLOAD_KEY.format(delivery.event_type, delivery.object_id)] = encoded[key].body
+    if shared and new_bodies:
+        cache.set_many(new_bodies, settings.WEBHOOK_PAYLOAD_CACHE_TTL)
+    return encoded
+
+
+def prepare_deliveries(deliveries):
+    """Resolve claimed deliveries to requests
+
+    Returns the ``(delivery, request)`` pairs to send and the outcomes of
+    deliveries that cannot be sent because their webhook was disabled or
+    their object deleted since the event.
+    """
+    dropped = []
+    active = []
+    for delivery in deliveries:
+        if delivery.webhook.is_active or delivery.event_type == TEST_EVENT:
+            active.append(delivery)
+        else:
+            dropped.append((delivery, None, 'Webhook is disabled', False, None))
+
+    encoded = encode_payloads(active)
+    requests_to_send = []
+    for delivery in active:
+        payload = encoded[_payload_key(delivery)]
+        if payload is None:
+            dropped.append((delivery, None, 'Event object no longer exists', False, None))
+        else:
+            requests_to_send.append((delivery, build_request(delivery.webhook, delivery.event_type, payload, delivery)))
+    return requests_to_send, dropped
+
+
+def apply_breakers(requests_to_send):
+    """Split ``(delivery, request)`` pairs into those to send now and those to park
+
+    Parked deliveries come back as ``(delivery, retry_at)`` pairs. Of the
+    deliveries to a half-open host, only the first is sent, as the probe.
+    """
+    allowed = []
+    parked = []
+    decisions = {}
+    for delivery, request in requests_to_send:
+        host = breaker.breaker_host(request.url)
+        if host not in decisions:
+            decisions[host] = breaker.acquire(host)
+        send, probe, retry_at = decisions[host]
+        if send:
+            allowed.append((delivery, request))
+            if probe:
+                decisions[host] = (False, False, retry_at)
+        else:
+            parked.append((delivery, retry_at))
+    return allowed, parked
+
+
+def park_deliveries(parked):
+    """Reschedule deliveries held back by an open breaker, without using up an attempt
+
+    Test requests are not parked: they fail right away, saying when the host
+    is tried again.
+    """
+    now = timezone.now()
+    tests = [(delivery, retry_at) for delivery, retry_at in parked if delivery.event_type == TEST_EVENT]
+    if tests:
+        record_outcomes([
+            (delivery, None, f"Circuit breaker open for {breaker.breaker_host(delivery.webhook.url)} until "
+                             f"{datetime.fromtimestamp(retry_at, dt_timezone.utc).isoformat()}", False, None)
+            for delivery, retry_at in tests
+        ])
+        parked = [(delivery, retry_at) for delivery, retry_at in parked if delivery.event_type != TEST_EVENT]
+    for delivery, retry_at in parked:
+        # Spread out so a reopened host is not hit by the whole backlog at once
+        retry_at += random.uniform(0, settings.WEBHOOK_BREAKER_COOLDOWN / 2)
+        delivery.status = 'pending'
+        delivery.attempts -= 1
+        delivery.next_attempt_at = datetime.fromtimestamp(retry_at, dt_timezone.utc)
+        delivery.updated_at = now
+    WebhookDelivery.objects.bulk_update(
+        [delivery for delivery, _ in parked], ['status', 'attempts', 'next_attempt_at', 'updated_at'], batch_size=500,
+    )
+
+
+def retry_delay(attempts):
+    """Seconds before the next attempt: exponential backoff with equal jitter"""
+    delay = min(settings.WEBHOOK_RETRY_MAX_DELAY, settings.WEBHOOK_RETRY_BASE_DELAY * 2 ** (attempts - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def record_outcomes(outcomes):
+    """Apply attempt outcomes to their deliveries and log them, in bulk
+
+    ``outcomes`` holds ``(delivery, response_code, response_body_or_error, retry, timing)``
+    tuples; a 2xx response code is a success, anything else a failure that is
+    retried while ``retry`` is set and attempts are left. ``timing`` is the
+    attempt's ``engine.Timing``, None when nothing was sent. Returns, for each
+    receiver host attempted, whether its breaker is open afterwards.
+
+    Test requests are never retried, always logged, and their outcome is
+    cached for ``test_result``.
+    """
+    now = timezone.now()
+    attempts = []
+    test_results = {}
+    for delivery, response_code, text, retry, timing in outcomes:
+        is_test = delivery.event_type == TEST_EVENT
+        delivery.last_response_code = response_code
+        delivery.updated_at = now
+        if response_code is not None and 200 <= response_code < 300:
+            delivery.status = 'succeeded'
+            delivery.next_attempt_at = None
+            delivery.delivered_at = now
+            delivery.last_error = ''
+        else:
+            delivery.last_error = text[:500]
+            if retry and not is_test and delivery.attempts < settings.WEBHOOK_MAX_ATTEMPTS:
+                delivery.status = 'pending'
+                delivery.next_attempt_at = now + timedelta(seconds=retry_delay(delivery.attempts))
+            else:
+                delivery.status = 'dead'
+                delivery.next_attempt_at = None
+        if response_code is not None or retry:
+            elapsed = timing.total if timing is not None else None
+            attempts.append(logbook.attempt(
+                delivery.webhook_id, delivery.event_type, response_code, text, elapsed, always_log=is_test,
+            ))
+            # From the event itself, so time spent in the outbox counts too
+            occurred_at = delivery.occurred_at or delivery.created_at
+            lag = (now - occurred_at).total_seconds() if delivery.status == 'succeeded' else None
+            metrics.record(
+                delivery.webhook_id, breaker.breaker_host(delivery.webhook.url), timing,
+                failed=delivery.status != 'succeeded', lag=lag,
+            )
+        if is_test:
+            test_results[TEST_RESULT_KEY.format(delivery.pk)] = _test_outcome(delivery, text)
+
+    WebhookDelivery.objects.bulk_update(
+        [delivery for delivery, *_ in outcomes],
+        ['status', 'next_attempt_at', 'last_response_code', 'last_error', 'delivered_at', 'updated_at'],
+        batch_size=500,
+    )
+    logbook.record_attempts(attempts)
+    if test_results:
+        cache.set_many(test_results, settings.WEBHOOK_TEST_RESULT_TTL)
+    return breaker.record_outcomes(
+        (delivery.webhook.url, response_code) for delivery, response_code, _, retry, _ in outcomes if retry
+    )
+
+
+def post(delivery):
+    """Send an ``OutgoingDelivery`` synchronously over the shared session"""
+    return _session.post(
+        delivery.url,
+        data=delivery.body,
+        headers=dict(delivery.headers),
+        timeout=(settings.WEBHOOK_CONNECT_TIMEOUT, settings.WEBHOOK_TIMEOUT),
+    )
+
+
+def send_deliveries(deliveries):
+    """Attempt claimed deliveries one by one over the shared session"""
+    requests_to_send, outcomes = prepare_deliveries(deliveries)
+    requests_to_send, parked = apply_breakers(requests_to_send)
+    park_deliveries(parked)
+    for delivery, request in requests_to_send:
+        started = time.monotonic()
+        try:
+            response = post(request)
+        except requests.RequestException as e:
+            logger.warning(f"Webhook {delivery.webhook_id} delivery {delivery.pk} failed: {e}")
+            outcomes.append((delivery, None, str(e), True, Timing(None, None, time.monotonic() - started)))
+        else:
+            # requests only times the exchange up to the response headers
+            timing = Timing(None, response.elapsed.total_seconds(), time.monotonic() - started)
+            outcomes.append((delivery, response.status_code, response.text, True, timing))
+    record_outcomes(outcomes)
+    return outcomes
+
+
+def oldest_due_lag():
+    """Seconds the most overdue delivery has been waiting past its due time, 0 when none is"""
+    now = timezone.now()
+    due = WebhookDelivery.objects.filter(status__in=ACTIVE_STATUSES, next_attempt_at__lte=now)
+    oldest = due.aggregate(oldest=Min('next_attempt_at'))['oldest']
+    return (now - oldest).total_seconds() if oldest else 0.0
+
+
+def dispatch_due_deliveries():
+    """Hand due deliveries to ``deliver_webhook`` tasks, returning how many"""
+    from celery import group
+    from .tasks import deliver_webhook
+
+    dispatched = 0
+    while True:
+        batch_size = settings.WEBHOOK_WORKER_BATCH_SIZE
+        deliveries = claim_deliveries(batch_size, attempt=False)
+        group(
+            deliver_webhook.s(delivery.pk, lease=delivery.next_attempt_at.isoformat()) for delivery in deliveries
+        ).apply_async()
+        dispatched += len(deliveries)
+        if len(deliveries) < batch_size:
+            return dispatched
+
+
+def replay_dead_deliveries(webhook, ids=None):
+    """Requeue dead deliveries of a webhook, spaced out to ``WEBHOOK_REPLAY_RATE`` per second
+
+    Replays queue behind the ones already scheduled for the webhook, so
+    repeated requests cannot stampede the receiver either. Returns the number
+    of deliveries requeued and when the last one is due.
+    """
+    now = timezone.now()
+    interval = timedelta(seconds=1 / settings.WEBHOOK_REPLAY_RATE)
+    with transaction.atomic():
+        Webhook.objects.select_for_update().filter(pk=webhook.pk).first()
+        dead = webhook.deliveries.filter(status='dead').exclude(event_type=TEST_EVENT)
+        if ids is not None:
+            dead = dead.filter(pk__in=ids)
+        deliveries = list(dead.order_by('created_at').only('pk')[:settings.WEBHOOK_REPLAY_MAX])
+        if not deliveries:
+            return 0, None
+
+        # Replayed deliveries restart at zero attempts
+        scheduled = webhook.deliveries.filter(status='pending', attempts=0).aggregate(last=Max('next_attempt_at'))
+        due = max(now, scheduled['last'] + interval) if scheduled['last'] else now
+        for delivery in deliveries:
+            delivery.status = 'pending'
+            delivery.attempts = 0
+            delivery.next_attempt_at = due
+            delivery.updated_at = now
+            due += interval
+        WebhookDelivery.objects.bulk_update(
+            deliveries, ['status', 'attempts', 'next_attempt_at', 'updated_at'], batch_size=1000,
+        )
+    return len(deliveries), deliveries[-1].next_attempt_at
@@ -0,0 +1,263 @@
+# apps/webhooks/engine.py
+"""
+Asyncio HTTP/1.1 client for delivering webhooks at high concurrency.
+
+Connections are pooled per host (scheme, host, port) and kept alive between
+deliveries, so a busy endpoint pays for the TCP and TLS handshakes once
+rather than on every event. Each connection carries one request at a time
+(no pipelining, which few receivers handle correctly) and is retired after
+``max_requests`` requests or ``keepalive_timeout`` seconds idle. Concurrency
+is capped per host and for the whole engine: the per-host slot is taken
+first, so a slow host queues its own deliveries without starving the others
+of global slots.
+
+Each result carries the attempt's ``Timing`` once it holds its slots:
+connecting (DNS lookup and TCP/TLS handshake, zero on a reused connection),
+time to the first response byte and total, all in seconds.
+
+Only what webhook delivery needs is implemented: POST with a fixed-length
+body, and responses with ``Content-Length``, chunked or close-delimited
+bodies.
+"""
+import asyncio
+import ssl
+import time
+from collections import deque, namedtuple
+from urllib.parse import urlsplit
+
+USER_AGENT = 'FusionForms-Webhooks/1.0'
+
+# Bytes of the response body kept for the delivery log
+BODY_LIMIT = 500
+# Larger bodies are not drained; the connection is closed instead
+DRAIN_LIMIT = 64 * 1024
+
+# ``elapsed`` includes waiting for a slot, ``timing`` does not
+DeliveryResult = namedtuple('DeliveryResult', ['status', 'body', 'error', 'elapsed', 'timing'])
+Timing = namedtuple('Timing', ['connect', 'first_byte', 'total'])
+
+
+class ProtocolError(Exception):
+    """The receiver sent something that is not a valid HTTP/1.1 response"""
+
+
+class _Connection:
+    __slots__ = ('reader', 'writer', 'requests', 'last_used')
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.requests = 0
+        self.last_used = time.monotonic()
+
+    def close(self):
+        self.writer.close()
+
+
+class _HostPool:
+    def __init__(self, max_connections):
+        self.slots = asyncio.Semaphore(max_connections)
+        self.idle = deque()
+
+
+def _target(url):
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        raise ValueError(f'Unsupported webhook URL: {url}')
+    secure = parts.scheme == 'https'
+    port = parts.port or (443 if secure else 80)
+    path = parts.path or '/'
+    if parts.query:
+        path = f'{path}?{parts.query}'
+    if any(ord(char) < 0x21 for char in path):
+        raise ValueError(f'Unsupported webhook URL: {url}')
+    host_header = parts.hostname if port == (443 if secure else 80) else f'{parts.hostname}:{port}'
+    if ':' in parts.hostname:  # IPv6 literal
+        host_header = f'[{parts.hostname}]' if port == (443 if secure else 80) else f'[{parts.hostname}]:{port}'
+    return (parts.scheme, parts.hostname, port), path, host_header
+
+
+async def _read_headers(reader):
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionResetError('Connection closed before the response')
+    try:
+        version, status = status_line.split(None, 2)[:2]
+        status = int(status)
+    except ValueError:
+        raise ProtocolError(f'Invalid status line {status_line[:100]!r}')
+    headers = {}
+    for _ in range(100):
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            return version, status, headers
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    raise ProtocolError('Too many response headers')
+
+
+async def _read_body(reader, headers, status):
+    """Return ``(kept body bytes, connection reusable)``"""
+    if status in (204, 304):
+        return b'', True
+    if 'chunked' in headers.get('transfer-encoding', '').lower():
+        kept = bytearray()
+        total = 0
+        while True:
+            size = int((await reader.readline()).split(b';', 1)[0].strip() or b'0', 16)
+            if size == 0:
+                while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass  # Trailers
+                return bytes(kept), True
+            total += size
+            if total > DRAIN_LIMIT:
+                return bytes(kept), False
+            chunk = await reader.readexactly(size)
+            await reader.readexactly(2)
+            if len(kept) < BODY_LIMIT:
+                kept += chunk[:BODY_LIMIT - len(kept)]
+    if 'content-length' in headers:
+        length = int(headers['content-length'])
+        if length > DRAIN_LIMIT:
+            return await reader.read(BODY_LIMIT), False
+        return (await reader.readexactly(length))[:BODY_LIMIT], True
+    # Delimited by the server closing the connection
+    return await reader.read(BODY_LIMIT), False
+
+
+class DeliveryEngine:
+    """Pooled, concurrency-capped webhook sender; use one per event loop"""
+
+    def __init__(self, max_concurrency=512, max_per_host=32, keepalive_timeout=30.0, max_requests=1000,
+                 connect_timeout=5.0, timeout=10.0):
+        self.max_per_host = max_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.max_requests = max_requests
+        self.connect_timeout = connect_timeout
+        self.timeout = timeout
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._pools = {}
+        self._ssl = ssl.create_default_context()
+        self.connections_opened = 0
+
+    @classmethod
+    def from_settings(cls):
+        from django.conf import settings
+        return cls(
+            max_concurrency=settings.WEBHOOK_MAX_CONCURRENCY,
+            max_per_host=settings.WEBHOOK_MAX_PER_HOST,
+            keepalive_timeout=settings.WEBHOOK_KEEPALIVE_TIMEOUT,
+            max_requests=settings.WEBHOOK_KEEPALIVE_MAX_REQUESTS,
+            connect_timeout=settings.WEBHOOK_CONNECT_TIMEOUT,
+            timeout=settings.WEBHOOK_TIMEOUT,
+        )
+
+    def _pool(self, key):
+        pool = self._pools.get(key)
+        if pool is None:
+            pool = self._pools[key] = _HostPool(self.max_per_host)
+        return pool
+
+    async def _connect(self, key):
+        scheme, host, port = key
+        secure = scheme == 'https'
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(host, port, ssl=self._ssl if secure else None,
+                                    server_hostname=host if secure else None),
+            self.connect_timeout,
+        )
+        self.connections_opened += 1
+        return _Connection(reader, writer)
+
+    def _idle_connection(self, pool):
+        now = time.monotonic()
+        while pool.idle:
+            connection = pool.idle.pop()
+            if now - connection.last_used < self.keepalive_timeout and not connection.reader.at_eof():
+                return connection
+            connection.close()
+        return None
+
+    async def _exchange(self, connection, request, marks):
+        connection.writer.write(request)
+        await connection.writer.drain()
+        version, status, headers = await _read_headers(connection.reader)
+        marks['first_byte'] = time.monotonic()
+        while 100 <= status < 200:  # Interim responses precede the real one
+            version, status, headers = await _read_headers(connection.reader)
+        body, reusable = await _read_body(connection.reader, headers, status)
+        keep_alive = headers.get('connection', '').lower()
+        if version == b'HTTP/1.0':
+            reusable = reusable and keep_alive == 'keep-alive'
+        else:
+            reusable = reusable and keep_alive != 'close'
+        return status, body, reusable
+
+    async def _send(self, key, request, used, marks):
+        # Connections are recorded in ``used`` so the caller can close them on
+        # timeout; ``marks`` collects the timing of the phases
+        connection = self._idle_connection(self._pool(key))
+        if connection is not None:
+            used.append(connection)
+            try:
+                return await self._exchange(connection, request, marks)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                # The receiver closed the idle connection; nothing was processed
+                connection.close()
+        connecting = time.monotonic()
+        connection = await self._connect(key)
+        marks['connect'] = time.monotonic() - connecting
+        used.append(connection)
+        return await self._exchange(connection, request, marks)
+
+    async def post(self, url, body, headers=()):
+        """POST ``body`` to ``url``; never raises, failures are reported in the result"""
+        started = time.monotonic()
+        try:
+            key, path, host_header = _target(url)
+        except ValueError as e:
+            return DeliveryResult(None, b'', str(e), 0.0, None)
+        request = b''.join((
+            f'POST {path} HTTP/1.1\r\nHost: {host_header}\r\nUser-Agent: {USER_AGENT}\r\n'
+            f'Content-Length: {len(body)}\r\n'.encode('latin-1'),
+            b''.join(f'{name}: {value}\r\n'.encode('latin-1') for name, value in headers),
+            b'\r\n',
+            body,
+        ))
+
+        pool = self._pool(key)
+        async with pool.slots, self._slots:
+            used = []
+            sending = time.monotonic()
+            marks = {}
+            try:
+                status, response_body, reusable = await asyncio.wait_for(
+                    self._send(key, request, used, marks), self.connect_timeout + self.timeout
+                )
+            except asyncio.TimeoutError:
+                error = 'Timed out'
+            except (OSError, asyncio.IncompleteReadError, ProtocolError, ValueError) as e:
+                error = str(e) or type(e).__name__
+            else:
+                connection = used[-1]
+                connection.requests += 1
+                connection.last_used = time.monotonic()
+                if reusable and connection.requests < self.max_requests:
+                    pool.idle.append(connection)
+                else:
+                    connection.close()
+                now = time.monotonic()
+                timing = Timing(marks.get('connect', 0.0), marks['first_byte'] - sending, now - sending)
+                return DeliveryResult(status, response_body, None, now - started, timing)
+            for connection in used:
+                connection.close()
+            now = time.monotonic()
+            first_byte = marks['first_byte'] - sending if 'first_byte' in marks else None
+            timing = Timing(marks.get('connect'), first_byte, now - sending)
+            return DeliveryResult(None, b'', error, now - started, timing)
+
+    async def close(self):
+        for pool in self._pools.values():
+            while pool.idle:
+                pool.idle.pop().close()
+        self._pools.clear()
@@ -0,0 +1,197 @@
+# apps/webhooks/logbook.py
+"""
+Webhook delivery logs, aggregates and retention.
+
+Every delivery attempt counts towards its webhook's hourly
+``WebhookLogAggregate`` (successes, failures, latency histogram). Only
+failures, test requests and a ``WEBHOOK_LOG_SUCCESS_SAMPLE_RATE`` share of
+successes are also kept as ``WebhookLog`` rows, and successful rows keep no
+response body. Attempts are buffered in a Redis list and written in bulk by
+the ``flush_webhook_logs`` task, so delivering never waits on log inserts;
+without Redis they are written directly, still in bulk.
+
+``purge_expired`` deletes logs, aggregates and succeeded deliveries past
+their retention in oldest-first chunks, each in its own transaction.
+"""
+import bisect
+import json
+import logging
+import random
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from apps.core.redis import get_redis_connection, lease
+from .models import Webhook, WebhookDelivery, WebhookLog, WebhookLogAggregate
+
+logger = logging.getLogger(__name__)
+
+PENDING_KEY = 'fusionforms:webhooks:logs:pending'
+FLUSH_LEASE = 120  # Seconds a flush holds the buffer, renewed per chunk
+
+# One delivery attempt; ``elapsed`` (seconds) is None when it was not timed
+Attempt = namedtuple('Attempt', ['webhook_id', 'event_type', 'response_code', 'text', 'elapsed', 'keep'])
+
+
+def is_success(response_code):
+    return response_code is not None and 200 <= response_code < 300
+
+
+def attempt(webhook_id, event_type, response_code, text, elapsed=None, always_log=False):
+    """Describe an attempt, deciding whether it is kept as a ``WebhookLog`` row"""
+    success = is_success(response_code)
+    keep = always_log or not success or random.random() < settings.WEBHOOK_LOG_SUCCESS_SAMPLE_RATE
+    return Attempt(str(webhook_id), event_type, response_code, '' if success else text[:500], elapsed, keep)
+
+
+def record_attempts(attempts):
+    """Count attempts and log the kept ones, through the Redis buffer when available"""
+    if not attempts:
+        return
+    now = timezone.now().timestamp()
+    redis_conn = get_redis_connection()
+    if redis_conn is not None:
+        try:
+            redis_conn.rpush(PENDING_KEY, *(json.dumps([*entry, now]) for entry in attempts))
+            return
+        except Exception as e:
+            logger.warning(f"Buffering {len(attempts)} webhook log entries failed, writing through: {e}")
+    write_attempts([(entry, now) for entry in attempts])
+
+
+def _period_start(timestamp):
+    moment = datetime.fromtimestamp(timestamp, dt_timezone.utc)
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def write_attempts(attempts):
+    """Write ``(Attempt, unix_time)`` pairs: kept rows with ``bulk_create``, and the aggregates"""
+    webhook_ids = {entry.webhook_id for entry, _ in attempts}
+    # Attempts of webhooks deleted since are dropped
+    existing = {str(pk) for pk in Webhook.objects.filter(pk__in=webhook_ids).values_list('pk', flat=True)}
+
+    logs = []
+    deltas = {}
+    buckets = len(WebhookLogAggregate.LATENCY_BUCKETS) + 1
+    for entry, timestamp in attempts:
+        if entry.webhook_id not in existing:
+            continue
+        if entry.keep:
+            logs.append(WebhookLog(
+                webhook_id=entry.webhook_id,
+                event_type=entry.event_type,
+                response_code=entry.response_code,
+                response_body=entry.text,
+                duration_ms=round(entry.elapsed * 1000) if entry.elapsed is not None else None,
+                created_at=datetime.fromtimestamp(timestamp, dt_timezone.utc),
+            ))
+        delta = deltas.setdefault((entry.webhook_id, _period_start(timestamp)), [0, 0, 0.0, [0] * buckets])
+        delta[0 if is_success(entry.response_code) else 1] += 1
+        if entry.elapsed is not None:
+            delta[2] += entry.elapsed
+            delta[3][bisect.bisect_left(WebhookLogAggregate.LATENCY_BUCKETS, entry.elapsed)] += 1
+
+    with transaction.atomic():
+        WebhookLog.objects.bulk_create(logs, batch_size=1000)
+        _apply_aggregates(deltas)
+    return len(logs)
+
+
+def _apply_aggregates(deltas):
+    if not deltas:
+        return
+    WebhookLogAggregate.objects.bulk_create(
+        [WebhookLogAggregate(webhook_id=webhook_id, period_start=period) for webhook_id, period in deltas],
+        ignore_conflicts=True,
+    )
+    keys = Q()
+    for webhook_id, period in deltas:
+        keys |= Q(webhook_id=webhook_id, period_start=period)
+    aggregates = list(WebhookLogAggregate.objects.select_for_update().filter(keys).order_by('pk'))
+    for aggregate in aggregates:
+        successes, failures, latency_sum, buckets = deltas[(str(aggregate.webhook_id), aggregate.period_start)]
+        current = aggregate.latency_buckets or [0] * len(buckets)
+        aggregate.successes += successes
+        aggregate.failures += failures
+        aggregate.latency_sum += latency_sum
+        aggregate.latency_buckets = [a + b for a, b in zip(current, buckets)]
+    WebhookLogAggregate.objects.bulk_update(
+        aggregates, ['successes', 'failures', 'latency_sum', 'latency_buckets', 'updated_at'], batch_size=500,
+    )
+
+
+def flush_logs():
+    """Write the attempts buffered in Redis, returning how many were flushed"""
+    redis_conn = get_redis_connection()
+    if redis_conn is None:
+        return 0
+
+    # One flush at a time: a second one renaming the live list would
+    # overwrite the flushing list the first is still draining
+    with lease(redis_conn, f'{PENDING_KEY}:lease', FLUSH_LEASE) as lock:
+        if lock is None:
+            return 0
+
+        # Swap the live list out so concurrent attempts keep accumulating; a
+        # leftover flushing list from a crashed run is drained first
+        flushing_key = f'{PENDING_KEY}:flushing'
+        if not redis_conn.exists(flushing_key):
+            if not redis_conn.exists(PENDING_KEY):
+                return 0
+            redis_conn.rename(PENDING_KEY, flushing_key)
+
+        flushed = 0
+        batch_size = settings.WEBHOOK_LOG_FLUSH_BATCH_SIZE
+        while True:
+            chunk = redis_conn.lrange(flushing_key, 0, batch_size - 1)
+            if not chunk:
+                break
+            attempts = []
+            for raw in chunk:
+                *fields, timestamp = json.loads(raw)
+                attempts.append((Attempt(*fields), timestamp))
+            write_attempts(attempts)
+            # Trimmed only once written, so a crash repeats at most this chunk
+            redis_conn.ltrim(flushing_key, len(chunk), -1)
+            flushed += len(chunk)
+            lock.reacquire()
+        redis_conn.delete(flushing_key)
+        return flushed
+
+
+def _purge(rows, order_by):
+    deleted = 0
+    batch_size = settings.WEBHOOK_PURGE_BATCH_SIZE
+    while True:
+        batch = list(rows.order_by(order_by).values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            return deleted
+        with transaction.atomic():
+            count, _ = rows.model.objects.filter(pk__in=batch).delete()
+        deleted += count
+
+
+def purge_expired():
+    """Delete logs, aggregates and succeeded deliveries past their retention, in chunks"""
+    now = timezone.now()
+    return {
+        'logs': _purge(
+            WebhookLog.objects.filter(created_at__lt=now - timedelta(days=settings.WEBHOOK_LOG_RETENTION_DAYS)),
+            'created_at',
+        ),
+        'aggregates': _purge(
+            WebhookLogAggregate.objects.filter(
+                period_start__lt=now - timedelta(days=settings.WEBHOOK_AGGREGATE_RETENTION_DAYS)
+            ),
+            'period_start',
+        ),
+        'deliveries': _purge(
+            WebhookDelivery.objects.filter(
+                status='succeeded',
+                delivered_at__lt=now - timedelta(days=settings.WEBHOOK_DELIVERY_RETENTION_DAYS),
+            ),
+            'delivered_at',
+        ),
+    }
@@ -0,0 +1,86 @@
+import json
+import random
+import string
+import time
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+from apps.webhooks.delivery import build_request
+from apps.webhooks.models import Webhook
+from apps.webhooks.payloads import EncodedPayload, sign
+
+
+def synthetic_submission(size, rng):
+    """Submission data of roughly ``size`` bytes of JSON, spread over text fields"""
+    data = {}
+    while len(json.dumps(data)) < size:
+        data[f'field_{len(data)}'] = ''.join(rng.choices(string.ascii_letters + ' ', k=rng.randint(20, 400)))
+    return data
+
+
+class Command(BaseCommand):
+    help = 'Measure the CPU cost of building one event\'s requests for every subscriber'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subscribers', type=int, default=50)
+        parser.add_argument('--payload-bytes', type=int, default=100 * 1024)
+        parser.add_argument('--gzip-share', type=float, default=0.5, help='Share of subscribers taking gzip')
+        parser.add_argument('--seconds', type=float, default=2.0, help='Duration of each measurement')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        subscribers = options['subscribers']
+        webhooks = [
+            Webhook(
+                url=f'http://127.0.0.1/{index}',
+                secret=f'secret-{index}',
+                gzip_enabled=index < subscribers * options['gzip_share'],
+            )
+            for index in range(subscribers)
+        ]
+        payload = {
+            'event': 'submission.created',
+            'form_id': '00000000-0000-0000-0000-000000000000',
+            'form_title': 'Benchmark',
+            'data': synthetic_submission(options['payload_bytes'], rng),
+            'timestamp': '2024-01-01T00:00:00+00:00',
+        }
+
+        def per_subscriber():
+            # What each delivery cost before: its own encoding for the HMAC
+            # and another one for the request body
+            for webhook in webhooks:
+                signed = json.dumps(payload, cls=DjangoJSONEncoder).encode()
+                sign(webhook.secret, signed)
+                json.dumps(payload, cls=DjangoJSONEncoder).encode()
+
+        def encode_once():
+            encoded = EncodedPayload.encode(payload)
+            for webhook in webhooks:
+                build_request(webhook, 'submission.created', encoded)
+
+        def encode_once_plain():
+            encoded = EncodedPayload.encode(payload)
+            for webhook in webhooks:
+                encoded.signature(webhook.secret)
+
+        encoded = EncodedPayload.encode(payload)
+        self.stdout.write(
+            f"{subscribers} subscribers, {len(encoded.body) / 1024:.0f} KB body "
+            f"({len(encoded.gzipped()) / 1024:.0f} KB gzipped), "
+            f"{sum(webhook.gzip_enabled for webhook in webhooks)} taking gzip"
+        )
+        baseline = self._measure('encode per subscriber, twice', per_subscriber, options['seconds'])
+        plain = self._measure('encode once, sign per subscriber', encode_once_plain, options['seconds'])
+        gzipped = self._measure('encode once, sign and gzip once', encode_once, options['seconds'])
+        self.stdout.write(f"speedup {baseline / plain:.1f}x (without gzip), {baseline / gzipped:.1f}x (with gzip)")
+
+    def _measure(self, label, fan_out, seconds):
+        events = 0
+        started = time.process_time()
+        while time.process_time() - started < seconds:
+            fan_out()
+            events += 1
+        per_event = (time.process_time() - started) / events * 1000
+        self.stdout.write(f"{label:<36} {per_event:8.2f} ms CPU per event")
+        return per_event
@@ -0,0 +1,62 @@
+import asyncio
+import multiprocessing
+import time
+from django.core.management.base import BaseCommand
+from apps.webhooks.engine import DeliveryEngine
+from apps.webhooks.stub_receiver import StubReceiver, percentile
+
+
+def _serve(ports, delay):
+    async def serve():
+        receiver = StubReceiver(delay=delay)
+        servers = [await receiver.start(port=port) for port in ports]
+        await asyncio.gather(*(server.serve_forever() for server in servers))
+    asyncio.run(serve())
+
+
+class Command(BaseCommand):
+    help = 'Drive the asyncio delivery engine against local stub receivers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--deliveries', type=int, default=20000)
+        parser.add_argument('--hosts', type=int, default=4, help='Receivers, one port each')
+        parser.add_argument('--port', type=int, default=18000, help='First receiver port')
+        parser.add_argument('--payload-bytes', type=int, default=1024)
+        parser.add_argument('--delay', type=float, default=0.0, help='Receiver response delay (seconds)')
+        parser.add_argument('--concurrency', type=int, default=512)
+        parser.add_argument('--per-host', type=int, default=64)
+
+    def handle(self, *args, **options):
+        ports = [options['port'] + index for index in range(options['hosts'])]
+        receiver = multiprocessing.Process(target=_serve, args=(ports, options['delay']), daemon=True)
+        receiver.start()
+        time.sleep(0.5)
+        try:
+            asyncio.run(self._run(ports, options))
+        finally:
+            receiver.terminate()
+
+    async def _run(self, ports, options):
+        engine = DeliveryEngine(max_concurrency=options['concurrency'], max_per_host=options['per_host'])
+        body = b'{"data":"' + b'x' * max(0, options['payload_bytes'] - 11) + b'"}'
+        headers = [('Content-Type', 'application/json')]
+        urls = [f'http://127.0.0.1:{port}/hook' for port in ports]
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(
+            engine.post(urls[index % len(urls)], body, headers) for index in range(options['deliveries'])
+        ))
+        elapsed = time.perf_counter() - started
+        await engine.close()
+
+        failed = sum(1 for result in results if result.status != 200)
+        latencies = [result.elapsed * 1000 for result in results]
+        self.stdout.write(
+            f"{len(results):,} deliveries to {len(ports)} hosts in {elapsed:.2f} s: "
+            f"{len(results) / elapsed:,.0f} deliveries/s, {failed} failed, "
+            f"{engine.connections_opened} connections opened"
+        )
+        self.stdout.write(
+            f"latency including queueing: p50 {percentile(latencies, 0.5):.1f} ms, "
+            f"p99 {percentile(latencies, 0.99):.1f} ms"
+        )
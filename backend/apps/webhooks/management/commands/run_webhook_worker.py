@@ -0,0 +1,14 @@
+import asyncio
+from django.core.management.base import BaseCommand
+from apps.webhooks.worker import WebhookWorker
+
+class Command(BaseCommand):
+    help = 'Deliver due webhooks with the asyncio delivery engine (WEBHOOK_DELIVERY_ENGINE=async)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help='Deliveries leased per poll')
+
+    def handle(self, *args, **options):
+        worker = WebhookWorker(batch_size=options['batch_size'])
+        asyncio.run(worker.run())
+        self.stdout.write(f'Delivered {worker.delivered} webhooks')
@@ -0,0 +1,22 @@
+import asyncio
+from django.core.management.base import BaseCommand
+from apps.webhooks.stub_receiver import StubReceiver
+
+class Command(BaseCommand):
+    help = 'Run a local webhook receiver for load tests, reporting deliveries/sec and latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--delay', type=float, default=0.0, help='Seconds to wait before answering')
+        parser.add_argument('--error-rate', type=float, default=0.0, help='Share of requests answered with 500')
+
+    def handle(self, *args, **options):
+        asyncio.run(self._serve(options))
+
+    async def _serve(self, options):
+        receiver = StubReceiver(delay=options['delay'], error_rate=options['error_rate'])
+        server = await receiver.start(options['host'], options['port'])
+        self.stdout.write(f"Receiving webhooks on http://{options['host']}:{options['port']}/")
+        async with server:
+            await asyncio.gather(server.serve_forever(), receiver.report(self.stdout.write))
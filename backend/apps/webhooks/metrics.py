@@ -0,0 +1,250 @@
+# apps/webhooks/metrics.py
+"""
+Webhook delivery timing metrics.
+
+Every attempt records its phases (``engine.Timing``: connect, time to first
+byte, total) and outcome, and every delivery that succeeds its queue lag,
+from the event to its delivery, into histograms per webhook and per receiver
+host. Histograms have fixed exponential buckets, so recording an attempt is a
+handful of dictionary increments under a lock.
+
+Each process adds what it recorded to per-minute Redis hashes (one per
+webhook or host) every ``WEBHOOK_METRICS_FLUSH_INTERVAL`` seconds, from a
+flusher thread started on the first record (lazily, which keeps it
+fork-safe) so an idle worker publishes its last samples too; workers also
+flush when they shut down.
+Readers merge the minutes of a window and interpolate quantiles from the
+buckets, so the stats are shared by every worker. Without Redis the minutes
+are kept in the process.
+"""
+import bisect
+import logging
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from django.conf import settings
+from apps.core.redis import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+KEY = 'fusionforms:webhooks:metrics:{}:{}:{}'  # Minute, scope, webhook id or host
+INDEX_KEY = 'fusionforms:webhooks:metrics:{}:index'  # Minute -> "scope|key" members
+
+# Bucket upper bounds in seconds, 1 ms doubling up to about 65 s, plus an overflow bucket
+BUCKETS = tuple(0.001 * 2 ** power for power in range(17))
+PHASES = ('connect', 'first_byte', 'total')
+QUANTILES = (0.5, 0.95, 0.99)
+
+_lock = threading.Lock()
+_pending = defaultdict(Counter)  # (scope, key) -> field -> count
+_flusher_pid = None
+_memory = {}  # Minute -> {(scope, key): Counter}, without Redis
+
+
+def _bucket(seconds):
+    return bisect.bisect_left(BUCKETS, seconds)
+
+
+def record(webhook_id, host, timing, failed, lag=None):
+    """Record one attempt; ``timing`` may be None, ``lag`` (seconds) is set once delivered"""
+    values = [(metric, getattr(timing, metric)) for metric in PHASES] if timing is not None else []
+    values.append(('lag', lag))
+    with _lock:
+        for scope, key in (('webhook', str(webhook_id)), ('host', host)):
+            counts = _pending[(scope, key)]
+            counts['attempts'] += 1
+            if failed:
+                counts['errors'] += 1
+            for metric, value in values:
+                if value is not None:
+                    counts[f'{metric}|{_bucket(value)}'] += 1
+    ensure_flusher()
+
+
+def ensure_flusher():
+    """Start this process's flusher thread if it is not running yet"""
+    global _flusher_pid
+    pid = os.getpid()
+    if _flusher_pid == pid:
+        return
+    with _lock:
+        if _flusher_pid == pid:
+            return
+        _flusher_pid = pid
+    threading.Thread(target=_flush_periodically, name='webhook-metrics', daemon=True).start()
+
+
+def _flush_periodically():
+    while True:
+        time.sleep(settings.WEBHOOK_METRICS_FLUSH_INTERVAL)
+        try:
+            flush()
+        except Exception:
+            logger.exception("Flushing webhook delivery metrics failed")
+
+
+def flush():
+    """Add what this process recorded to the current minute's shared histograms"""
+    global _pending
+    with _lock:
+        pending, _pending = _pending, defaultdict(Counter)
+    if not pending:
+        return
+    minute = int(time.time() // 60)
+    retention = settings.WEBHOOK_METRICS_RETENTION_MINUTES * 60
+    redis_conn = get_redis_connection()
+    if redis_conn is None:
+        with _lock:
+            stored = _memory.setdefault(minute, defaultdict(Counter))
+            for scope_key, counts in pending.items():
+                stored[scope_key].update(counts)
+            for old in [old for old in _memory if old <= minute - settings.WEBHOOK_METRICS_RETENTION_MINUTES]:
+                del _memory[old]
+        return
+    try:
+        pipe = redis_conn.pipeline(transaction=False)
+        index_key = INDEX_KEY.format(minute)
+        for (scope, key), counts in pending.items():
+            hash_key = KEY.format(minute, scope, key)
+            for field, count in counts.items():
+                pipe.hincrby(hash_key, field, count)
+            pipe.expire(hash_key, retention)
+            pipe.sadd(index_key, f'{scope}|{key}')
+        pipe.expire(index_key, retention)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Publishing webhook delivery metrics failed: {e}")
+
+
+def _minutes(window):
+    current = int(time.time() // 60)
+    return range(current - window + 1, current + 1)
+
+
+def read(scope_keys, window):
+    """Merged counters of ``(scope, key)`` pairs over the last ``window`` minutes"""
+    scope_keys = list(scope_keys)
+    merged = {scope_key: Counter() for scope_key in scope_keys}
+    redis_conn = get_redis_connection()
+    if redis_conn is None:
+        with _lock:
+            for minute in _minutes(window):
+                stored = _memory.get(minute, {})
+                for scope_key in scope_keys:
+                    merged[scope_key].update(stored.get(scope_key, ()))
+        return merged
+    pipe = redis_conn.pipeline(transaction=False)
+    for minute in _minutes(window):
+        for scope, key in scope_keys:
+            pipe.hgetall(KEY.format(minute, scope, key))
+    results = iter(pipe.execute())
+    for minute in _minutes(window):
+        for scope_key in scope_keys:
+            merged[scope_key].update({field.decode(): int(count) for field, count in next(results).items()})
+    return merged
+
+
+def read_all(window):
+    """Merged counters of every webhook and host with attempts in the last ``window`` minutes"""
+    redis_conn = get_redis_connection()
+    if redis_conn is None:
+        with _lock:
+            scope_keys = {scope_key for minute in _minutes(window) for scope_key in _memory.get(minute, {})}
+        return read(sorted(scope_keys), window)
+    pipe = redis_conn.pipeline(transaction=False)
+    for minute in _minutes(window):
+        pipe.smembers(INDEX_KEY.format(minute))
+    scope_keys = {tuple(member.decode().split('|', 1)) for members in pipe.execute() for member in members}
+    return read(sorted(scope_keys), window)
+
+
+def quantile(counts, metric, fraction):
+    """Interpolate a quantile (seconds) of ``metric`` from its bucket counts, None without samples"""
+    buckets = [counts.get(f'{metric}|{index}', 0) for index in range(len(BUCKETS) + 1)]
+    total = sum(buckets)
+    if not total:
+        return None
+    rank = fraction * total
+    seen = 0
+    for index, count in enumerate(buckets):
+        if count and seen + count >= rank:
+            if index == len(BUCKETS):
+                return BUCKETS[-1]
+            lower = BUCKETS[index - 1] if index else 0.0
+            return lower + (BUCKETS[index] - lower) * (rank - seen) / count
+        seen += count
+    return BUCKETS[-1]
+
+
+def summarize(counts):
+    """Attempts, error rate and quantiles in milliseconds of merged counters"""
+    def quantiles(metric):
+        values = {f'p{round(q * 100)}': quantile(counts, metric, q) for q in QUANTILES}
+        return {name: round(value * 1000, 2) if value is not None else None for name, value in values.items()}
+
+    attempts = counts.get('attempts', 0)
+    return {
+        'attempts': attempts,
+        'errors': counts.get('errors', 0),
+        'error_rate': round(counts.get('errors', 0) / attempts, 4) if attempts else None,
+        'latency_ms': {phase: quantiles(phase) for phase in PHASES},
+        'queue_lag_ms': quantiles('lag'),
+    }
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def prometheus(window, oldest_due=None):
+    """Render the last ``window`` minutes in the Prometheus text exposition format"""
+    merged = read_all(window)
+    lines = [
+        '# HELP fusionforms_webhook_delivery_seconds Webhook delivery attempt phases '
+        f'over the last {window} minutes',
+        '# TYPE fusionforms_webhook_delivery_seconds summary',
+    ]
+    for (scope, key), counts in merged.items():
+        for phase in PHASES:
+            labels = f'{scope}="{_label(key)}",phase="{phase}"'
+            for q in QUANTILES:
+                value = quantile(counts, phase, q)
+                if value is not None:
+                    lines.append(f'fusionforms_webhook_delivery_seconds{{{labels},quantile="{q}"}} {value:.6f}')
+    lines += [
+        '# HELP fusionforms_webhook_queue_lag_seconds Time from event to successful delivery '
+        f'over the last {window} minutes',
+        '# TYPE fusionforms_webhook_queue_lag_seconds summary',
+    ]
+    for (scope, key), counts in merged.items():
+        labels = f'{scope}="{_label(key)}"'
+        for q in QUANTILES:
+            value = quantile(counts, 'lag', q)
+            if value is not None:
+                lines.append(f'fusionforms_webhook_queue_lag_seconds{{{labels},quantile="{q}"}} {value:.6f}')
+    for name, field, description in (
+        ('attempts', 'attempts', 'Webhook delivery attempts'),
+        ('errors', 'errors', 'Failed webhook delivery attempts'),
+    ):
+        lines += [
+            f'# HELP fusionforms_webhook_delivery_{name} {description} over the last {window} minutes',
+            f'# TYPE fusionforms_webhook_delivery_{name} gauge',
+        ]
+        for (scope, key), counts in merged.items():
+            lines.append(f'fusionforms_webhook_delivery_{name}{{{scope}="{_label(key)}"}} {counts.get(field, 0)}')
+    lines += [
+        f'# HELP fusionforms_webhook_delivery_error_ratio Share of failed attempts over the last {window} minutes',
+        '# TYPE fusionforms_webhook_delivery_error_ratio gauge',
+    ]
+    for (scope, key), counts in merged.items():
+        if counts.get('attempts'):
+            ratio = counts.get('errors', 0) / counts['attempts']
+            lines.append(f'fusionforms_webhook_delivery_error_ratio{{{scope}="{_label(key)}"}} {ratio:.6f}')
+    if oldest_due is not None:
+        lines += [
+            '# HELP fusionforms_webhook_queue_oldest_due_seconds How overdue the oldest due delivery is',
+            '# TYPE fusionforms_webhook_queue_oldest_due_seconds gauge',
+            f'fusionforms_webhook_queue_oldest_due_seconds {oldest_due:.3f}',
+        ]
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.5 on 2026-10-19 13:58
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webhooks', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebhookDelivery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_type', models.CharField(max_length=50)),
+                ('object_id', models.CharField(max_length=64)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('in_flight', 'In flight'), ('succeeded', 'Succeeded'), ('dead', 'Dead')], default='pending', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(blank=True, null=True)),
+                ('last_response_code', models.IntegerField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('delivered_at', models.DateTimeField(blank=True, null=True)),
+                ('webhook', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deliveries', to='webhooks.webhook')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(condition=models.Q(('status__in', ('pending', 'in_flight'))), fields=['next_attempt_at'], name='webhooks_delivery_due_idx'), models.Index(fields=['webhook', 'status', '-created_at'], name='webhooks_we_webhook_3104f6_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.5 on 2026-10-19 14:03
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webhooks', '0002_webhook_delivery'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='webhook',
+            name='batch_enabled',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='webhook',
+            name='batch_max_linger',
+            field=models.FloatField(default=1.0, validators=[django.core.validators.MinValueValidator(0.1), django.core.validators.MaxValueValidator(300)]),
+        ),
+        migrations.AddField(
+            model_name='webhook',
+            name='batch_max_size',
+            field=models.PositiveIntegerField(default=100, validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(1000)]),
+        ),
+        migrations.AddField(
+            model_name='webhookdelivery',
+            name='object_ids',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AlterField(
+            model_name='webhookdelivery',
+            name='object_id',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='webhookdelivery',
+            name='status',
+            field=models.CharField(choices=[('buffered', 'Buffered'), ('pending', 'Pending'), ('in_flight', 'In flight'), ('succeeded', 'Succeeded'), ('dead', 'Dead')], default='pending', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='webhookdelivery',
+            index=models.Index(condition=models.Q(('status', 'buffered')), fields=['webhook', 'event_type', 'created_at'], name='webhooks_delivery_buffer_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.5 on 2026-10-19 14:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webhooks', '0003_webhook_batching'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='webhook',
+            name='gzip_enabled',
+            field=models.BooleanField(default=False),
+        ),
+    ]
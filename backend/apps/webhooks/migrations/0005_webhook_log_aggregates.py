@@ -0,0 +1,55 @@
+# Generated by Django 4.2.5 on 2026-10-19 14:09
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webhooks', '0004_webhook_gzip'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebhookLogAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_start', models.DateTimeField()),
+                ('successes', models.PositiveIntegerField(default=0)),
+                ('failures', models.PositiveIntegerField(default=0)),
+                ('latency_sum', models.FloatField(default=0)),
+                ('latency_buckets', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-period_start'],
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='webhooklog',
+            name='webhooks_we_event_t_0eacb3_idx',
+        ),
+        migrations.AddField(
+            model_name='webhooklog',
+            name='duration_ms',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='webhookdelivery',
+            index=models.Index(condition=models.Q(('status', 'succeeded')), fields=['delivered_at'], name='webhooks_delivery_done_idx'),
+        ),
+        migrations.AddField(
+            model_name='webhooklogaggregate',
+            name='webhook',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='aggregates', to='webhooks.webhook'),
+        ),
+        migrations.AddIndex(
+            model_name='webhooklogaggregate',
+            index=models.Index(fields=['period_start'], name='webhooks_we_period__2b21c9_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='webhooklogaggregate',
+            constraint=models.UniqueConstraint(fields=('webhook', 'period_start'), name='webhooks_aggregate_period_uniq'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.5 on 2026-10-19 14:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webhooks', '0006_webhook_outbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='webhookdelivery',
+            name='occurred_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
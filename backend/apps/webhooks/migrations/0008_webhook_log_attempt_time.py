@@ -0,0 +1,19 @@
+# Generated by Django 4.2.5 on 2026-10-19 14:49
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webhooks', '0007_webhook_delivery_occurred_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='webhooklog',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -1,6 +1,8 @@
 # apps/webhooks/models.py
 import uuid
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth import get_user_model
 from apps.forms.models import Form
 
@@ -14,6 +16,17 @@ class Webhook(models.Model):
     secret = models.CharField(max_length=100, blank=True)
     events = models.JSONField(default=list)  # List of events to trigger on
     is_active = models.BooleanField(default=True)
+    # Large bodies are sent with Content-Encoding: gzip
+    gzip_enabled = models.BooleanField(default=False)
+    # Batching: events are buffered and sent as one JSON array once the
+    # buffer holds batch_max_size events or its oldest is batch_max_linger old
+    batch_enabled = models.BooleanField(default=False)
+    batch_max_size = models.PositiveIntegerField(
+        default=100, validators=[MinValueValidator(1), MaxValueValidator(1000)],
+    )
+    batch_max_linger = models.FloatField(
+        default=1.0, validators=[MinValueValidator(0.1), MaxValueValidator(300)],  # Seconds
+    )
     created_by = models.ForeignKey(User, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -30,19 +43,119 @@ class Webhook(models.Model):
         return f"{self.name} for {self.form.title}"
 
 class WebhookLog(models.Model):
+    """One delivery attempt: every failure, and a sample of the successes"""
     webhook = models.ForeignKey(Webhook, on_delete=models.CASCADE, related_name='logs')
     event_type = models.CharField(max_length=50)
     response_code = models.IntegerField(null=True, blank=True)
-    response_body = models.TextField(blank=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    response_body = models.TextField(blank=True)  # Left empty for successes
+    duration_ms = models.PositiveIntegerField(null=True, blank=True)
+    # When the attempt was made, which a buffered flush writes later
+    created_at = models.DateTimeField(default=timezone.now)
     
     class Meta:
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['webhook', '-created_at']),
-            models.Index(fields=['event_type']),
-            models.Index(fields=['-created_at']),
+            models.Index(fields=['-created_at']),  # Retention purge
         ]
     
     def __str__(self):
-        return f"Log for {self.webhook.name} - {self.event_type}"
\ No newline at end of file
+        return f"Log for {self.webhook.name} - {self.event_type}"
+
+class WebhookLogAggregate(models.Model):
+    """Counters of all delivery attempts of a webhook in one hour, sampled out or purged logs included"""
+    # Upper bounds (seconds) of the latency buckets; a last bucket counts slower attempts
+    LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+    webhook = models.ForeignKey(Webhook, on_delete=models.CASCADE, related_name='aggregates')
+    period_start = models.DateTimeField()
+    successes = models.PositiveIntegerField(default=0)
+    failures = models.PositiveIntegerField(default=0)
+    latency_sum = models.FloatField(default=0)  # Seconds, over attempts that were timed
+    latency_buckets = models.JSONField(default=list)  # Attempts per LATENCY_BUCKETS bucket
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-period_start']
+        constraints = [
+            models.UniqueConstraint(fields=['webhook', 'period_start'], name='webhooks_aggregate_period_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['period_start']),  # Retention purge
+        ]
+
+    def __str__(self):
+        return f"{self.webhook_id} from {self.period_start}: {self.successes} ok, {self.failures} failed"
+
+class WebhookDelivery(models.Model):
+    """One event to deliver to one webhook, retried with backoff until it succeeds or dies
+
+    For a batching webhook, each event first waits in the buffer as a
+    ``buffered`` row; a flush replaces the buffered rows with one delivery
+    listing all of their ``object_ids``.
+    """
+    STATUS_CHOICES = [
+        ('buffered', 'Buffered'),
+        ('pending', 'Pending'),
+        ('in_flight', 'In flight'),
+        ('succeeded', 'Succeeded'),
+        ('dead', 'Dead'),
+    ]
+
+    webhook = models.ForeignKey(Webhook, on_delete=models.CASCADE, related_name='deliveries')
+    event_type = models.CharField(max_length=50)
+    object_id = models.CharField(max_length=64, blank=True)  # Blank for a batch
+    object_ids = models.JSONField(default=list, blank=True)  # Events of a batch
+    # When the event happened (the oldest one of a batch), for the queue lag
+    occurred_at = models.DateTimeField(null=True, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    # When a pending delivery is due, or when the lease of an in-flight one
+    # expires; null once it succeeded or died
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
+    last_response_code = models.IntegerField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # Due-time index polled by the delivery workers
+            models.Index(
+                fields=['next_attempt_at'],
+                name='webhooks_delivery_due_idx',
+                condition=models.Q(status__in=('pending', 'in_flight')),
+            ),
+            models.Index(fields=['webhook', 'status', '-created_at']),
+            # Retention purge of succeeded deliveries
+            models.Index(
+                fields=['delivered_at'],
+                name='webhooks_delivery_done_idx',
+                condition=models.Q(status='succeeded'),
+            ),
+            # Per-webhook buffers of batching webhooks, oldest first
+            models.Index(
+                fields=['webhook', 'event_type', 'created_at'],
+                name='webhooks_delivery_buffer_idx',
+                condition=models.Q(status='buffered'),
+            ),
+        ]
+
+    def __str__(self):
+        target = self.object_id or f"batch of {len(self.object_ids)}"
+        return f"{self.event_type} {target} to {self.webhook_id} ({self.status})"
+
+class OutboxEvent(models.Model):
+    """An event recorded in the transaction of its object, until it is relayed to the deliveries"""
+    form_id = models.UUIDField()  # No foreign key: events of a deleted form are relayed to no one
+    event_type = models.CharField(max_length=50)
+    object_id = models.CharField(max_length=64)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']  # Relayed oldest first, through the primary key
+
+    def __str__(self):
+        return f"{self.event_type} {self.object_id} of {self.form_id}"
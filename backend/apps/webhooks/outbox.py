@@ -0,0 +1,56 @@
+# apps/webhooks/outbox.py
+"""
+Transactional outbox of webhook events.
+
+Request handlers record an event with ``publish_event`` inside the
+transaction that creates its object, so a submission and its event commit or
+roll back together, and answering the request never waits on the broker.
+``relay_outbox`` moves committed events to the delivery queue: it takes the
+oldest ``OutboxEvent`` rows in batches with ``SELECT ... FOR UPDATE SKIP
+LOCKED``, so relays running side by side never take the same event, and fans
+them out to the subscribed webhooks' deliveries (``delivery.py``) in the
+transaction that deletes them. An event is thus relayed exactly once, and
+while the broker or a relay is down events wait in the table.
+
+With the Celery engine the ``relay_webhook_outbox`` beat task relays; with
+the async engine the worker does, in its poll loop.
+"""
+from collections import defaultdict
+from django.conf import settings
+from django.db import transaction
+from .delivery import enqueue_deliveries
+from .models import OutboxEvent
+from .routing import subscribed_webhooks
+
+
+def publish_event(form_id, event_type, object_id):
+    """Record an event in the outbox; call it in the transaction that writes the object"""
+    return OutboxEvent.objects.create(form_id=form_id, event_type=event_type, object_id=str(object_id))
+
+
+def relay_batch(limit):
+    """Fan out up to ``limit`` of the oldest events and delete them, returning how many"""
+    with transaction.atomic():
+        events = list(OutboxEvent.objects.order_by('pk').select_for_update(skip_locked=True)[:limit])
+        if not events:
+            return 0
+        grouped = defaultdict(list)
+        for event in events:
+            grouped[(event.form_id, event.event_type)].append((event.object_id, event.created_at))
+        for (form_id, event_type), form_events in grouped.items():
+            subscriptions = subscribed_webhooks(form_id, event_type)
+            if subscriptions:
+                enqueue_deliveries(subscriptions, event_type, form_events)
+        OutboxEvent.objects.filter(pk__in=[event.pk for event in events]).delete()
+    return len(events)
+
+
+def relay_outbox():
+    """Relay events until the outbox is drained, returning how many were relayed"""
+    relayed = 0
+    batch_size = settings.WEBHOOK_OUTBOX_BATCH_SIZE
+    while True:
+        count = relay_batch(batch_size)
+        relayed += count
+        if count < batch_size:
+            return relayed
@@ -0,0 +1,72 @@
+# apps/webhooks/payloads.py
+"""
+Webhook payload encoding.
+
+An event is serialized once, to compact JSON, and the resulting bytes are
+both what every subscriber's HMAC covers and what is sent, so signatures
+always match the body byte for byte. ``EncodedPayload`` holds those bytes for
+all webhooks receiving the same event, along with the signature per secret
+and the gzipped body, each computed at most once. Webhooks with
+``gzip_enabled`` get bodies of ``WEBHOOK_GZIP_MIN_BYTES`` or more with
+``Content-Encoding: gzip``; the signature still covers the uncompressed JSON.
+
+orjson is used when it is installed, the standard library otherwise.
+"""
+import gzip
+import hashlib
+import hmac
+import json
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_fallback = DjangoJSONEncoder().default
+
+
+def encode_json(payload):
+    """Serialize a payload to compact JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(payload, default=_fallback)
+    return json.dumps(payload, cls=DjangoJSONEncoder, separators=(',', ':')).encode()
+
+
+def sign(secret, body):
+    """``X-Webhook-Signature`` header value for a request body"""
+    return 'sha256=' + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+class EncodedPayload:
+    """A payload serialized once and shared by every webhook it is sent to"""
+
+    __slots__ = ('body', 'batch_size', '_gzipped', '_signatures')
+
+    def __init__(self, body, batch_size=None):
+        self.body = body
+        self.batch_size = batch_size  # Number of events when the payload is a batch
+        self._gzipped = None
+        self._signatures = {}
+
+    @classmethod
+    def encode(cls, payload):
+        return cls(encode_json(payload), len(payload) if isinstance(payload, list) else None)
+
+    def signature(self, secret):
+        signature = self._signatures.get(secret)
+        if signature is None:
+            signature = self._signatures[secret] = sign(secret, self.body)
+        return signature
+
+    def gzipped(self):
+        if self._gzipped is None:
+            self._gzipped = gzip.compress(self.body, compresslevel=settings.WEBHOOK_GZIP_LEVEL, mtime=0)
+        return self._gzipped
+
+    def content_for(self, webhook):
+        """Return ``(body, content_encoding)`` as sent to ``webhook``"""
+        if webhook.gzip_enabled and len(self.body) >= settings.WEBHOOK_GZIP_MIN_BYTES:
+            return self.gzipped(), 'gzip'
+        return self.body, None
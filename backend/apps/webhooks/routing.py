@@ -0,0 +1,103 @@
+# apps/webhooks/routing.py
+"""
+Per-form webhook routing tables.
+
+A form's routing table maps each event type to the ``Subscription`` of every
+active webhook listening to it. Fanning an event out (and deciding whether
+there is anything to fan out at all) then costs a dictionary lookup instead
+of a query. Tables are cached in a per-process LRU in front of the shared
+cache (Redis); forms without webhooks cache an empty table too. Creating,
+updating or deleting a webhook, or deleting its form, replaces the form's
+generation in the shared cache and evicts the local entries in every process
+through ``apps.core.invalidation``. Shared entries carry the generation read
+before they were built and are ignored once it is replaced, so a build that
+read the webhooks before an invalidation cannot write its stale table back.
+"""
+import time
+import uuid
+from collections import namedtuple
+from django.conf import settings
+from django.core.cache import cache
+from apps.core import invalidation
+from apps.core.caching import LocalLRUCache
+from .models import Webhook
+
+NAMESPACE = 'webhooks.routes'
+KEY = 'webhooks:routes:{}'
+GENERATION_KEY = 'webhooks:routes:{}:gen'
+
+# An active webhook subscribed to an event; the batch fields are None unless it batches
+Subscription = namedtuple('Subscription', ['webhook_id', 'batch_size', 'batch_linger'])
+
+_routes = LocalLRUCache(
+    maxsize=settings.WEBHOOK_ROUTES_CACHE_SIZE,
+    ttl=settings.WEBHOOK_ROUTES_CACHE_TTL,
+)
+_evictions = 0  # Local evictions so far; builds that raced one stay out of the LRU
+
+
+def build_routes(form_id):
+    """Load a form's routing table, ``{event_type: (Subscription, ...)}``, from the database"""
+    rows = (
+        Webhook.objects.filter(form_id=form_id, form__deleted_at__isnull=True, is_active=True)
+        .order_by('created_at')
+        .values_list('pk', 'events', 'batch_enabled', 'batch_max_size', 'batch_max_linger')
+    )
+    routes = {}
+    for pk, events, enabled, size, linger in rows:
+        subscription = Subscription(pk, size, linger) if enabled else Subscription(pk, None, None)
+        for event_type in set(events or ()):
+            routes.setdefault(event_type, []).append(subscription)
+    return {event_type: tuple(subscriptions) for event_type, subscriptions in routes.items()}
+
+
+def get_routes(form_id):
+    """Return a form's routing table from the local cache, the shared cache or the database"""
+    invalidation.ensure_listener()
+    key = str(form_id)
+    routes = _routes.get(key)
+    if routes is not None:
+        return routes
+    evictions = _evictions
+    found = cache.get_many([KEY.format(key), GENERATION_KEY.format(key)])
+    generation = found.get(GENERATION_KEY.format(key))
+    entry = found.get(KEY.format(key))
+    if isinstance(entry, tuple) and entry[0] == generation:
+        routes = entry[1]
+    else:
+        started = time.monotonic()
+        routes = build_routes(form_id)
+        # Counted from the build, so an outdated entry expires before the generation replacing it
+        timeout = settings.WEBHOOK_ROUTES_SHARED_TTL - (time.monotonic() - started)
+        if timeout > 0:
+            cache.set(KEY.format(key), (generation, routes), timeout)
+    if evictions == _evictions:
+        _routes.set(key, routes)
+    return routes
+
+
+def subscribed_webhooks(form_id, event_type):
+    """``Subscription`` of each active webhook of a form that listens to ``event_type``"""
+    return get_routes(form_id).get(event_type, ())
+
+
+def invalidate_routes(form_id):
+    """Drop a form's routing table from the shared cache and from every process"""
+    cache.set(GENERATION_KEY.format(form_id), uuid.uuid4().hex, settings.WEBHOOK_ROUTES_SHARED_TTL)
+    cache.delete(KEY.format(form_id))
+    invalidation.broadcast(NAMESPACE, form_id)
+
+
+def _evict_local(key):
+    global _evictions
+    _evictions += 1
+    _routes.delete(key)
+
+
+def _clear_local():
+    global _evictions
+    _evictions += 1
+    _routes.clear()
+
+
+invalidation.register(NAMESPACE, _evict_local, _clear_local)
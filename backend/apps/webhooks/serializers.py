@@ -1,12 +1,32 @@
 # apps/webhooks/serializers.py
+from django.conf import settings
 from rest_framework import serializers
-from .models import Webhook, WebhookLog
+from .breaker import breaker_host, get_states
+from .models import Webhook, WebhookDelivery, WebhookLog
+
+class WebhookListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        # Breaker states of the whole page in one cache round trip
+        webhooks = list(data.all() if hasattr(data, 'all') else data)
+        self.context['breaker_states'] = get_states({breaker_host(webhook.url) for webhook in webhooks})
+        return super().to_representation(webhooks)
 
 class WebhookSerializer(serializers.ModelSerializer):
+    circuit = serializers.SerializerMethodField()
+
     class Meta:
         model = Webhook
         fields = '__all__'
         read_only_fields = ('id', 'created_by', 'created_at', 'updated_at')
+        list_serializer_class = WebhookListSerializer
+
+    def get_circuit(self, webhook) -> dict:
+        """State of the circuit breaker of the webhook's host"""
+        host = breaker_host(webhook.url)
+        states = self.context.get('breaker_states') or {}
+        if host not in states:
+            states = get_states([host])
+        return {'host': host, **states[host]}
     
     def create(self, validated_data):
         validated_data['created_by'] = self.context['request'].user
@@ -15,4 +35,30 @@ class WebhookSerializer(serializers.ModelSerializer):
 class WebhookLogSerializer(serializers.ModelSerializer):
     class Meta:
         model = WebhookLog
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+class WebhookDeliverySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = WebhookDelivery
+        fields = (
+            'id', 'event_type', 'object_id', 'object_ids', 'status', 'attempts', 'next_attempt_at',
+            'last_response_code', 'last_error', 'created_at', 'delivered_at',
+        )
+        read_only_fields = fields
+
+class WebhookStatsQuerySerializer(serializers.Serializer):
+    """Window of the delivery metrics, in minutes up to now"""
+    minutes = serializers.IntegerField(
+        min_value=1,
+        max_value=settings.WEBHOOK_METRICS_RETENTION_MINUTES,
+        default=settings.WEBHOOK_METRICS_WINDOW_MINUTES,
+    )
+
+class WebhookReplaySerializer(serializers.Serializer):
+    """Dead deliveries to requeue; all of the webhook's when ``ids`` is left out"""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        required=False,
+        allow_empty=False,
+        max_length=settings.WEBHOOK_REPLAY_MAX,
+    )
@@ -0,0 +1,21 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Webhook
+from .routing import invalidate_routes
+from apps.forms.snapshots import invalidate_form_snapshot
+
+
+@receiver(post_save, sender=Webhook)
+@receiver(post_delete, sender=Webhook)
+def invalidate_form_webhook_flags(sender, instance: Webhook, **kwargs):
+    # Routing tables, and the form snapshots built from them, list the active
+    # webhooks. Invalidate once committed so that nothing reloads them from
+    # the old rows, routes first.
+    form_id = instance.form_id
+
+    def invalidate():
+        invalidate_routes(form_id)
+        invalidate_form_snapshot(form_id)
+
+    transaction.on_commit(invalidate)
@@ -0,0 +1,84 @@
+# apps/webhooks/stub_receiver.py
+"""
+Local webhook receiver for load tests.
+
+Accepts keep-alive HTTP/1.1 POSTs on any path, optionally after a delay or
+with a configurable share of 500 responses, and answers ``ok``. Delivery
+latency is measured from the ``X-Webhook-Timestamp`` header (when the event
+was queued) to the moment the request is fully read, so it covers queueing
+in the delivery worker as well as the request itself.
+"""
+import asyncio
+import random
+import time
+
+OK = b'HTTP/1.1 200 OK\r\nContent-Length: 2\r\nContent-Type: text/plain\r\n\r\nok'
+ERROR = b'HTTP/1.1 500 Internal Server Error\r\nContent-Length: 5\r\nContent-Type: text/plain\r\n\r\nerror'
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class StubReceiver:
+    def __init__(self, delay=0.0, error_rate=0.0):
+        self.delay = delay
+        self.error_rate = error_rate
+        self.received = 0
+        self.connections = 0
+        self.latencies = []  # Seconds, since the last ``snapshot``
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                length = 0
+                queued_at = None
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.partition(b':')
+                    name = name.strip().lower()
+                    if name == b'content-length':
+                        length = int(value)
+                    elif name == b'x-webhook-timestamp':
+                        queued_at = float(value)
+                await reader.readexactly(length)
+                self.received += 1
+                if queued_at is not None:
+                    self.latencies.append(time.time() - queued_at)
+                if self.delay:
+                    await asyncio.sleep(self.delay)
+                writer.write(ERROR if self.error_rate and random.random() < self.error_rate else OK)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host='127.0.0.1', port=8765):
+        return await asyncio.start_server(self._handle, host, port, backlog=4096)
+
+    def snapshot(self):
+        """Return ``(received, p50, p99)`` latencies in ms since the previous snapshot"""
+        latencies, self.latencies = self.latencies, []
+        return self.received, percentile(latencies, 0.5) * 1000, percentile(latencies, 0.99) * 1000
+
+    async def report(self, write, interval=1.0):
+        """Write deliveries/sec and latency percentiles every ``interval`` seconds"""
+        previous = self.received
+        while True:
+            await asyncio.sleep(interval)
+            received, p50, p99 = self.snapshot()
+            rate = (received - previous) / interval
+            previous = received
+            if rate:
+                write(f'{rate:>10,.0f} deliveries/s  p50 {p50:8.1f} ms  p99 {p99:8.1f} ms  '
+                      f'{received:,} total  {self.connections} connections')
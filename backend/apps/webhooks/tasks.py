@@ -1,9 +1,81 @@
 # apps/webhooks/tasks.py
 from celery import shared_task
-from .views import trigger_webhooks
+from celery.signals import worker_process_shutdown, worker_shutdown
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
+from . import metrics
+from .delivery import (
+    claim_deliveries, dispatch_due_deliveries, enqueue_deliveries, flush_batches, send_deliveries, start_claimed,
+)
+from .logbook import flush_logs, purge_expired
+from .outbox import relay_outbox
+from .routing import subscribed_webhooks
+
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def flush_metrics(**kwargs):
+    """Publish the delivery metrics a worker process recorded since its last flush"""
+    metrics.flush()
+
+
+@shared_task
+def process_webhook(form_id, event_type, object_id):
+    """Record one delivery per webhook of the form subscribed to the event
+
+    Events are published through the outbox now; this task remains for those
+    already queued. The oldest of them carry the serialized submission rather
+    than its id.
+    """
+    if isinstance(object_id, dict):
+        object_id = object_id['id']
+    subscriptions = subscribed_webhooks(form_id, event_type)
+    if subscriptions:
+        enqueue_deliveries(subscriptions, event_type, [(object_id, None)])
+    return len(subscriptions)
+
+@shared_task
+def relay_webhook_outbox():
+    """Fan out events waiting in the outbox to their deliveries (Celery delivery engine)"""
+    if settings.WEBHOOK_DELIVERY_ENGINE == 'async':
+        return 0  # The async worker relays the outbox itself
+    return relay_outbox()
+
+# The request timeouts bound each socket operation; the time limit bounds a
+# receiver that keeps trickling bytes
+@shared_task(time_limit=settings.WEBHOOK_CONNECT_TIMEOUT + settings.WEBHOOK_TIMEOUT + 5)
+def deliver_webhook(delivery_id, claimed=False, lease=None):
+    """Attempt one delivery; ``lease`` (ISO expiry) when the dispatcher leased it for this task"""
+    if lease is not None:
+        deliveries = start_claimed(delivery_id, parse_datetime(lease))
+    elif claimed:
+        # Queued before leases were handed to tasks; the row may have been
+        # leased again since, so it is left to the dispatcher
+        deliveries = []
+    else:
+        deliveries = claim_deliveries(1, ids=[delivery_id])
+    send_deliveries(deliveries)
+    return len(deliveries)
+
+@shared_task
+def flush_webhook_batches(webhook_id):
+    """Flush a batching webhook's buffer once it has lingered"""
+    return len(flush_batches([webhook_id]))
+
+@shared_task
+def flush_webhook_logs():
+    """Write delivery attempts buffered in Redis to WebhookLog and the aggregates"""
+    return flush_logs()
+
+@shared_task
+def purge_webhook_logs():
+    """Delete webhook logs, aggregates and succeeded deliveries past their retention"""
+    return purge_expired()
 
 @shared_task
-def process_webhook(form_id, event_type, data):
-    """Process webhooks asynchronously"""
-    trigger_webhooks(form_id, event_type, data)
-    return f"Processed {event_type} webhook for form {form_id}"
\ No newline at end of file
+def dispatch_webhook_deliveries():
+    """Queue retries, stalled deliveries and lingering batches that are due (Celery delivery engine)"""
+    if settings.WEBHOOK_DELIVERY_ENGINE == 'async':
+        return 0  # The async worker polls the due index itself
+    flush_batches()
+    return dispatch_due_deliveries()
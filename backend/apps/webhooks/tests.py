@@ -0,0 +1,52 @@
+from unittest import mock
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from . import breaker
+
+HOST = 'hooks.example.com:443'
+URL = 'https://Hooks.example.com/receive'
+
+
+@override_settings(WEBHOOK_BREAKER_THRESHOLD=3, WEBHOOK_BREAKER_COOLDOWN=30, WEBHOOK_BREAKER_PROBE_TIMEOUT=20)
+class BreakerTest(SimpleTestCase):
+    """Breakers open after consecutive failures and let one probe through once cooled down"""
+
+    def setUp(self):
+        cache.clear()
+        self.now = 1000.0
+        patcher = mock.patch.object(breaker.time, 'time', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_hosts(self):
+        self.assertEqual(breaker.breaker_host(URL), HOST)
+        self.assertEqual(breaker.breaker_host('http://example.com:8080/x'), 'example.com:8080')
+        self.assertEqual(
+            [breaker.is_failure(code) for code in (None, 200, 404, 429, 503)], [True, False, False, True, True],
+        )
+
+    def test_opens_after_consecutive_failures(self):
+        self.assertEqual(breaker.record_outcomes([(URL, 500), (URL, None)]), {HOST: False})
+        self.assertEqual(breaker.acquire(HOST), (True, False, None))
+        # A success resets the count
+        self.assertEqual(breaker.record_outcomes([(URL, 500), (URL, 200), (URL, 500)]), {HOST: False})
+        self.assertEqual(breaker.record_outcomes([(URL, 429), (URL, 502)]), {HOST: True})
+        self.assertEqual(breaker.acquire(HOST), (False, False, 1030.0))
+        self.assertEqual(breaker.get_states([HOST])[HOST]['state'], 'open')
+
+    def test_single_probe_when_half_open(self):
+        breaker.record_outcomes([(URL, 500)] * 3)
+        self.now += 30
+        self.assertEqual(breaker.get_states([HOST])[HOST]['state'], 'half_open')
+        self.assertEqual(breaker.acquire(HOST), (True, True, 1050.0))
+        self.assertEqual(breaker.acquire(HOST), (False, False, 1050.0))
+
+        # A failed probe restarts the cooldown
+        self.assertTrue(breaker.record(HOST, False, 1))
+        self.assertEqual(breaker.acquire(HOST), (False, False, 1060.0))
+
+        self.now += 30
+        self.assertTrue(breaker.acquire(HOST)[1])
+        self.assertEqual(breaker.record_outcomes([(URL, 204)]), {HOST: False})
+        self.assertEqual(breaker.acquire(HOST), (True, False, None))
+        self.assertEqual(breaker.get_states([HOST])[HOST], {'state': 'closed', 'failures': 0, 'retry_at': None})
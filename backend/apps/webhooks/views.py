@@ -2,14 +2,32 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.views import APIView
+from django.conf import settings
+from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
 from drf_spectacular.utils import extend_schema, extend_schema_view
-import requests
-import json
-import hmac
-import hashlib
-from .models import Webhook, WebhookLog
-from .serializers import WebhookSerializer, WebhookLogSerializer
+from apps.core.permissions import CanViewMetrics
+from . import metrics
+from .breaker import breaker_host
+from .delivery import TEST_EVENT, enqueue_test, oldest_due_lag, replay_dead_deliveries, test_result
+from .models import Webhook
+from .serializers import (
+    WebhookSerializer, WebhookLogSerializer, WebhookDeliverySerializer, WebhookReplaySerializer,
+    WebhookStatsQuerySerializer,
+)
+
+
+def visible_webhooks(user):
+    """Webhooks a user may manage"""
+    # Webhooks of deleted forms stay hidden until they are purged
+    webhooks = Webhook.objects.filter(form__deleted_at__isnull=True)
+    if user.role == 'admin':
+        return webhooks
+    else:
+        # Users can only see webhooks for their own forms
+        return webhooks.filter(form__created_by=user)
+
 
 @extend_schema_view(
     list=extend_schema(tags=['Webhooks']),
@@ -25,136 +43,91 @@ class WebhookViewSet(viewsets.ModelViewSet):
     throttle_scope = 'webhooks'  # Rate limit webhook operations
     
     def get_queryset(self):
-        user = self.request.user
-        if user.role == 'admin':
-            return Webhook.objects.all()
-        else:
-            # Users can only see webhooks for their own forms
-            return Webhook.objects.filter(form__created_by=user)
+        return visible_webhooks(self.request.user)
     
     @extend_schema(tags=['Webhooks'])
     @action(detail=True, methods=['post'])
     def test(self, request, pk=None):
         webhook = self.get_object()
-        
-        # Create a test payload
-        payload = {
-            'event': 'test',
-            'form_id': str(webhook.form.id),
-            'form_title': webhook.form.title,
-            'timestamp': webhook.created_at.isoformat()
-        }
-        
-        # Send the test webhook
-        headers = {
-            'Content-Type': 'application/json',
-        }
-        
-        if webhook.secret:
-            signature = hmac.new(
-                webhook.secret.encode(),
-                json.dumps(payload).encode(),
-                hashlib.sha256
-            ).hexdigest()
-            headers['X-Webhook-Signature'] = f'sha256={signature}'
-        
-        try:
-            response = requests.post(
-                webhook.url,
-                json=payload,
-                headers=headers,
-                timeout=10
-            )
-            
-            # Log the test
-            WebhookLog.objects.create(
-                webhook=webhook,
-                event_type='test',
-                response_code=response.status_code,
-                response_body=response.text[:500]  # Limit response body size
-            )
-            
-            return Response({
-                'status': 'success',
-                'response_code': response.status_code,
-                'response_body': response.text[:500]
-            })
-        except Exception as e:
-            # Log the error
-            WebhookLog.objects.create(
-                webhook=webhook,
-                event_type='test',
-                response_code=None,
-                response_body=str(e)[:500]
-            )
-            
-            return Response({
-                'status': 'error',
-                'message': str(e)
-            }, status=status.HTTP_400_BAD_REQUEST)
+        # Sent by the delivery engine; the result is polled at tests/{id}/
+        delivery = enqueue_test(webhook)
+        return Response({
+            'id': delivery.pk,
+            'status': 'pending',
+        }, status=status.HTTP_202_ACCEPTED)
+    
+    @extend_schema(tags=['Webhooks'])
+    @action(detail=True, methods=['get'], url_path=r'tests/(?P<test_id>\d+)')
+    def test_status(self, request, pk=None, test_id=None):
+        webhook = self.get_object()
+        delivery = get_object_or_404(webhook.deliveries, pk=test_id, event_type=TEST_EVENT)
+        # Answered right away; clients poll again while it is pending
+        result = test_result(delivery)
+        response = Response(result)
+        if result['status'] == 'pending':
+            response['Retry-After'] = settings.WEBHOOK_TEST_RETRY_AFTER
+        return response
     
     @extend_schema(tags=['Webhooks'])
     @action(detail=True, methods=['get'])
     def logs(self, request, pk=None):
         webhook = self.get_object()
+        # Failures and a sample of successes; counts of every attempt are in the aggregates
         logs = webhook.logs.all()
-        serializer = WebhookLogSerializer(logs, many=True)
-        return Response(serializer.data)
-
-def trigger_webhooks(form_id, event_type, data):
-    """Trigger all webhooks for a form when an event occurs"""
-    from apps.forms.models import Form
+        page = self.paginate_queryset(logs)
+        if page is not None:
+            return self.get_paginated_response(WebhookLogSerializer(page, many=True).data)
+        return Response(WebhookLogSerializer(logs, many=True).data)
+    
+    @extend_schema(tags=['Webhooks'])
+    @action(detail=True, methods=['get'])
+    def deliveries(self, request, pk=None):
+        webhook = self.get_object()
+        deliveries = webhook.deliveries.all()
+        delivery_status = request.query_params.get('status')
+        if delivery_status:
+            deliveries = deliveries.filter(status=delivery_status)
+        page = self.paginate_queryset(deliveries)
+        if page is not None:
+            return self.get_paginated_response(WebhookDeliverySerializer(page, many=True).data)
+        return Response(WebhookDeliverySerializer(deliveries, many=True).data)
+    
+    @extend_schema(tags=['Webhooks'], parameters=[WebhookStatsQuerySerializer])
+    @action(detail=True, methods=['get'])
+    def stats(self, request, pk=None):
+        webhook = self.get_object()
+        query = WebhookStatsQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        window = query.validated_data['minutes']
+        host = breaker_host(webhook.url)
+        merged = metrics.read([('webhook', str(webhook.pk)), ('host', host)], window)
+        return Response({
+            'window_minutes': window,
+            'webhook': metrics.summarize(merged[('webhook', str(webhook.pk))]),
+            # Shared with the other webhooks delivering to the same host
+            'host': {'host': host, **metrics.summarize(merged[('host', host)])},
+        })
     
-    try:
-        form = Form.objects.get(id=form_id)
-        webhooks = Webhook.objects.filter(form=form, is_active=True)
-        
-        for webhook in webhooks:
-            if event_type in webhook.events:
-                # Create the payload
-                payload = {
-                    'event': event_type,
-                    'form_id': str(form.id),
-                    'form_title': form.title,
-                    'data': data,
-                    'timestamp': webhook.created_at.isoformat()
-                }
-                
-                # Send the webhook
-                headers = {
-                    'Content-Type': 'application/json',
-                }
-                
-                if webhook.secret:
-                    signature = hmac.new(
-                        webhook.secret.encode(),
-                        json.dumps(payload).encode(),
-                        hashlib.sha256
-                    ).hexdigest()
-                    headers['X-Webhook-Signature'] = f'sha256={signature}'
-                
-                try:
-                    response = requests.post(
-                        webhook.url,
-                        json=payload,
-                        headers=headers,
-                        timeout=10
-                    )
-                    
-                    # Log the webhook call
-                    WebhookLog.objects.create(
-                        webhook=webhook,
-                        event_type=event_type,
-                        response_code=response.status_code,
-                        response_body=response.text[:500]
-                    )
-                except Exception as e:
-                    # Log the error
-                    WebhookLog.objects.create(
-                        webhook=webhook,
-                        event_type=event_type,
-                        response_code=None,
-                        response_body=str(e)[:500]
-                    )
-    except Form.DoesNotExist:
-        pass
\ No newline at end of file
+    @extend_schema(tags=['Webhooks'], request=WebhookReplaySerializer)
+    @action(detail=True, methods=['post'])
+    def replay(self, request, pk=None):
+        webhook = self.get_object()
+        serializer = WebhookReplaySerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        replayed, last_due = replay_dead_deliveries(webhook, serializer.validated_data.get('ids'))
+        return Response({
+            'replayed': replayed,
+            'completes_at': last_due,
+        }, status=status.HTTP_202_ACCEPTED)
+
+
+@extend_schema(tags=['Health Checks'], parameters=[WebhookStatsQuerySerializer])
+class WebhookMetricsView(APIView):
+    """Webhook delivery metrics of every webhook and host, in the Prometheus text format"""
+    permission_classes = [CanViewMetrics]
+
+    def get(self, request):
+        query = WebhookStatsQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        text = metrics.prometheus(query.validated_data['minutes'], oldest_due_lag())
+        return HttpResponse(text, content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,169 @@
+# apps/webhooks/worker.py
+"""
+Asyncio webhook delivery worker.
+
+Polls the due-time index of ``WebhookDelivery`` in batches and sends the
+leased deliveries through one ``DeliveryEngine``, so a single process keeps
+thousands of deliveries in flight over pooled keep-alive connections. Any
+number of workers can run side by side. Database work (leasing, resolving,
+recording outcomes) runs in Django's sync thread in batches; outcomes are
+buffered and written in bulk well within the lease.
+
+The event outbox is relayed, and buffers of batching webhooks flushed, at
+most once per poll interval, so a new event is queued within about
+``WEBHOOK_WORKER_POLL_INTERVAL`` and a lingering batch is sent within about
+that of its linger time.
+
+Circuit breakers are consulted when a batch is leased. Between flushes, a
+host whose breaker this worker saw open has its remaining deliveries parked
+without being sent.
+
+Deliveries can wait in the engine for a slot of their host (at most
+``WEBHOOK_MAX_PER_HOST`` at a time) longer than their lease, so the worker
+renews the leases of every delivery it still holds a third of the way into
+them. Leases lapse only when the worker itself stops.
+"""
+import asyncio
+import logging
+import signal
+import time
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from . import metrics
+from .breaker import breaker_host
+from .delivery import (
+    apply_breakers, claim_deliveries, flush_batches, park_deliveries, prepare_deliveries, record_outcomes,
+    renew_leases,
+)
+from .engine import DeliveryEngine
+from .outbox import relay_outbox
+
+logger = logging.getLogger(__name__)
+
+
+def lease_batch(limit):
+    """Lease due deliveries, returning the requests to send and the outcomes known upfront"""
+    deliveries = claim_deliveries(limit)
+    if not deliveries:
+        return [], []
+    requests_to_send, dropped = prepare_deliveries(deliveries)
+    requests_to_send, parked = apply_breakers(requests_to_send)
+    park_deliveries(parked)
+    return requests_to_send, dropped
+
+
+def relay_events():
+    relay_outbox()
+    flush_batches()
+
+
+def record_batch(outcomes, parked):
+    park_deliveries(parked)
+    return record_outcomes(outcomes)
+
+
+class WebhookWorker:
+    def __init__(self, engine=None, batch_size=None, flush_interval=1.0):
+        self.engine = engine
+        self.batch_size = batch_size or settings.WEBHOOK_WORKER_BATCH_SIZE
+        self.flush_interval = flush_interval
+        self.in_flight = set()
+        self.outcomes = []
+        self.parked = []
+        self.open_hosts = {}  # Host -> Unix time its breaker was seen open until
+        self.leases = {}  # Delivery id -> lease expiry held, until its outcome is recorded
+        self.next_renewal = time.monotonic() + settings.WEBHOOK_DELIVERY_LEASE / 3
+        self.delivered = 0
+        self._stopping = False
+
+    def stop(self):
+        self._stopping = True
+
+    async def _deliver(self, delivery, request):
+        reopen_at = self.open_hosts.get(breaker_host(request.url))
+        if reopen_at is not None and reopen_at > time.time():
+            self.parked.append((delivery, reopen_at))
+            return
+        result = await self.engine.post(request.url, request.body, request.headers)
+        if result.error is None:
+            text = result.body.decode('utf-8', 'replace')
+            self.outcomes.append((delivery, result.status, text, True, result.timing))
+        else:
+            logger.warning(f"Webhook {delivery.webhook_id} delivery {delivery.pk} failed: {result.error}")
+            self.outcomes.append((delivery, None, result.error, True, result.timing))
+        self.delivered += 1
+
+    async def _flush_outcomes(self):
+        outcomes, self.outcomes = self.outcomes, []
+        parked, self.parked = self.parked, []
+        if not outcomes and not parked:
+            return
+        opened = await sync_to_async(record_batch)(outcomes, parked)
+        for delivery, *_ in outcomes + parked:
+            self.leases.pop(delivery.pk, None)
+        reopen_at = time.time() + settings.WEBHOOK_BREAKER_COOLDOWN
+        for host, is_open in opened.items():
+            if is_open:
+                self.open_hosts[host] = reopen_at
+            else:
+                self.open_hosts.pop(host, None)
+
+    async def _renew_leases(self):
+        if time.monotonic() < self.next_renewal or not self.leases:
+            return
+        self.next_renewal = time.monotonic() + settings.WEBHOOK_DELIVERY_LEASE / 3
+        held = dict(self.leases)
+        expires_at, renewed = await sync_to_async(renew_leases)(held)
+        for pk in renewed:
+            if pk in self.leases:
+                self.leases[pk] = expires_at
+        lost = [pk for pk in held if pk not in renewed and pk in self.leases]
+        if lost:
+            logger.warning(f"Leases of {len(lost)} webhook deliveries were taken over before they were renewed")
+            for pk in lost:
+                del self.leases[pk]
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self._flush_outcomes()
+                await self._renew_leases()
+            except Exception:
+                logger.exception("Recording webhook delivery outcomes failed")
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, self.stop)
+        self.engine = self.engine or DeliveryEngine.from_settings()
+        capacity = settings.WEBHOOK_MAX_CONCURRENCY * 2  # Keep the engine's queue topped up
+        flusher = asyncio.create_task(self._flush_periodically())
+        next_batch_flush = 0
+        try:
+            while not self._stopping:
+                if time.monotonic() >= next_batch_flush:
+                    next_batch_flush = time.monotonic() + settings.WEBHOOK_WORKER_POLL_INTERVAL
+                    await sync_to_async(relay_events)()
+                free = capacity - len(self.in_flight)
+                if free <= 0:
+                    await asyncio.wait(self.in_flight, return_when=asyncio.FIRST_COMPLETED)
+                    continue
+                requests_to_send, dropped = await sync_to_async(lease_batch)(min(free, self.batch_size))
+                self.outcomes.extend(dropped)
+                if not requests_to_send:
+                    await asyncio.sleep(settings.WEBHOOK_WORKER_POLL_INTERVAL)
+                    continue
+                for delivery, request in requests_to_send:
+                    self.leases[delivery.pk] = delivery.next_attempt_at
+                    task = asyncio.create_task(self._deliver(delivery, request))
+                    self.in_flight.add(task)
+                    task.add_done_callback(self.in_flight.discard)
+        finally:
+            # Leased deliveries are finished before exiting
+            if self.in_flight:
+                await asyncio.wait(self.in_flight)
+            flusher.cancel()
+            await self._flush_outcomes()
+            await sync_to_async(metrics.flush)()
+            await self.engine.close()
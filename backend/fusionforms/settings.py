@@ -22,6 +22,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'corsheaders',
@@ -254,6 +255,115 @@ if not os.getenv('REDIS_CACHE_URL'):
             'LOCATION': 'fusionforms-cache',
         }
 
+# Two-tier read-through caches (apps.core.caching)
+CACHE_LOCK_TIMEOUT = float(os.getenv('CACHE_LOCK_TIMEOUT', 10))  # Seconds a recompute holds its key
+CACHE_EARLY_REFRESH_BETA = float(os.getenv('CACHE_EARLY_REFRESH_BETA', 1.0))  # > 1 refreshes earlier, 0 never early
+
+# Public form HTTP caching (browsers revalidate, shared caches serve stale while revalidating)
+PUBLIC_FORM_MAX_AGE = int(os.getenv('PUBLIC_FORM_MAX_AGE', 0))
+PUBLIC_FORM_SHARED_MAX_AGE = int(os.getenv('PUBLIC_FORM_SHARED_MAX_AGE', 60))
+PUBLIC_FORM_STALE_WHILE_REVALIDATE = int(os.getenv('PUBLIC_FORM_STALE_WHILE_REVALIDATE', 300))
+
+# Pre-rendered public form payloads (Redis tier and per-process LRU tier)
+PUBLIC_FORM_CACHE_TIMEOUT = int(os.getenv('PUBLIC_FORM_CACHE_TIMEOUT', 86400))
+PUBLIC_FORM_LOCAL_CACHE_SIZE = int(os.getenv('PUBLIC_FORM_LOCAL_CACHE_SIZE', 1024))
+PUBLIC_FORM_LOCAL_CACHE_TTL = int(os.getenv('PUBLIC_FORM_LOCAL_CACHE_TTL', 60))
+PUBLIC_FORM_NEGATIVE_CACHE_TIMEOUT = int(os.getenv('PUBLIC_FORM_NEGATIVE_CACHE_TIMEOUT', 30))  # Unknown/unpublished ids
+
+# Compiled theme stylesheets (content-hashed, written to MEDIA_ROOT/themes)
+FORM_THEME_ASSET_URL = os.getenv('FORM_THEME_ASSET_URL', '/api/v1/forms/themes/assets/')  # Or a CDN in front of it
+FORM_THEME_ASSET_MAX_AGE = 365 * 86400
+
+# Per-worker form snapshots used by the submission hot path
+FORM_SNAPSHOT_CACHE_SIZE = int(os.getenv('FORM_SNAPSHOT_CACHE_SIZE', 2048))
+FORM_SNAPSHOT_CACHE_TTL = int(os.getenv('FORM_SNAPSHOT_CACHE_TTL', 300))
+
+# Content-addressed FormVersion schema storage
+FORM_SCHEMA_DELTA_ENCODING = os.getenv('FORM_SCHEMA_DELTA_ENCODING', 'True').lower() == 'true'
+FORM_SCHEMA_DELTA_MAX_DEPTH = int(os.getenv('FORM_SCHEMA_DELTA_MAX_DEPTH', 8))  # Keyframe every N versions
+FORM_SCHEMA_DELTA_MAX_RATIO = float(os.getenv('FORM_SCHEMA_DELTA_MAX_RATIO', 0.5))  # Max delta/full size ratio
+FORM_SCHEMA_CACHE_SIZE = int(os.getenv('FORM_SCHEMA_CACHE_SIZE', 512))
+FORM_VERSION_DIFF_CACHE_TIMEOUT = int(os.getenv('FORM_VERSION_DIFF_CACHE_TIMEOUT', 7 * 86400))
+
+# Publish-time complexity budget for submission JSON Schemas ('reject' or 'warn')
+FORM_SCHEMA_LINT_MODE = os.getenv('FORM_SCHEMA_LINT_MODE', 'reject')
+FORM_SCHEMA_MAX_DEPTH = int(os.getenv('FORM_SCHEMA_MAX_DEPTH', 12))
+FORM_SCHEMA_MAX_ENUM = int(os.getenv('FORM_SCHEMA_MAX_ENUM', 1000))
+FORM_SCHEMA_MAX_RULES = int(os.getenv('FORM_SCHEMA_MAX_RULES', 2000))
+FORM_SCHEMA_MAX_PATTERN_LENGTH = int(os.getenv('FORM_SCHEMA_MAX_PATTERN_LENGTH', 1000))
+FORM_SCHEMA_MAX_VALIDATION_MS = float(os.getenv('FORM_SCHEMA_MAX_VALIDATION_MS', 50))
+FORM_SCHEMA_PROBE_BUDGET_MS = float(os.getenv('FORM_SCHEMA_PROBE_BUDGET_MS', 200))  # Repeat rounds stop past it
+
+# Text search configuration for the forms search vector
+FORM_SEARCH_CONFIG = os.getenv('FORM_SEARCH_CONFIG', 'simple')
+
+# Bulk form operations
+FORM_BULK_MAX_IDS = int(os.getenv('FORM_BULK_MAX_IDS', 5000))
+FORM_BULK_ASYNC_THRESHOLD = int(os.getenv('FORM_BULK_ASYNC_THRESHOLD', 100))  # Larger batches run in Celery
+
+# Deleted forms are hidden immediately and purged in the background
+FORM_PURGE_BATCH_SIZE = int(os.getenv('FORM_PURGE_BATCH_SIZE', 1000))  # Rows deleted per transaction
+FORM_PURGE_STALE_AFTER = int(os.getenv('FORM_PURGE_STALE_AFTER', 600))  # Seconds before a stalled purge is resumed
+
+# Cached analytics reports (per-process LRU in front of Redis)
+ANALYTICS_REPORT_CACHE_TIMEOUT = int(os.getenv('ANALYTICS_REPORT_CACHE_TIMEOUT', 60))  # Seconds a report may lag
+ANALYTICS_REPORT_LOCAL_CACHE_TTL = int(os.getenv('ANALYTICS_REPORT_LOCAL_CACHE_TTL', 10))
+
+# Form bundle export/import
+FORM_BUNDLE_BATCH_SIZE = int(os.getenv('FORM_BUNDLE_BATCH_SIZE', 5000))  # Rows per cursor fetch / insert batch
+FORM_BUNDLE_MAX_LINE_BYTES = int(os.getenv('FORM_BUNDLE_MAX_LINE_BYTES', 16 << 20))  # Longest record on import
+FORM_BUNDLE_MAX_BYTES = int(os.getenv('FORM_BUNDLE_MAX_BYTES', 16 << 30))  # Largest bundle on import, uncompressed
+
+# Webhook delivery (one job per webhook and event)
+WEBHOOK_DELIVERY_ENGINE = os.getenv('WEBHOOK_DELIVERY_ENGINE', 'celery')  # Or 'async' (run_webhook_worker)
+WEBHOOK_CONNECT_TIMEOUT = float(os.getenv('WEBHOOK_CONNECT_TIMEOUT', 5))
+WEBHOOK_TIMEOUT = float(os.getenv('WEBHOOK_TIMEOUT', 10))  # Per read from the receiver
+WEBHOOK_MAX_CONCURRENCY = int(os.getenv('WEBHOOK_MAX_CONCURRENCY', 512))  # Async worker, per process
+WEBHOOK_MAX_PER_HOST = int(os.getenv('WEBHOOK_MAX_PER_HOST', 32))  # Concurrent connections per receiver host
+WEBHOOK_KEEPALIVE_TIMEOUT = float(os.getenv('WEBHOOK_KEEPALIVE_TIMEOUT', 30))  # Idle seconds before closing
+WEBHOOK_KEEPALIVE_MAX_REQUESTS = int(os.getenv('WEBHOOK_KEEPALIVE_MAX_REQUESTS', 1000))  # Per connection
+WEBHOOK_WORKER_BATCH_SIZE = int(os.getenv('WEBHOOK_WORKER_BATCH_SIZE', 500))  # Deliveries leased per poll
+WEBHOOK_WORKER_POLL_INTERVAL = float(os.getenv('WEBHOOK_WORKER_POLL_INTERVAL', 0.5))  # Seconds, when nothing is due
+WEBHOOK_DELIVERY_LEASE = int(os.getenv('WEBHOOK_DELIVERY_LEASE', WEBHOOK_CONNECT_TIMEOUT + WEBHOOK_TIMEOUT + 30))
+WEBHOOK_GZIP_MIN_BYTES = int(os.getenv('WEBHOOK_GZIP_MIN_BYTES', 8192))  # Bodies gzipped from this size on, if enabled
+WEBHOOK_GZIP_LEVEL = int(os.getenv('WEBHOOK_GZIP_LEVEL', 5))
+WEBHOOK_PAYLOAD_CACHE_TTL = int(os.getenv('WEBHOOK_PAYLOAD_CACHE_TTL', 300))  # Encoded bodies shared by Celery tasks
+WEBHOOK_OUTBOX_BATCH_SIZE = int(os.getenv('WEBHOOK_OUTBOX_BATCH_SIZE', 500))  # Outbox events relayed per transaction
+
+# Failed deliveries are retried with exponential backoff and jitter, then dead-lettered
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv('WEBHOOK_MAX_ATTEMPTS', 10))
+WEBHOOK_RETRY_BASE_DELAY = float(os.getenv('WEBHOOK_RETRY_BASE_DELAY', 30))  # Seconds before the first retry
+WEBHOOK_RETRY_MAX_DELAY = float(os.getenv('WEBHOOK_RETRY_MAX_DELAY', 6 * 3600))
+WEBHOOK_REPLAY_RATE = float(os.getenv('WEBHOOK_REPLAY_RATE', 10))  # Replayed deliveries per second per webhook
+WEBHOOK_REPLAY_MAX = int(os.getenv('WEBHOOK_REPLAY_MAX', 10000))  # Dead deliveries requeued per replay request
+
+# Delivery logs: failures and a sample of successes, plus hourly aggregates of every attempt
+WEBHOOK_LOG_SUCCESS_SAMPLE_RATE = float(os.getenv('WEBHOOK_LOG_SUCCESS_SAMPLE_RATE', 0.1))  # Share of successes logged
+WEBHOOK_LOG_FLUSH_BATCH_SIZE = int(os.getenv('WEBHOOK_LOG_FLUSH_BATCH_SIZE', 5000))  # Buffered attempts per write
+WEBHOOK_LOG_RETENTION_DAYS = int(os.getenv('WEBHOOK_LOG_RETENTION_DAYS', 30))
+WEBHOOK_AGGREGATE_RETENTION_DAYS = int(os.getenv('WEBHOOK_AGGREGATE_RETENTION_DAYS', 400))
+WEBHOOK_DELIVERY_RETENTION_DAYS = int(os.getenv('WEBHOOK_DELIVERY_RETENTION_DAYS', 7))  # Succeeded deliveries
+WEBHOOK_PURGE_BATCH_SIZE = int(os.getenv('WEBHOOK_PURGE_BATCH_SIZE', 5000))  # Rows deleted per transaction
+
+# Delivery timing histograms per webhook and host, shared through Redis in per-minute buckets
+WEBHOOK_METRICS_FLUSH_INTERVAL = float(os.getenv('WEBHOOK_METRICS_FLUSH_INTERVAL', 1.0))  # Seconds, per process
+WEBHOOK_METRICS_WINDOW_MINUTES = int(os.getenv('WEBHOOK_METRICS_WINDOW_MINUTES', 15))  # Default stats window
+WEBHOOK_METRICS_RETENTION_MINUTES = int(os.getenv('WEBHOOK_METRICS_RETENTION_MINUTES', 60))
+
+# Circuit breaker per receiver host, shared through the cache
+WEBHOOK_BREAKER_THRESHOLD = int(os.getenv('WEBHOOK_BREAKER_THRESHOLD', 5))  # Consecutive failures that open it
+WEBHOOK_BREAKER_COOLDOWN = float(os.getenv('WEBHOOK_BREAKER_COOLDOWN', 30))  # Seconds open before a probe
+WEBHOOK_BREAKER_PROBE_TIMEOUT = WEBHOOK_CONNECT_TIMEOUT + WEBHOOK_TIMEOUT + 5  # Probe slot held at most this long
+
+# Per-form webhook routing tables (event type -> active webhooks)
+WEBHOOK_ROUTES_CACHE_SIZE = int(os.getenv('WEBHOOK_ROUTES_CACHE_SIZE', 2048))  # Per process
+WEBHOOK_ROUTES_CACHE_TTL = int(os.getenv('WEBHOOK_ROUTES_CACHE_TTL', 300))  # Per process, seconds
+WEBHOOK_ROUTES_SHARED_TTL = int(os.getenv('WEBHOOK_ROUTES_SHARED_TTL', 3600))  # In Redis, seconds
+
+# Webhook test requests go through the delivery engine; clients poll for the result
+WEBHOOK_TEST_RESULT_TTL = int(os.getenv('WEBHOOK_TEST_RESULT_TTL', 600))  # Seconds a test's response is kept
+WEBHOOK_TEST_RETRY_AFTER = int(os.getenv('WEBHOOK_TEST_RETRY_AFTER', 1))  # Retry-After of a pending test result
+
 # Structured logging configuration
 LOGGING = {
     'version': 1,
@@ -344,6 +454,32 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+CELERY_BEAT_SCHEDULE = {
+    'flush-form-counters': {
+        'task': 'apps.analytics.tasks.flush_form_counters',
+        'schedule': float(os.getenv('FORM_COUNTERS_FLUSH_INTERVAL', 10)),
+    },
+    'resume-form-deletions': {
+        'task': 'apps.forms.tasks.resume_form_deletions',
+        'schedule': 300.0,
+    },
+    'relay-webhook-outbox': {
+        'task': 'apps.webhooks.tasks.relay_webhook_outbox',
+        'schedule': float(os.getenv('WEBHOOK_OUTBOX_RELAY_INTERVAL', 1)),
+    },
+    'dispatch-webhook-deliveries': {
+        'task': 'apps.webhooks.tasks.dispatch_webhook_deliveries',
+        'schedule': float(os.getenv('WEBHOOK_DISPATCH_INTERVAL', 5)),
+    },
+    'flush-webhook-logs': {
+        'task': 'apps.webhooks.tasks.flush_webhook_logs',
+        'schedule': float(os.getenv('WEBHOOK_LOG_FLUSH_INTERVAL', 5)),
+    },
+    'purge-webhook-logs': {
+        'task': 'apps.webhooks.tasks.purge_webhook_logs',
+        'schedule': 3600.0,
+    },
+}
 
 # Additional security settings
 if not DEBUG:
@@ -6,6 +6,7 @@ from django.shortcuts import redirect
 from drf_spectacular.views import SpectacularAPIView, SpectacularRedocView, SpectacularSwaggerView
 from apps.core.health import HealthCheckView, ReadinessCheckView, LivenessCheckView
 from apps.core.monitoring import MetricsView
+from apps.webhooks.views import WebhookMetricsView
 
 
 def root_view(request):
@@ -37,6 +38,7 @@ urlpatterns = [
     path('health/ready/', ReadinessCheckView.as_view(), name='readiness'),
     path('health/live/', LivenessCheckView.as_view(), name='liveness'),
     path('health/metrics/', MetricsView.as_view(), name='metrics'),
+    path('health/metrics/webhooks/', WebhookMetricsView.as_view(), name='webhook-metrics'),
     
     # API v1
     path('api/v1/accounts/', include('apps.accounts.urls')),